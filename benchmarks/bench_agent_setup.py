@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+智能体初始化开销基准测试
+
+对比两种请求处理方式的每请求准备开销：
+- 旧方式：每个请求新建 ``TextAnalysisAgent``（重建 LLM 客户端与工作流）
+- 新方式：通过 ``AgentRegistry`` 获取启动时构建好的共享实例
+
+运行方式：
+    python -m benchmarks.bench_agent_setup --requests 200
+"""
+
+import os
+import time
+import argparse
+import statistics
+
+# 基准测试不会真正调用 LLM，未配置密钥时使用占位值
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.core.agent import TextAnalysisAgent
+from src.core.registry import AgentRegistry
+
+
+def _measure(fn, n: int):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _report(name: str, samples):
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(f"{name:<28} 平均 {statistics.mean(samples_ms):8.3f}ms  "
+          f"中位数 {statistics.median(samples_ms):8.3f}ms  p95 {p95:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="智能体初始化开销基准测试")
+    parser.add_argument("--requests", type=int, default=100, help="模拟请求数（默认：100）")
+    args = parser.parse_args()
+
+    registry = AgentRegistry()
+    start = time.perf_counter()
+    registry.startup()
+    print(f"启动预热耗时: {(time.perf_counter() - start) * 1000:.3f}ms")
+
+    before = _measure(TextAnalysisAgent, args.requests)
+    after = _measure(registry.get, args.requests)
+
+    print(f"\n每请求准备开销（{args.requests} 次）")
+    _report("每请求新建智能体（旧）", before)
+    _report("共享注册表实例（新）", after)
+    print(f"加速比: {statistics.mean(before) / max(statistics.mean(after), 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
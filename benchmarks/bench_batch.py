@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+批量分析吞吐基准测试
+
+通过 ASGI 传输直接调用服务（不占用端口），对比逐条串行调用
+``POST /api/v1/analyze`` 与一次 ``POST /api/v1/analyze/batch`` 的吞吐。
+
+运行方式：
+    python -m benchmarks.bench_batch --items 32 --latency 0.2 --concurrency 8
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+
+import httpx
+
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.config import settings
+from src.core.agent import TextAnalysisAgent
+from src.core.registry import AgentRegistry
+
+
+async def _run(args) -> None:
+    settings.batch_max_concurrency = args.concurrency
+    items = [{"text": f"这是第 {i} 篇性能测试的示例文本。"} for i in range(args.items)]
+    # 加入少量重复条目，体现批内去重
+    items += items[:args.duplicates]
+
+    for name in ("serial", "batch"):
+        llm = StubChatModel(latency=args.latency)
+        app = create_app()
+        app.state.rate_limiter = None  # 压测时不限流
+        app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=llm))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            start = time.perf_counter()
+            if name == "serial":
+                for item in items:
+                    (await client.post("/api/v1/analyze", json=item)).raise_for_status()
+            else:
+                (await client.post("/api/v1/analyze/batch", json={"items": items})).raise_for_status()
+            elapsed = time.perf_counter() - start
+        print(f"{name:<8} {len(items)} 条  耗时 {elapsed:7.2f}s  吞吐 {len(items) / elapsed:8.2f} 条/s  "
+              f"LLM 调用 {llm.call_count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量分析吞吐基准测试")
+    parser.add_argument("--items", type=int, default=32, help="不重复的条目数")
+    parser.add_argument("--duplicates", type=int, default=8, help="额外追加的重复条目数")
+    parser.add_argument("--latency", type=float, default=0.2, help="桩 LLM 每次调用延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=8, help="批量接口并发上限")
+    args = parser.parse_args()
+    for name in ("httpx", "src.api.middleware", "src.core.registry"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
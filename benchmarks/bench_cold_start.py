@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+冷启动基准测试
+
+多次以子进程启动 ``python main.py server --workers 1``，测量从进程创建到：
+- 端口可用（``/api/v1/health`` 首次返回 200）
+- 就绪（``/api/v1/ready`` 首次返回 200，即共享智能体预热完成；
+  旧版本没有该端点时与端口可用相同）
+
+同时用 ``python -X importtime`` 统计导入服务入口 ``src.main`` 的累计耗时。
+智能体只构建不调用 LLM，使用占位 API 密钥即可，无需网络。``--cwd`` 可指向
+另一个检出（如 ``git worktree add /tmp/old HEAD~1``）以对比改动前后。
+
+运行方式：
+    python -m benchmarks.bench_cold_start --runs 5
+    python -m benchmarks.bench_cold_start --runs 5 --cwd /tmp/old
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time(cwd: str) -> float:
+    """导入 src.main 的累计耗时（毫秒）"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import src.main"],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        if line.rstrip().endswith("| src.main"):
+            return int(line.split("|")[1]) / 1000
+    raise RuntimeError("未找到 src.main 的导入耗时")
+
+
+def cold_start(cwd: str, timeout: float = 60.0):
+    """启动一次服务，返回 (端口可用耗时, 就绪耗时)，单位秒"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/v1"
+    env = dict(os.environ, OPENAI_API_KEY="sk-bench", APP_WORKERS="1")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py", "server", "--host", "127.0.0.1", "--port", str(port), "--workers", "1"],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    listening = None
+    try:
+        with httpx.Client(timeout=1) as client:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError("服务进程提前退出")
+                try:
+                    if listening is None and client.get(f"{url}/health").status_code == 200:
+                        listening = time.perf_counter() - start
+                    if listening is not None:
+                        status = client.get(f"{url}/ready").status_code
+                        if status in (200, 404):
+                            return listening, time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"服务未在 {timeout:g}s 内就绪")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="启动次数")
+    parser.add_argument("--cwd", default=ROOT, help="被测代码所在目录（默认当前仓库）")
+    args = parser.parse_args()
+
+    imports = min(import_time(args.cwd) for _ in range(3))
+    results = [cold_start(args.cwd) for _ in range(args.runs)]
+    listening = [r[0] * 1000 for r in results]
+    ready = [r[1] * 1000 for r in results]
+    print(f"被测目录: {args.cwd}")
+    print(f"导入 src.main: {imports:.0f}ms（三次最小值）")
+    print(f"端口可用: 中位数 {statistics.median(listening):.0f}ms  最小 {min(listening):.0f}ms")
+    print(f"就绪:     中位数 {statistics.median(ready):.0f}ms  最小 {min(ready):.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
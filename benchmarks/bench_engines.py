@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+分析引擎基准测试
+
+对比 ``graph``（每个任务单独调用 LLM）与 ``oneshot``（一次结构化输出调用）
+两种引擎在不同文本长度下的输入 token 数、LLM 调用次数和端到端耗时。
+桩 LLM 按字符近似 token，并按输入长度注入预填充延迟。
+
+运行方式：
+    python -m benchmarks.bench_engines --latency 0.2 --latency-per-1k 0.05
+"""
+
+import time
+import asyncio
+import argparse
+
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent, ANALYSIS_ENGINES
+from src.core.models import TextAnalysisRequest
+
+SAMPLE_SENTENCE = "近日，OpenAI 发布了最新的 GPT-4 模型，微软公司已经将其集成到产品中。"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析引擎基准测试")
+    parser.add_argument("--latency", type=float, default=0.2, help="每次 LLM 调用的固定延迟（秒）")
+    parser.add_argument("--latency-per-1k", type=float, default=0.05, help="每 1000 个输入 token 的预填充延迟（秒）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000, 50000], help="文本长度（字符）")
+    args = parser.parse_args()
+
+    llm = StubChatModel(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k)
+    agent = TextAnalysisAgent(llm=llm)
+
+    print(f"{'长度':>8} {'引擎':<8} {'调用次数':>8} {'输入token':>10} {'耗时(ms)':>10}")
+    for size in args.sizes:
+        text = (SAMPLE_SENTENCE * (size // len(SAMPLE_SENTENCE) + 1))[:size]
+        for engine in ANALYSIS_ENGINES:
+            request = TextAnalysisRequest(text=text, engine=engine)
+            start = time.perf_counter()
+            response = asyncio.run(agent.aanalyze(request))
+            elapsed = time.perf_counter() - start
+            usage = response.metadata["usage"]
+            print(f"{size:>8} {engine:<8} {usage['llm_calls']:>8} {usage['prompt_tokens']:>10} "
+                  f"{elapsed * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+分类快速路径基准测试
+
+1. 用按关键词打分的桩 LLM（模拟真实 LLM 的分类结果）分析训练集，并通过
+   ``LabelLog`` 记录 LLM 给出的分类
+2. 用记录下的分类训练字符 n-gram 模型
+3. 在测试集上对比只用 LLM 与开启快速路径时的 LLM 调用次数、单请求延迟，
+   以及快速路径结果与 LLM 结果的一致率
+
+运行方式：
+    python -m benchmarks.bench_fastpath --train 2000 --test 500 --latency 0.2
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.classification_corpus import generate_corpus, keyword_label
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.fastpath import LabelLog, NgramClassifier, read_samples
+from src.core.models import TextAnalysisRequest
+
+
+class KeywordLLM(StubChatModel):
+    """分类结果由关键词打分决定的桩 LLM"""
+
+    def _result(self, prompt, task):
+        if task == "classification":
+            self.responses = {**self.responses, "classification": keyword_label(prompt)}
+        return super()._result(prompt, task)
+
+
+async def classify_all(agent: TextAnalysisAgent, texts, concurrency: int = 32):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(text: str):
+        async with semaphore:
+            request = TextAnalysisRequest(text=text, include_entities=False, include_summary=False)
+            start = time.perf_counter()
+            response = await agent.aanalyze(request)
+            return response.classification, time.perf_counter() - start
+
+    return await asyncio.gather(*(one(text) for text in texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分类快速路径基准测试")
+    parser.add_argument("--train", type=int, default=2000, help="训练样本数（经 LLM 标注）")
+    parser.add_argument("--test", type=int, default=500, help="测试样本数")
+    parser.add_argument("--latency", type=float, default=0.2, help="每次 LLM 调用的固定延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=8, help="测试阶段的并发请求数")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.9, 0.95], help="置信度阈值")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "labels.jsonl")
+        agent = TextAnalysisAgent(llm=KeywordLLM(latency=0.0), label_log=LabelLog(log_path))
+        asyncio.run(classify_all(agent, [text for text, _ in generate_corpus(args.train, seed=1)]))
+        agent.label_log.close()
+        samples = read_samples(log_path)
+
+    start = time.perf_counter()
+    model = NgramClassifier.train(samples)
+    print(f"训练样本 {len(samples)} 条，词表 {len(model.vocab)} 个 n-gram，"
+          f"训练耗时 {time.perf_counter() - start:.1f}s")
+
+    test_texts = [text for text, _ in generate_corpus(args.test, seed=2)]
+    start = time.perf_counter()
+    for text in test_texts:
+        model.predict(text)
+    print(f"本地预测平均耗时 {(time.perf_counter() - start) / len(test_texts) * 1e6:.0f}µs\n")
+
+    print(f"{'模式':<14} {'LLM调用':>8} {'减少':>8} {'一致率':>8} {'p50(ms)':>10} {'p95(ms)':>10}")
+    baseline_calls = None
+    for threshold in [None] + args.thresholds:
+        llm = KeywordLLM(latency=args.latency)
+        agent = TextAnalysisAgent(llm=llm, fast_classifier=model if threshold else None,
+                                  fast_threshold=threshold)
+        results = asyncio.run(classify_all(agent, test_texts, args.concurrency))
+        agreement = sum(label == keyword_label(text) for (label, _), text in zip(results, test_texts))
+        latencies = sorted(latency for _, latency in results)
+        baseline_calls = baseline_calls or llm.call_count
+        label = "只用 LLM" if threshold is None else f"阈值 {threshold:g}"
+        print(f"{label:<14} {llm.call_count:>8} {1 - llm.call_count / baseline_calls:>8.1%} "
+              f"{agreement / len(test_texts):>8.1%} {statistics.median(latencies) * 1000:>10.1f} "
+              f"{latencies[int(0.95 * (len(latencies) - 1))] * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+实体词典匹配基准测试
+
+生成包含 ``--entries`` 个实体的合成词典和 MB 级文本，分别强制 ``Gazetteer`` 使用
+Aho-Corasick 自动机和正则多选分支，报告两者的构建时间、内存占用与匹配吞吐，用于
+校准 ``Gazetteer.REGEX_MAX_ENTRIES``。正则的吞吐随词条数线性下降，大词典上很慢，
+可用 ``--skip-regex`` 跳过。
+
+运行方式：
+    python -m benchmarks.bench_gazetteer --entries 2000 --sizes 1 4 16
+    python -m benchmarks.bench_gazetteer --entries 100000 --sizes 1 --skip-regex
+"""
+
+import re
+import time
+import random
+import argparse
+import tracemalloc
+
+from src.core.entities import Gazetteer
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈"
+GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红鹏飞宇浩然子涵梓轩雨欣博文思远"
+PLACE = "东西南北中安平宁阳江河山湖海州城昌兴华新丰泰和春嘉"
+ORG_SUFFIX = ["科技有限公司", "集团", "大学", "研究院", "银行", "医院", "出版社"]
+FILLER = "据报道，双方在会谈中就进一步深化合作交换了意见，并表示将在多个领域开展务实交流。"
+
+
+def build_entries(count: int, rng: random.Random):
+    names = set()
+    while len(names) < count:
+        kind = rng.random()
+        if kind < 0.5:
+            name = rng.choice(SURNAMES) + "".join(rng.choices(GIVEN, k=rng.randint(1, 2)))
+        elif kind < 0.8:
+            name = "".join(rng.choices(PLACE, k=2)) + rng.choice(["市", "县", "省", "镇"])
+        else:
+            name = "".join(rng.choices(PLACE + GIVEN, k=rng.randint(2, 4))) + rng.choice(ORG_SUFFIX)
+        names.add(name)
+    return sorted(names)
+
+
+def build_text(names, size_mb: float, rng: random.Random) -> str:
+    target = int(size_mb * 1024 * 1024 / 3)  # UTF-8 下中文约 3 字节/字
+    parts, length = [], 0
+    while length < target:
+        piece = FILLER[:rng.randint(10, len(FILLER))] + rng.choice(names)
+        parts.append(piece)
+        length += len(piece)
+    return "".join(parts)[:target]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实体词典匹配基准测试")
+    parser.add_argument("--entries", type=int, default=100000, help="词典实体数")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="文本大小（MB，UTF-8）")
+    parser.add_argument("--skip-regex", action="store_true", help="不运行正则对照")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = build_entries(args.entries, rng)
+    matchers = [("aho-corasick", 0)] + ([] if args.skip_regex else [("regex", args.entries)])
+    gazetteers = {}
+    for label, regex_max_entries in matchers:
+        start = time.perf_counter()
+        gazetteer = Gazetteer(((name, None) for name in names), regex_max_entries=regex_max_entries)
+        build_time = time.perf_counter() - start
+        # 单独构建一次测量内存，tracemalloc 会显著拖慢构建；re 会缓存编译结果，先清空
+        del gazetteer
+        re.purge()
+        tracemalloc.start()
+        gazetteer = Gazetteer(((name, None) for name in names), regex_max_entries=regex_max_entries)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        gazetteers[label] = gazetteer
+        print(f"{label}：{len(gazetteer)} 个实体，构建 {build_time:.2f}s，内存 {memory / 1024 / 1024:.1f}MB")
+    default = Gazetteer((name, None) for name in names).matcher
+    print(f"默认阈值 {Gazetteer.REGEX_MAX_ENTRIES} 个词条下使用 {default}")
+
+    print(f"\n{'文本(MB)':>8} {'方法':<12} {'匹配数':>10} {'耗时(s)':>8} {'吞吐(MB/s)':>11}")
+    for size in sorted(args.sizes):
+        text = build_text(names, size, rng)
+        for label, gazetteer in gazetteers.items():
+            start = time.perf_counter()
+            matches = gazetteer.find(text)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>8g} {label:<12} {len(matches):>10} {elapsed:>8.2f} {size / elapsed:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+共享 HTTP 连接池基准测试
+
+通过真实 TCP 连接访问本地 OpenAI 兼容桩服务器，在并发负载下对比：
+- 每个请求新建 httpx 客户端（每次分析都要重新建立连接）
+- 进程级共享连接池（``create_http_clients``，连接数上限与 keep-alive 来自配置）
+
+报告桩服务器见到的 TCP 连接数、单次分析延迟的 p50/p95 与吞吐量。
+
+运行方式：
+    python -m benchmarks.bench_http_pool --requests 200 --concurrency 20
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from typing import Callable, List
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from benchmarks.fake_openai_server import BackgroundServer, create_fake_openai_app
+from src.core.agent import TextAnalysisAgent
+from src.core.http_client import create_http_clients, llm_timeout
+from src.core.models import TextAnalysisRequest
+
+
+def _create_agent(url: str, client: httpx.AsyncClient) -> TextAnalysisAgent:
+    llm = ChatOpenAI(model="fake-model", api_key="sk-bench", base_url=f"{url}/v1", max_retries=0,
+                     timeout=llm_timeout(), http_async_client=client)
+    return TextAnalysisAgent(llm=llm, execution_mode="parallel")
+
+
+async def _run(requests: int, concurrency: int, analyze: Callable) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await analyze(TextAnalysisRequest(text=f"{i}：北京是中国的首都。"))
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+async def per_request(url: str, requests: int, concurrency: int) -> List[float]:
+    async def analyze(request):
+        async with httpx.AsyncClient(timeout=llm_timeout()) as client:
+            return await _create_agent(url, client).aanalyze(request)
+
+    return await _run(requests, concurrency, analyze)
+
+
+async def shared_pool(url: str, requests: int, concurrency: int) -> List[float]:
+    client, async_client = create_http_clients()
+    agent = _create_agent(url, async_client)
+    try:
+        return await _run(requests, concurrency, agent.aanalyze)
+    finally:
+        client.close()
+        await async_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享 HTTP 连接池基准测试")
+    parser.add_argument("--requests", type=int, default=200, help="分析请求数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发数")
+    parser.add_argument("--latency", type=float, default=0.02, help="桩服务器每次调用的延迟（秒）")
+    parser.add_argument("--port", type=int, default=9101, help="桩服务器端口")
+    args = parser.parse_args()
+    for name in ("httpx", "src.core.http_client"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    fake = create_fake_openai_app(latency=args.latency)
+    print(f"{'模式':<16} {'TCP 连接':>8} {'上游调用':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'吞吐(req/s)':>12}")
+    with BackgroundServer(fake, args.port) as server:
+        for name, scenario in (("每请求新建客户端", per_request), ("共享连接池", shared_pool)):
+            fake.state.connections.clear()
+            fake.state.call_count = 0
+            start = time.perf_counter()
+            latencies = sorted(asyncio.run(scenario(server.url, args.requests, args.concurrency)))
+            elapsed = time.perf_counter() - start
+            p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+            print(f"{name:<16} {len(fake.state.connections):>8} {fake.state.call_count:>8} "
+                  f"{statistics.median(latencies) * 1000:>9.1f} {p95 * 1000:>9.1f} "
+                  f"{args.requests / elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
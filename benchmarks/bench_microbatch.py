@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+分类微批处理基准测试
+
+并发发起只含分类任务的请求，对比关闭与开启微批处理时的上游调用次数、
+吞吐量与请求延迟。上游并发名额固定为 ``--upstream-concurrency``，模拟服务商的
+并发配额：关闭批处理时请求在名额上排队，开启后一次调用可完成多条分类。
+
+运行方式：
+    python -m benchmarks.bench_microbatch --requests 256 --latency 0.2 --windows 0.005 0.02
+"""
+
+import time
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.stub_llm import StubChatModel
+from src.core.admission import AdaptiveConcurrencyLimiter
+from src.core.agent import TextAnalysisAgent
+from src.core.models import TextAnalysisRequest
+
+SAMPLE_TEXT = "近日，OpenAI 发布了最新的 GPT-4 模型，微软公司已经将其集成到产品中。"
+
+
+async def run(agent: TextAnalysisAgent, requests: int):
+    async def one(index: int) -> float:
+        # 文本各不相同，避免 single-flight 合并相同请求
+        request = TextAnalysisRequest(text=f"{SAMPLE_TEXT}（{index}）",
+                                      include_entities=False, include_summary=False)
+        start = time.perf_counter()
+        await agent.aanalyze(request)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分类微批处理基准测试")
+    parser.add_argument("--requests", type=int, default=256, help="并发请求数")
+    parser.add_argument("--latency", type=float, default=0.2, help="每次 LLM 调用的固定延迟（秒）")
+    parser.add_argument("--latency-per-1k", type=float, default=0.05, help="每 1000 个输入 token 的预填充延迟（秒）")
+    parser.add_argument("--upstream-concurrency", type=int, default=8, help="上游并发调用名额")
+    parser.add_argument("--max-batch-size", type=int, default=16, help="每批最多条目数")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0.005, 0.02], help="批处理窗口（秒）")
+    args = parser.parse_args()
+
+    print(f"{'模式':<16} {'上游调用':>8} {'吞吐(req/s)':>12} {'p50(ms)':>10} {'p95(ms)':>10}")
+    for window in [None] + args.windows:
+        llm = StubChatModel(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k)
+        limit = args.upstream_concurrency
+        limiter = AdaptiveConcurrencyLimiter(initial=limit, min_limit=limit, max_limit=limit,
+                                             max_queue=args.requests, queue_timeout=600)
+        agent = TextAnalysisAgent(llm=llm, limiter=limiter, batch_classification=window is not None)
+        if window is not None:
+            agent.classification_batcher.window = window
+            agent.classification_batcher.max_batch_size = args.max_batch_size
+        elapsed, latencies = asyncio.run(run(agent, args.requests))
+        label = "不合并" if window is None else f"窗口 {window * 1000:g}ms"
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(f"{label:<16} {llm.call_count:>8} {args.requests / elapsed:>12.1f} "
+              f"{statistics.median(latencies) * 1000:>10.1f} {p95 * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+请求日志中间件开销基准测试
+
+对比同一个最小应用（一个 JSON 路由、一个流式路由）在三种配置下的单请求耗时：
+- 无中间件（基线）
+- 旧实现：``BaseHTTPMiddleware`` + 事件循环中同步格式化并写出日志
+- 新实现：纯 ASGI 中间件 + 队列日志处理器（JSON 格式化在后台线程）
+
+请求通过 ``httpx.ASGITransport`` 直接调用应用，不经过网络；日志写入 ``os.devnull``，
+只计入格式化与 I/O 调用本身的开销。
+
+运行方式：
+    python -m benchmarks.bench_middleware --requests 5000
+"""
+
+import os
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from src.api.middleware import RequestLoggingMiddleware, _route_template
+from src.core.logs import configure_logging, shutdown_logging
+from src.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS
+from src.core.tracing import SPAN_KIND_SERVER, parse_traceparent, span
+
+legacy_logger = logging.getLogger("bench.legacy")
+
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    """旧实现：基于 BaseHTTPMiddleware，日志在事件循环中以 f-string 格式化后同步写出"""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(request.method)
+        in_progress.inc()
+        status_code = 500
+        remote_parent = parse_traceparent(request.headers.get("traceparent"))
+        with span("http.request", kind=SPAN_KIND_SERVER, remote_parent=remote_parent,
+                  **{"http.method": request.method}) as request_span:
+            try:
+                response = await call_next(request)
+                status_code = response.status_code
+                response.headers["traceparent"] = request_span.traceparent
+            finally:
+                in_progress.dec()
+                process_time = time.time() - start_time
+                route = _route_template(request.scope)
+                request_span.name = f"{request.method} {route}"
+                request_span.set_attribute("http.route", route)
+                request_span.set_attribute("http.status_code", status_code)
+                HTTP_REQUEST_DURATION.labels(request.method, route, str(status_code)).observe(process_time)
+        legacy_logger.info(
+            f"Method: {request.method} "
+            f"Path: {request.url.path} "
+            f"Status: {response.status_code} "
+            f"Time: {process_time:.2f}s"
+        )
+        return response
+
+
+def create_bench_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(20):
+                yield f"{i}\n"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+
+async def _measure(app: FastAPI, path: str, requests: int) -> float:
+    """返回单请求耗时的中位数（微秒）"""
+    samples = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(requests):
+            start = time.perf_counter()
+            response = await client.get(path.format(i=i))
+            await response.aread()
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="请求日志中间件开销基准测试")
+    parser.add_argument("--requests", type=int, default=5000, help="每种配置的请求数")
+    args = parser.parse_args()
+
+    # 只统计服务端日志，压测客户端自身的请求日志不计入
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    devnull = open(os.devnull, "w")
+    legacy_handler = logging.StreamHandler(devnull)
+    legacy_logger.addHandler(legacy_handler)
+    legacy_logger.propagate = False
+    legacy_logger.setLevel(logging.INFO)
+
+    print(f"{'配置':<28} {'JSON 路由(µs)':>14} {'开销':>8} {'流式路由(µs)':>14} {'开销':>8}")
+    baseline = {}
+    scenarios = (("无中间件", None), ("BaseHTTPMiddleware（旧）", LegacyRequestLoggingMiddleware),
+                 ("纯 ASGI + 队列日志（新）", RequestLoggingMiddleware))
+    for name, middleware in scenarios:
+        if middleware is RequestLoggingMiddleware:
+            configure_logging(stream=devnull, fmt="json", level="INFO")
+        app = create_bench_app(middleware)
+        row = []
+        for path in ("/items/{i}", "/stream"):
+            # 先预热一轮，避免首次请求的导入和路由编译计入结果
+            asyncio.run(_measure(app, path, min(200, args.requests)))
+            median = asyncio.run(_measure(app, path, args.requests))
+            baseline.setdefault(path, median)
+            row.append(f"{median:>14.1f} {median - baseline[path]:>+8.1f}")
+        print(f"{name:<28} {' '.join(row)}")
+    shutdown_logging()
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main()
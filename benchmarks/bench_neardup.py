@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+近似重复索引基准测试
+
+向 ``NearDuplicateIndex`` 写入 ``--entries`` 个条目后报告：
+- 每个条目的内存（索引数组实际占用与进程 RSS 增量）
+- 签名计算耗时（``--chars`` 字的中文文章）
+- 查询延迟（已计算好签名时的 LSH 查找 + 候选比较），分别统计命中与未命中的查询
+- 召回率：改动了时间戳和结尾声明的文章能否找回原文
+
+填充条目使用随机签名，跳过逐条计算文本签名（100 万篇文章的签名计算需要数小时）；
+``--queries`` 篇合成文章以真实签名写入，再用改动后的版本查询。
+
+运行方式：
+    python -m benchmarks.bench_neardup --entries 1000000
+"""
+
+import os
+import time
+import random
+import argparse
+from array import array
+
+from benchmarks.loadgen import percentile
+from src.core.cache import document_key
+from src.core.neardup import NearDuplicateIndex
+
+SENTENCES = [
+    "记者从市政府新闻发布会上获悉", "今年前三季度全市地区生产总值同比增长百分之五点二",
+    "新能源汽车产量继续保持两位数增长", "多家企业表示将加大研发投入", "专家认为消费市场正在稳步回暖",
+    "轨道交通新线预计年底开通运营", "相关部门将进一步优化营商环境", "气象台提醒市民注意防范强对流天气",
+    "博物馆推出夜间开放和沉浸式展览", "高校毕业生就业服务月活动同步启动",
+]
+FOOTERS = ["（完）", "本文来源：新华社", "责任编辑：王敏", "版权所有，未经授权不得转载。"]
+
+
+def rss_bytes() -> int:
+    """当前进程常驻内存，非 Linux 平台返回 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def build_article(rng: random.Random, chars: int) -> str:
+    parts, length = [], 0
+    while length < chars:
+        sentence = rng.choice(SENTENCES) + "".join(chr(0x4E00 + rng.randrange(3000)) for _ in range(rng.randint(4, 12)))
+        parts.append(sentence + "。")
+        length += len(sentence) + 1
+    return "".join(parts)[:chars]
+
+
+def edit_article(article: str, rng: random.Random) -> str:
+    timestamp = f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+    return f"{timestamp} {article}{rng.choice(FOOTERS)}"
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="近似重复索引基准测试")
+    parser.add_argument("--entries", type=int, default=1000000, help="索引条目数")
+    parser.add_argument("--queries", type=int, default=1000, help="查询的文章数")
+    parser.add_argument("--chars", type=int, default=2000, help="每篇文章的字数")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--num-perm", type=int, default=64)
+    parser.add_argument("--bands", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    baseline = rss_bytes()
+    index = NearDuplicateIndex(max_entries=args.entries, threshold=args.threshold,
+                               num_perm=args.num_perm, bands=args.bands)
+    articles = [build_article(rng, args.chars) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    for article in articles:
+        index.add(article)
+    for _ in range(args.entries - len(articles)):
+        index.add_signature(array("H", os.urandom(2 * args.num_perm)), os.urandom(32))
+    build_time = time.perf_counter() - start
+    memory = index.memory_bytes()
+    growth = rss_bytes() - baseline
+
+    edited = [edit_article(article, rng) for article in articles]
+    unrelated = [build_article(rng, args.chars) for _ in range(args.queries)]
+    signature_ms, hit_ms, miss_ms, found = [], [], [], 0
+    for article, text in zip(articles, edited):
+        signature, elapsed = timed(index.signature, text)
+        signature_ms.append(elapsed)
+        matches, elapsed = timed(index.query_signature, signature)
+        hit_ms.append(elapsed)
+        found += bool(matches) and matches[0][0] == document_key(article)
+    false_positives = 0
+    for text in unrelated:
+        matches, elapsed = timed(index.query_signature, index.signature(text))
+        miss_ms.append(elapsed)
+        false_positives += bool(matches)
+
+    def summary(samples):
+        return (f"p50 {percentile(samples, 50):.3f}ms  p99 {percentile(samples, 99):.3f}ms  "
+                f"max {max(samples):.3f}ms")
+
+    print(f"条目数: {len(index)}（num_perm={args.num_perm}, bands={args.bands}, threshold={args.threshold}）")
+    print(f"写入耗时: {build_time:.1f}s（{build_time / args.entries * 1e6:.1f}µs/条）")
+    print(f"索引数组: {memory / 2 ** 20:.1f}MiB（{memory / len(index):.0f} 字节/条）")
+    if growth:
+        print(f"RSS 增量: {growth / 2 ** 20:.1f}MiB（{growth / len(index):.0f} 字节/条）")
+    print(f"签名计算（{args.chars} 字）: {summary(signature_ms)}")
+    print(f"查询（近似重复）: {summary(hit_ms)}  召回率 {found / len(articles):.1%}")
+    print(f"查询（无关文章）: {summary(miss_ms)}  误报 {false_positives}/{len(unrelated)}")
+
+
+if __name__ == "__main__":
+    main()
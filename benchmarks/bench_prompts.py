@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+提示词构建与前缀缓存基准测试
+
+1. 每次调用构建提示词的开销：旧实现每次新建 LangChain ``PromptTemplate`` 再格式化，
+   新实现使用启动时编译好的模板
+2. 前缀缓存命中率：桩 LLM 模拟服务商的前缀缓存（前缀至少 1024 token），对比
+   旧布局（任务指令在前、文档嵌在中间）与新布局（系统提示词 + 文档 + 任务指令）
+   在串行与并行执行模式下 ``cached_tokens / prompt_tokens`` 的比例
+
+运行方式：
+    python -m benchmarks.bench_prompts --documents 20 --length 3000
+"""
+
+import time
+import argparse
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.prompts import PromptTemplate
+
+from benchmarks.stub_llm import PrefixCache, StubChatModel
+from src.core.agent import EXECUTION_MODES, TextAnalysisAgent
+from src.core.models import TextAnalysisRequest
+from src.core.prompts import PromptRegistry, create_prompt_registry
+
+SAMPLE_SENTENCE = "近日，OpenAI 发布了最新的 GPT-4 模型，微软公司已经将其集成到产品中。"
+LEGACY_CLASSIFICATION = "将以下文本分类到以下类别之一：新闻、博客、研究、其他。\n\n文本：{text}\n\n类别：（只输出类别本身，不要理由）"
+
+
+class LegacyLayoutRegistry(PromptRegistry):
+    """旧布局：单条用户消息，任务指令在前，文档嵌在中间"""
+
+    def __init__(self):
+        super().__init__()
+        self._prompts = create_prompt_registry()._prompts
+
+    def messages(self, name: str, text: Optional[str] = None, **values: str) -> List[BaseMessage]:
+        instruction = self.get(name).render(**values)
+        if text is None:
+            return [HumanMessage(content=instruction)]
+        head, _, tail = instruction.partition("\n\n")
+        return [HumanMessage(content=f"{head}\n\n文本：{text}\n\n{tail}")]
+
+
+def bench_formatting(rounds: int, text: str) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        prompt = PromptTemplate(input_variables=["text"], template=LEGACY_CLASSIFICATION)
+        [HumanMessage(content=prompt.format(text=text))]
+    legacy = (time.perf_counter() - start) / rounds
+
+    registry = create_prompt_registry()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        registry.messages("classification", text)
+    compiled = (time.perf_counter() - start) / rounds
+    print(f"提示词构建：每次新建 PromptTemplate {legacy * 1e6:.1f}µs，"
+          f"预编译模板 {compiled * 1e6:.1f}µs（{legacy / compiled:.1f}x）\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词构建与前缀缓存基准测试")
+    parser.add_argument("--documents", type=int, default=20, help="分析的文档数")
+    parser.add_argument("--length", type=int, default=3000, help="每篇文档的长度（字符）")
+    parser.add_argument("--rounds", type=int, default=10000, help="提示词构建的重复次数")
+    parser.add_argument("--latency-per-1k", type=float, default=0.02, help="每 1000 个未缓存输入 token 的预填充延迟（秒）")
+    args = parser.parse_args()
+
+    base = (SAMPLE_SENTENCE * (args.length // len(SAMPLE_SENTENCE) + 1))[:args.length]
+    bench_formatting(args.rounds, base)
+
+    print(f"{'布局':<8} {'模式':<12} {'prompt tokens':>14} {'cached':>10} {'命中率':>8} {'耗时(s)':>8}")
+    for layout, registry in (("旧布局", LegacyLayoutRegistry()), ("新布局", create_prompt_registry())):
+        for mode in EXECUTION_MODES:
+            llm = StubChatModel(prefix_cache=PrefixCache(), latency=0.01,
+                                latency_per_1k_tokens=args.latency_per_1k)
+            agent = TextAnalysisAgent(llm=llm, execution_mode=mode, prompts=registry)
+            prompt_tokens = cached_tokens = 0
+            start = time.perf_counter()
+            for i in range(args.documents):
+                usage = agent.analyze(TextAnalysisRequest(text=f"{i}：{base}")).metadata["usage"]
+                prompt_tokens += usage["prompt_tokens"]
+                cached_tokens += usage["cached_tokens"]
+            elapsed = time.perf_counter() - start
+            print(f"{layout:<8} {mode:<12} {prompt_tokens:>14} {cached_tokens:>10} "
+                  f"{cached_tokens / prompt_tokens:>8.1%} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+流式分析首结果时间基准测试
+
+在后台启动服务（桩 LLM 按任务注入不同延迟），对比：
+- ``POST /api/v1/analyze``：全部任务完成后一次性返回
+- ``POST /api/v1/analyze/stream``：首个结果、首个摘要 token 与全部完成的时间
+
+运行方式：
+    python -m benchmarks.bench_stream --runs 5
+"""
+
+import json
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+import httpx
+
+from benchmarks.fake_openai_server import BackgroundServer
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.core.agent import TextAnalysisAgent
+from src.core.registry import AgentRegistry
+
+
+async def _measure(url: str, runs: int):
+    payload = {"text": "北京是中国的首都。"}
+    full, first_result, first_token, done = [], [], [], []
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        for _ in range(runs):
+            start = time.perf_counter()
+            (await client.post("/api/v1/analyze", json=payload)).raise_for_status()
+            full.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            seen_result = seen_token = False
+            async with client.stream("POST", "/api/v1/analyze/stream?stream_tokens=true", json=payload) as resp:
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)["event"]
+                    elapsed = time.perf_counter() - start
+                    if event == "result" and not seen_result:
+                        first_result.append(elapsed)
+                        seen_result = True
+                    elif event == "token" and not seen_token:
+                        first_token.append(elapsed)
+                        seen_token = True
+                    elif event == "done":
+                        done.append(elapsed)
+    return full, first_result, first_token, done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式分析首结果时间基准测试")
+    parser.add_argument("--classification-latency", type=float, default=0.3, help="分类调用延迟（秒）")
+    parser.add_argument("--entities-latency", type=float, default=0.6, help="实体提取调用延迟（秒）")
+    parser.add_argument("--summary-latency", type=float, default=0.5, help="摘要首 token 延迟（秒）")
+    parser.add_argument("--token-interval", type=float, default=0.05, help="摘要 token 间隔（秒）")
+    parser.add_argument("--runs", type=int, default=5, help="运行次数")
+    parser.add_argument("--port", type=int, default=9000, help="服务端口")
+    args = parser.parse_args()
+    for name in ("httpx", "src.api.middleware", "src.core.registry"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    llm = StubChatModel(
+        task_latency={
+            "classification": args.classification_latency,
+            "entities": args.entities_latency,
+            "summary": args.summary_latency,
+        },
+        token_interval=args.token_interval,
+    )
+    app = create_app()
+    app.state.rate_limiter = None  # 压测时不限流
+    app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=llm))
+    with BackgroundServer(app, args.port) as server:
+        full, first_result, first_token, done = asyncio.run(_measure(server.url, args.runs))
+
+    def ms(samples):
+        return f"{statistics.mean(samples) * 1000:8.1f}ms"
+
+    print(f"/analyze 完整响应            {ms(full)}")
+    print(f"/analyze/stream 首个结果     {ms(first_result)}")
+    print(f"/analyze/stream 首个摘要 token {ms(first_token)}")
+    print(f"/analyze/stream 全部完成     {ms(done)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+合成分类语料
+
+按类别拼接带有典型措辞的句子，并混入少量其他类别的句子制造歧义。
+``keyword_label`` 按关键词计分给出类别，充当“LLM 标注”，用于快速路径的
+训练、测试与基准测试。
+"""
+
+import random
+from typing import Dict, List, Tuple
+
+PHRASES: Dict[str, List[str]] = {
+    "新闻": [
+        "据新华社报道，", "记者昨日从发布会上获悉，", "官方通报称，", "截至发稿时，",
+        "相关部门表示将进一步调查。", "据悉，该事件发生在周二上午。", "市政府今日宣布，",
+    ],
+    "博客": [
+        "今天我想和大家分享一下，", "说实话我觉得", "周末我去了一趟", "欢迎在评论区留言。",
+        "作为一个普通上班族，", "最近我一直在折腾", "个人体验来说还是挺不错的。",
+    ],
+    "研究": [
+        "本文提出了一种新的方法，", "实验结果表明，", "与基线模型相比显著提升，",
+        "我们在三个公开数据集上进行了评估。", "消融实验验证了各模块的有效性。", "摘要：",
+        "相关工作部分回顾了已有研究。",
+    ],
+    "其他": [
+        "营业时间为上午九点至晚上八点。", "食材：鸡蛋两个、番茄一个。", "请于本周五前提交材料。",
+        "温馨提示：", "本产品保修期为一年。", "第一步，先将锅烧热。", "如有疑问请联系客服。",
+    ],
+}
+TOPICS = ["人工智能", "新能源汽车", "城市交通", "教育改革", "医疗健康", "气候变化", "电子商务", "航天工程"]
+
+
+def keyword_label(text: str) -> str:
+    """按各类别典型措辞出现的次数打分，取最高者（模拟 LLM 的分类结果）"""
+    scores = {label: sum(phrase in text for phrase in phrases) for label, phrases in PHRASES.items()}
+    return max(scores, key=lambda label: (scores[label], label == "其他"))
+
+
+def generate_corpus(size: int, seed: int = 0, noise: float = 0.3) -> List[Tuple[str, str]]:
+    """生成 ``size`` 条 (文本, LLM 标注)；``noise`` 为混入其他类别句子的概率"""
+    rng = random.Random(seed)
+    labels = list(PHRASES)
+    samples = []
+    for _ in range(size):
+        label = rng.choice(labels)
+        topic = rng.choice(TOPICS)
+        parts = rng.sample(PHRASES[label], rng.randint(2, 3))
+        if rng.random() < noise:
+            other = rng.choice([item for item in labels if item != label])
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(PHRASES[other]))
+        text = "".join(parts) + f"本次内容涉及{topic}领域。"
+        samples.append((text, keyword_label(text)))
+    return samples
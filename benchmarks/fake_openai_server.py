@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+本地 OpenAI 兼容桩服务器
+
+实现 ``POST /v1/chat/completions``，按提示词内容返回固定结果并注入延迟，
+``ChatOpenAI`` 将 ``base_url`` 指向该服务即可在无网络环境下完成端到端压测。
+
+延迟模型：每次调用的首 token 延迟从 ``LatencyModel`` 描述的分布中采样
+（fixed / uniform / exponential / lognormal），之后按 ``tokens_per_second``
+逐 token 生成（按字符近似 token）；非流式响应等待全部生成完毕后返回，
+``"stream": true`` 的请求以 SSE 逐 token 推送。指定 ``seed`` 时延迟采样与
+错误注入可复现。
+
+故障注入：``error_rate`` 按比例随机返回 ``error_status``；``app.state.faults``
+是按调用顺序消费的故障队列，元素为 ``{"status": 503}``（返回错误）或
+``{"delay": 2.0}``（本次调用改用该延迟），便于测试重试、超时与对冲请求。
+
+``prefix_cache`` 开启时模拟服务商的前缀缓存，在 ``usage.prompt_tokens_details.cached_tokens``
+中报告命中的输入 token 数（见 ``PrefixCache``）。
+
+运行方式：
+    python -m benchmarks.fake_openai_server --port 9100 --latency 0.2
+    python -m benchmarks.fake_openai_server --latency 0.2 --latency-dist lognormal --spread 0.5 --tokens-per-second 50
+"""
+
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.stub_llm import PrefixCache, detect_task, render_response
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class LatencyModel:
+    """首 token 延迟分布（秒）
+
+    - ``fixed``：恒为 ``mean``
+    - ``uniform``：``mean ± spread`` 内均匀分布
+    - ``exponential``：均值为 ``mean`` 的指数分布（长尾）
+    - ``lognormal``：中位数为 ``mean``、对数标准差为 ``spread`` 的对数正态分布，
+      接近真实 LLM 服务的延迟形状
+    """
+
+    def __init__(self, distribution: str = "fixed", mean: float = 0.0, spread: float = 0.0):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"不支持的延迟分布: {distribution}，可选值: {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.distribution = distribution
+        self.mean = mean
+        self.spread = spread
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        if self.distribution == "exponential":
+            return rng.expovariate(1 / self.mean)
+        if self.distribution == "lognormal":
+            return rng.lognormvariate(math.log(self.mean), self.spread)
+        return self.mean
+
+
+def create_fake_openai_app(latency: float = 0.0, error_rate: float = 0.0,
+                           error_status: int = 503, prefix_cache: bool = False,
+                           latency_model: Optional[LatencyModel] = None,
+                           tokens_per_second: float = 0.0, seed: Optional[int] = None) -> FastAPI:
+    """创建桩服务器应用
+
+    未指定 ``latency_model`` 时每次调用固定延迟 ``latency`` 秒。
+    ``app.state.call_count`` 记录上游调用次数，``app.state.error_count`` 记录注入的
+    错误数，``app.state.connections`` 记录见过的客户端 (地址, 端口)，即建立过的 TCP 连接。
+    """
+    app = FastAPI(title="Fake OpenAI")
+    app.state.latency_model = latency_model or LatencyModel("fixed", latency)
+    app.state.tokens_per_second = tokens_per_second
+    app.state.rng = random.Random(seed)
+    app.state.error_rate = error_rate
+    app.state.error_status = error_status
+    app.state.faults = deque()
+    app.state.call_count = 0
+    app.state.error_count = 0
+    app.state.connections = set()
+    app.state.prefix_cache = PrefixCache() if prefix_cache else None
+
+    def token_interval() -> float:
+        return 1 / app.state.tokens_per_second if app.state.tokens_per_second > 0 else 0.0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        contents = [str(m.get("content", "")) for m in body.get("messages", [])]
+        prompt = "\n".join(contents)
+        task = detect_task(prompt)
+        app.state.call_count += 1
+        if request.client:
+            app.state.connections.add((request.client.host, request.client.port))
+        fault = app.state.faults.popleft() if app.state.faults else {}
+        status = fault.get("status")
+        if status is None and app.state.rng.random() < app.state.error_rate:
+            status = app.state.error_status
+        if status is not None:
+            app.state.error_count += 1
+            return JSONResponse(
+                {"error": {"message": f"injected error {status}", "type": "fake_error", "code": status}},
+                status_code=status,
+            )
+        cache = app.state.prefix_cache
+        cached = cache.lookup(contents) if cache else 0
+        delay = fault.get("delay", app.state.latency_model.sample(app.state.rng))
+        content = render_response(task, prompt)
+        usage = {
+            "prompt_tokens": len(prompt),
+            "completion_tokens": len(content),
+            "total_tokens": len(prompt) + len(content),
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "fake-model")
+
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            events = _stream_events(completion_id, model, content, usage if include_usage else None,
+                                    delay, token_interval())
+            if cache:
+                cache.store(contents)
+            return StreamingResponse(events, media_type="text/event-stream")
+
+        await asyncio.sleep(delay + token_interval() * max(len(content) - 1, 0))
+        if cache:
+            cache.store(contents)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    return app
+
+
+async def _stream_events(completion_id: str, model: str, content: str, usage: Optional[Dict[str, Any]],
+                         delay: float, interval: float) -> AsyncIterator[str]:
+    """以 OpenAI 流式格式逐字符推送回复，首个字符前等待 ``delay``，之后每个字符间隔 ``interval``"""
+    def event(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra: Any) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+    await asyncio.sleep(delay)
+    yield event({"role": "assistant", "content": ""})
+    for i, char in enumerate(content):
+        if i and interval:
+            await asyncio.sleep(interval)
+        yield event({"content": char})
+    yield event({}, "stop")
+    if usage is not None:
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                 "model": model, "choices": [], "usage": usage}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+class BackgroundServer:
+    """在后台线程中运行 uvicorn 服务，供基准测试脚本使用
+
+    ``port=0`` 时由系统分配空闲端口（CI 中避免端口冲突），启动后 ``url`` 为实际地址。
+    """
+
+    def __init__(self, app, port: int = 0, host: str = "127.0.0.1"):
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.host = host
+        self.url = f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"服务启动失败: {self.url}")
+            time.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        self.url = f"http://{self.host}:{port}"
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=9100, help="监听端口（默认：9100）")
+    parser.add_argument("--latency", type=float, default=0.2, help="首 token 延迟的均值/中位数（秒）")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed", help="延迟分布")
+    parser.add_argument("--spread", type=float, default=0.0,
+                        help="uniform 的半宽（秒）或 lognormal 的对数标准差")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="生成速度，0 表示瞬间生成")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回错误的比例")
+    parser.add_argument("--error-status", type=int, default=503, help="注入错误的 HTTP 状态码")
+    parser.add_argument("--prefix-cache", action="store_true", help="模拟服务商的前缀缓存")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，指定后延迟与错误注入可复现")
+    args = parser.parse_args()
+    app = create_fake_openai_app(
+        error_rate=args.error_rate, error_status=args.error_status, prefix_cache=args.prefix_cache,
+        latency_model=LatencyModel(args.latency_dist, args.latency, args.spread),
+        tokens_per_second=args.tokens_per_second, seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+单 worker 并发吞吐压测
+
+在后台启动本地 OpenAI 兼容桩服务器和文本分析服务（单个 uvicorn worker），
+以不同并发度请求 ``POST /api/v1/analyze``，观察吞吐是否随并发度线性增长。
+
+- ``--path async``：当前实现，路由 ``await agent.aanalyze``，节点使用 ``ainvoke``
+- ``--path blocking``：旧实现，在事件循环中直接调用同步 ``agent.analyze``
+
+运行方式：
+    python -m benchmarks.load_test --path async --latency 0.2
+    python -m benchmarks.load_test --path blocking --latency 0.2
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from benchmarks.fake_openai_server import BackgroundServer, create_fake_openai_app
+from src.api.app import create_app
+from src.core.agent import TextAnalysisAgent
+from src.core.registry import AgentRegistry
+
+
+class BlockingAgent(TextAnalysisAgent):
+    """模拟旧实现：在 async 端点中调用阻塞的同步分析"""
+
+    async def aanalyze(self, request):
+        return self.analyze(request)
+
+
+async def _drive(url: str, concurrency: int, total: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    payload = {"text": "北京是中国的首都。"}
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def one():
+            async with semaphore:
+                response = await client.post(f"{url}/api/v1/analyze", json=payload)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单 worker 并发吞吐压测")
+    parser.add_argument("--path", choices=["async", "blocking"], default="async", help="请求处理路径")
+    parser.add_argument("--latency", type=float, default=0.2, help="桩 LLM 每次调用延迟（秒）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="并发度列表")
+    parser.add_argument("--requests-per-level", type=int, default=32, help="每个并发度的请求总数")
+    parser.add_argument("--llm-port", type=int, default=9100, help="桩 LLM 端口")
+    parser.add_argument("--app-port", type=int, default=9000, help="文本分析服务端口")
+    args = parser.parse_args()
+
+    # 避免每个请求的访问日志干扰测量
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("src.api.middleware").setLevel(logging.WARNING)
+
+    fake_app = create_fake_openai_app(args.latency)
+    with BackgroundServer(fake_app, args.llm_port) as llm_server:
+        agent_class = TextAnalysisAgent if args.path == "async" else BlockingAgent
+
+        def factory():
+            llm = ChatOpenAI(model="fake-model", api_key="sk-load-test", base_url=f"{llm_server.url}/v1")
+            return agent_class(llm=llm)
+
+        app = create_app()
+
+        app.state.rate_limiter = None  # 压测时不限流
+        app.state.agent_registry = AgentRegistry(factory=factory)
+        with BackgroundServer(app, args.app_port) as app_server:
+            asyncio.run(_drive(app_server.url, 1, 2))  # 预热
+            print(f"路径: {args.path}  LLM 延迟: {args.latency * 1000:.0f}ms")
+            for concurrency in args.concurrency:
+                elapsed = asyncio.run(_drive(app_server.url, concurrency, args.requests_per_level))
+                print(f"并发 {concurrency:>3}  吞吐 {args.requests_per_level / elapsed:8.2f} req/s  "
+                      f"总耗时 {elapsed:6.2f}s")
+        print(f"上游 LLM 调用次数: {fake_app.state.call_count}")
+
+
+if __name__ == "__main__":
+    main()
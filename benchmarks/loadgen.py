@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+端到端负载生成与回归基准
+
+在后台启动本地 OpenAI 兼容桩服务器与文本分析服务（均使用系统分配的空闲端口），
+按生产配置构建智能体（``AgentRegistry`` 默认工厂，只把 ``OPENAI_BASE_URL`` 指向桩
+服务器），然后以固定 RPS（开环）或固定并发（闭环）请求 ``POST /api/v1/analyze``，
+报告吞吐、p50/p95/p99 延迟、错误分布与上游 LLM 调用次数。无需网络与 API 密钥，
+可直接在 CI 中运行：
+
+- ``--output report.json`` 保存报告；``--baseline`` 与之前的报告比较，p95 或吞吐
+  退化超过 ``--max-regression``、或每请求上游调用数增加时以非零状态退出
+- ``--max-p95-ms`` / ``--min-throughput`` / ``--max-error-rate`` 等绝对阈值同样会使
+  进程以非零状态退出
+
+开环模式下延迟从计划发送时间算起，服务跟不上时排队时间计入延迟，避免
+coordinated omission 让结果偏乐观。
+
+运行方式：
+    python -m benchmarks.loadgen --rps 20 --duration 10 --latency 0.2 --latency-dist lognormal --spread 0.4
+    python -m benchmarks.loadgen --concurrency 16 --requests 200 --output report.json
+    python -m benchmarks.loadgen --concurrency 16 --requests 200 --baseline report.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.classification_corpus import generate_corpus
+from benchmarks.fake_openai_server import (
+    LATENCY_DISTRIBUTIONS, BackgroundServer, LatencyModel, create_fake_openai_app
+)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """线性插值的分位数，``q`` 取 0~100"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class LoadReport:
+    """一次压测的结果"""
+
+    def __init__(self, latencies: List[float], statuses: Counter, duration: float,
+                 upstream_calls: int = 0, upstream_errors: int = 0):
+        self.latencies = latencies
+        self.statuses = statuses
+        self.duration = duration
+        self.upstream_calls = upstream_calls
+        self.upstream_errors = upstream_errors
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values())
+
+    @property
+    def succeeded(self) -> int:
+        return sum(count for status, count in self.statuses.items() if status.isdigit() and int(status) < 400)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ms = [latency * 1000 for latency in self.latencies]
+        requests = self.requests
+        return {
+            "requests": requests,
+            "succeeded": self.succeeded,
+            "error_rate": round(1 - self.succeeded / requests, 4) if requests else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+            "duration_s": round(self.duration, 3),
+            "throughput_rps": round(self.succeeded / self.duration, 2) if self.duration else 0.0,
+            "latency_ms": {
+                "mean": round(statistics.mean(ms), 1) if ms else 0.0,
+                "p50": round(percentile(ms, 50), 1),
+                "p95": round(percentile(ms, 95), 1),
+                "p99": round(percentile(ms, 99), 1),
+                "max": round(max(ms), 1) if ms else 0.0,
+            },
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "upstream_calls_per_request": round(self.upstream_calls / requests, 3) if requests else 0.0,
+        }
+
+
+async def run_load(client: httpx.AsyncClient, payload: Callable[[int], Dict[str, Any]], requests: int,
+                   concurrency: int, rps: Optional[float] = None,
+                   path: str = "/api/v1/analyze") -> LoadReport:
+    """发送 ``requests`` 个请求，同时在途的请求不超过 ``concurrency``
+
+    ``rps`` 为空时为闭环压测（请求完成后立即发下一个）；否则按固定间隔计划发送，
+    延迟从计划时间算起。连接错误与超时计入 ``statuses`` 中的异常类型名。
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    start = time.perf_counter()
+
+    async def one(i: int) -> None:
+        scheduled = start + i / rps if rps else None
+        if scheduled is not None:
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        async with semaphore:
+            sent = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                response = await client.post(path, json=payload(i))
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - sent)
+            statuses[status] += 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return LoadReport(latencies, statuses, time.perf_counter() - start)
+
+
+def corpus_payloads(size: int, seed: int = 0) -> Callable[[int], Dict[str, Any]]:
+    """按序号生成互不相同的请求体，避免结果缓存命中让结果失真"""
+    texts = [text for text, _ in generate_corpus(size, seed=seed)]
+    return lambda i: {"text": f"第{i}篇：{texts[i % len(texts)]}"}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """返回相对基线的退化项"""
+    problems = []
+    p95, base_p95 = report["latency_ms"]["p95"], baseline["latency_ms"]["p95"]
+    if base_p95 and p95 > base_p95 * (1 + max_regression):
+        problems.append(f"p95 {base_p95:.1f}ms -> {p95:.1f}ms")
+    throughput, base_throughput = report["throughput_rps"], baseline["throughput_rps"]
+    if base_throughput and throughput < base_throughput * (1 - max_regression):
+        problems.append(f"吞吐 {base_throughput:.2f} -> {throughput:.2f} req/s")
+    calls, base_calls = report["upstream_calls_per_request"], baseline["upstream_calls_per_request"]
+    if calls > base_calls + 1e-9:
+        problems.append(f"每请求上游调用 {base_calls:.3f} -> {calls:.3f}")
+    return problems
+
+
+def check_thresholds(report: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    problems = []
+    if args.max_p95_ms is not None and report["latency_ms"]["p95"] > args.max_p95_ms:
+        problems.append(f"p95 {report['latency_ms']['p95']:.1f}ms > {args.max_p95_ms}ms")
+    if args.max_p99_ms is not None and report["latency_ms"]["p99"] > args.max_p99_ms:
+        problems.append(f"p99 {report['latency_ms']['p99']:.1f}ms > {args.max_p99_ms}ms")
+    if args.min_throughput is not None and report["throughput_rps"] < args.min_throughput:
+        problems.append(f"吞吐 {report['throughput_rps']:.2f} < {args.min_throughput} req/s")
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        problems.append(f"错误率 {report['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if (args.max_upstream_calls_per_request is not None
+            and report["upstream_calls_per_request"] > args.max_upstream_calls_per_request):
+        problems.append(f"每请求上游调用 {report['upstream_calls_per_request']:.3f} > "
+                        f"{args.max_upstream_calls_per_request}")
+    return problems
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency_ms"]
+    print(f"请求 {report['requests']}（成功 {report['succeeded']}，错误率 {report['error_rate']:.2%}）"
+          f"  状态 {report['statuses']}")
+    print(f"吞吐 {report['throughput_rps']:.2f} req/s  耗时 {report['duration_s']:.2f}s")
+    print(f"延迟 mean {latency['mean']:.1f}ms  p50 {latency['p50']:.1f}ms  p95 {latency['p95']:.1f}ms  "
+          f"p99 {latency['p99']:.1f}ms  max {latency['max']:.1f}ms")
+    print(f"上游调用 {report['upstream_calls']}（错误 {report['upstream_errors']}，"
+          f"每请求 {report['upstream_calls_per_request']:.2f}）")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="端到端负载生成与回归基准")
+    load = parser.add_argument_group("负载")
+    load.add_argument("--requests", type=int, default=None, help="请求总数（默认 rps × duration，闭环时 100）")
+    load.add_argument("--rps", type=float, default=None, help="固定发送速率；不指定时为闭环压测")
+    load.add_argument("--duration", type=float, default=10.0, help="开环压测时长（秒）")
+    load.add_argument("--concurrency", type=int, default=16, help="最大在途请求数")
+    load.add_argument("--seed", type=int, default=0, help="文本语料与桩服务器的随机种子")
+    load.add_argument("--rate-limit", action="store_true", help="保留服务的限流配置（默认压测时关闭）")
+    upstream = parser.add_argument_group("桩 LLM")
+    upstream.add_argument("--latency", type=float, default=0.2, help="首 token 延迟的均值/中位数（秒）")
+    upstream.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="延迟分布")
+    upstream.add_argument("--spread", type=float, default=0.3, help="uniform 半宽（秒）或 lognormal 对数标准差")
+    upstream.add_argument("--tokens-per-second", type=float, default=0.0, help="生成速度，0 表示瞬间生成")
+    upstream.add_argument("--error-rate", type=float, default=0.0, help="上游随机返回错误的比例")
+    upstream.add_argument("--error-status", type=int, default=503, help="注入错误的 HTTP 状态码")
+    gate = parser.add_argument_group("报告与回归门禁")
+    gate.add_argument("--output", help="把报告写入 JSON 文件")
+    gate.add_argument("--baseline", help="与之前保存的报告比较")
+    gate.add_argument("--max-regression", type=float, default=0.2, help="相对基线允许的 p95 / 吞吐退化比例")
+    gate.add_argument("--max-p95-ms", type=float, default=None)
+    gate.add_argument("--max-p99-ms", type=float, default=None)
+    gate.add_argument("--min-throughput", type=float, default=None)
+    gate.add_argument("--max-error-rate", type=float, default=None)
+    gate.add_argument("--max-upstream-calls-per-request", type=float, default=None)
+    args = parser.parse_args(argv)
+    requests = args.requests or (int(args.rps * args.duration) if args.rps else 100)
+
+    for name in ("httpx", "src.api.access", "src.core.registry", "src.core.http_client"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    fake = create_fake_openai_app(
+        error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+        latency_model=LatencyModel(args.latency_dist, args.latency, args.spread),
+        tokens_per_second=args.tokens_per_second,
+    )
+    with BackgroundServer(fake) as llm_server:
+        # 智能体按生产路径构建（读取 OPENAI_* 环境变量），因此需在导入服务前设置
+        os.environ.update(OPENAI_API_KEY="sk-loadgen", OPENAI_BASE_URL=f"{llm_server.url}/v1",
+                          OPENAI_MODEL="fake-model")
+        from src.api.app import create_app
+
+        app = create_app()
+        if not args.rate_limit:
+            app.state.rate_limiter = None
+        with BackgroundServer(app) as app_server:
+            async def drive() -> LoadReport:
+                limits = httpx.Limits(max_connections=args.concurrency)
+                async with httpx.AsyncClient(base_url=app_server.url, timeout=300, limits=limits) as client:
+                    return await run_load(client, corpus_payloads(requests, args.seed), requests,
+                                          args.concurrency, args.rps)
+
+            result = asyncio.run(drive())
+    result.upstream_calls = fake.state.call_count
+    result.upstream_errors = fake.state.error_count
+    report = result.to_dict()
+    report["config"] = {key: value for key, value in vars(args).items()
+                        if key not in ("output", "baseline")}
+
+    mode = f"固定 {args.rps:g} RPS" if args.rps else "闭环"
+    print(f"模式 {mode}  并发上限 {args.concurrency}  上游延迟 {args.latency_dist}"
+          f"({args.latency * 1000:.0f}ms, spread {args.spread:g})")
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    problems = check_thresholds(report, args)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems += compare(report, json.load(f), args.max_regression)
+    for problem in problems:
+        print(f"❌ {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+本地桩 LLM
+
+实现 LangChain ``BaseChatModel`` 接口，按提示词内容返回固定结果，并按配置
+注入延迟，用于在无网络、无 API 密钥的环境下进行基准测试和单元测试。
+"""
+
+import re
+import json
+import hashlib
+import time
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+
+DEFAULT_RESPONSES = {
+    "classification": "新闻",
+    "entities": "北京, 中国",
+    "summary": "北京是中国的首都。",
+}
+DEFAULT_RESPONSES["oneshot"] = json.dumps(
+    {**DEFAULT_RESPONSES, "entities": ["北京", "中国"]}, ensure_ascii=False
+)
+
+
+# 批量分类提示词中的条目编号，如 "[3] "
+BATCH_ITEM = re.compile(r"^\[(\d+)\] ", re.MULTILINE)
+
+
+def detect_task(prompt: str) -> str:
+    """根据提示词内容判断任务类型"""
+    if "JSON" in prompt:
+        return "oneshot"
+    if "分类" in prompt and BATCH_ITEM.search(prompt):
+        return "classification_batch"
+    if "分类" in prompt:
+        return "classification"
+    if "实体" in prompt:
+        return "entities"
+    return "summary"
+
+
+def render_response(task: str, prompt: str, responses: Optional[Dict[str, str]] = None) -> str:
+    """生成任务的回复；批量分类按条目数逐行输出 “编号. 类别”"""
+    responses = responses or {}
+    if task == "classification_batch":
+        label = responses.get("classification", DEFAULT_RESPONSES["classification"])
+        return "\n".join(f"{number}. {label}" for number in BATCH_ITEM.findall(prompt))
+    return responses.get(task, DEFAULT_RESPONSES[task])
+
+
+class PrefixCache:
+    """模拟服务商的前缀缓存
+
+    按消息边界记录已完成请求的前缀。请求的前若干条消息与某个已完成的请求完全
+    相同、且长度不少于 ``min_tokens`` 时，这部分按字符近似的 token 计为命中缓存。
+    与真实服务一样，同时发出的请求之间无法互相命中。
+    """
+
+    def __init__(self, min_tokens: int = 1024):
+        self.min_tokens = min_tokens
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prefixes(contents: Sequence[str]):
+        digest = hashlib.sha256()
+        length = 0
+        for content in contents:
+            digest.update(content.encode("utf-8") + b"\0")
+            length += len(content)
+            yield digest.hexdigest(), length
+
+    def lookup(self, contents: Sequence[str]) -> int:
+        cached = 0
+        with self._lock:
+            for key, length in self._prefixes(contents):
+                if key not in self._seen:
+                    break
+                cached = length
+        return cached if cached >= self.min_tokens else 0
+
+    def store(self, contents: Sequence[str]) -> None:
+        with self._lock:
+            self._seen.update(key for key, _ in self._prefixes(contents))
+
+
+class StubChatModel(BaseChatModel):
+    """注入可配置延迟的桩聊天模型"""
+
+    latency: float = 0.0
+    latency_per_1k_tokens: float = 0.0
+    token_interval: float = 0.0
+    task_latency: Dict[str, float] = {}
+    responses: Dict[str, str] = {}
+    model_name: str = "stub-llm"
+    prefix_cache: Optional[PrefixCache] = None
+    call_count: int = 0
+    calls: List[str] = []
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _prompt(self, messages: List[BaseMessage]) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    def _record(self, prompt: str) -> str:
+        task = detect_task(prompt)
+        with self._lock:
+            self.call_count += 1
+            self.calls.append(task)
+        return task
+
+    def _delay(self, task: str, prompt: str, cached: int = 0) -> float:
+        # 固定延迟 + 与未命中缓存的输入长度成正比的预填充延迟（按字符近似 token）
+        if task == "classification_batch":
+            task = "classification"
+        prefill = max(len(prompt) - cached, 0) / 1000 * self.latency_per_1k_tokens
+        return self.task_latency.get(task, self.latency) + prefill
+
+    def _total_delay(self, task: str, prompt: str, cached: int = 0) -> float:
+        # 非流式调用需要等待全部 token 生成完毕
+        content = render_response(task, prompt, self.responses)
+        return self._delay(task, prompt, cached) + self.token_interval * max(len(content) - 1, 0)
+
+    def _cache_lookup(self, messages: List[BaseMessage]) -> int:
+        if self.prefix_cache is None:
+            return 0
+        return self.prefix_cache.lookup([str(m.content) for m in messages])
+
+    def _cache_store(self, messages: List[BaseMessage]) -> None:
+        if self.prefix_cache is not None:
+            self.prefix_cache.store([str(m.content) for m in messages])
+
+    @staticmethod
+    def _with_cached_tokens(result: ChatResult, cached: int) -> ChatResult:
+        if cached:
+            usage = result.generations[0].message.usage_metadata
+            usage["input_token_details"] = {"cache_read": cached}
+        return result
+
+    def _result(self, prompt: str, task: str) -> ChatResult:
+        content = render_response(task, prompt, self.responses)
+        usage = {
+            "input_tokens": len(prompt),
+            "output_tokens": len(content),
+            "total_tokens": len(prompt) + len(content),
+        }
+        message = AIMessage(content=content, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        task = self._record(prompt)
+        cached = self._cache_lookup(messages)
+        time.sleep(self._total_delay(task, prompt, cached))
+        self._cache_store(messages)
+        return self._with_cached_tokens(self._result(prompt, task), cached)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        task = self._record(prompt)
+        cached = self._cache_lookup(messages)
+        await asyncio.sleep(self._total_delay(task, prompt, cached))
+        self._cache_store(messages)
+        return self._with_cached_tokens(self._result(prompt, task), cached)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        # 首个 token 前等待固定延迟，之后按 token_interval 逐字输出
+        prompt = self._prompt(messages)
+        task = self._record(prompt)
+        cached = self._cache_lookup(messages)
+        await asyncio.sleep(self._delay(task, prompt, cached))
+        self._cache_store(messages)
+        message = self._with_cached_tokens(self._result(prompt, task), cached).generations[0].message
+        content = message.content
+        for i, char in enumerate(content):
+            last = i == len(content) - 1
+            chunk = AIMessageChunk(content=char, usage_metadata=message.usage_metadata if last else None)
+            if run_manager:
+                await run_manager.on_llm_new_token(char, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+            if not last:
+                await asyncio.sleep(self.token_interval)
@@ -8,7 +8,7 @@
 import asyncio
 import requests
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 
 class TextAnalysisClient:
@@ -60,6 +60,35 @@ class TextAnalysisClient:
         except requests.exceptions.RequestException as e:
             raise Exception(f"API请求失败: {e}")
     
+    def analyze_batch(
+        self,
+        texts: List[str],
+        max_concurrency: Optional[int] = None,
+        **options: Any
+    ) -> Dict[str, Any]:
+        """
+        批量分析文本
+        
+        Args:
+            texts: 要分析的文本列表
+            max_concurrency: 服务端最大并发数（不超过服务配置的上限）
+            **options: 每条文本共用的分析选项，如 include_summary=False
+            
+        Returns:
+            批量分析结果字典，results 中逐条包含 result 或 error
+        """
+        url = f"{self.base_url}/analyze/batch"
+        payload: Dict[str, Any] = {"items": [{"text": text, **options} for text in texts]}
+        if max_concurrency is not None:
+            payload["max_concurrency"] = max_concurrency
+        
+        try:
+            response = requests.post(url, json=payload, timeout=300)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"批量分析请求失败: {e}")
+    
     def get_health(self) -> Dict[str, Any]:
         """获取服务健康状态"""
         url = f"{self.base_url}/health"
@@ -150,21 +179,24 @@ def main():
     test_text = "这是一个性能测试的示例文本。"
     
     import time
-    start_time = time.time()
-    success_count = 0
     total_requests = 5
+    texts = [f"{test_text}（第 {i + 1} 篇）" for i in range(total_requests)]
     
-    for i in range(total_requests):
-        try:
-            result = client.analyze_text(test_text)
-            success_count += 1
-        except Exception as e:
-            print(f"   请求 {i+1} 失败: {e}")
+    start_time = time.time()
+    try:
+        batch = client.analyze_batch(texts)
+        for item in batch["results"]:
+            if item["error"]:
+                print(f"   请求 {item['index'] + 1} 失败: {item['error']}")
+        success_count = batch["succeeded"]
+    except Exception as e:
+        print(f"   ❌ 批量分析失败: {e}")
+        success_count = 0
     
     end_time = time.time()
     print(f"   完成 {success_count}/{total_requests} 个请求")
     print(f"   总耗时: {end_time - start_time:.2f}秒")
-    print(f"   平均响应时间: {(end_time - start_time) / total_requests:.2f}秒")
+    print(f"   平均每条耗时: {(end_time - start_time) / total_requests:.2f}秒")
     
     print("\n✅ 示例运行完成！")
 
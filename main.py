@@ -9,17 +9,12 @@ import os
 import sys
 from typing import TypedDict, List
 import argparse
-import uvicorn
-from src.api.app import create_app
+from dotenv import load_dotenv
+from src.server import run_server
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from langgraph.graph import StateGraph, END
-from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
-from dotenv import load_dotenv
 load_dotenv()
 
 # 兼容原版本的State定义
@@ -32,6 +27,12 @@ class State(TypedDict):
 
 def create_simple_agent():
     """创建简单的文本分析智能体（原版本兼容）"""
+    # langgraph / langchain 导入较慢，只在简单模式下使用，server 模式不加载
+    from langgraph.graph import StateGraph, END
+    from langchain.prompts import PromptTemplate
+    from langchain_openai import ChatOpenAI
+    from langchain.schema import HumanMessage
+    from src.core.http_client import get_http_clients, llm_timeout
     
     # 从环境变量获取配置
     api_key = os.getenv("OPENAI_API_KEY")
@@ -41,11 +42,16 @@ def create_simple_agent():
     base_url = os.getenv("OPENAI_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
     model = os.getenv("OPENAI_MODEL", "qwen-plus")
     
+    # 与服务端智能体共享进程级 HTTP 连接池
+    http_client, http_async_client = get_http_clients()
     llm = ChatOpenAI(
         model=model,
         temperature=0,
         api_key=api_key,
-        base_url=base_url
+        base_url=base_url,
+        timeout=llm_timeout(),
+        http_client=http_client,
+        http_async_client=http_async_client
     )
 
     def classification_node(state: State):
@@ -128,31 +134,17 @@ def start_api_server():
     """启动FastAPI服务器"""
     print("🚀 启动文本分析API服务器...")
     
-    try:
-        from src.main import app
-        import uvicorn
-        
-        # 从环境变量获取配置
-        host = os.getenv("APP_HOST", "0.0.0.0")
-        port = int(os.getenv("APP_PORT", "8000"))
-        debug = os.getenv("APP_DEBUG", "false").lower() == "true"
-        
-        uvicorn.run(
-            "src.main:app",
-            host=host,
-            port=port,
-            reload=debug
-        )
-    except ImportError as e:
-        print(f"❌ 无法启动API服务器: {e}")
-        print("请确保已安装所有依赖: pip install -r requirements.txt")
-        sys.exit(1)
+    debug = os.getenv("APP_DEBUG", "false").lower() == "true"
+    run_server(reload=debug)
 
 
 def main():
     parser = argparse.ArgumentParser(description="文本分析服务")
     parser.add_argument("mode", choices=["simple", "server"], help="运行模式：simple 或 server")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址（默认：0.0.0.0）")
     parser.add_argument("--port", type=int, default=8000, help="服务器端口号（默认：8000）")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker 进程数（默认取 APP_WORKERS，0 表示 CPU 核数）")
     args = parser.parse_args()
 
     if args.mode == "simple":
@@ -160,8 +152,7 @@ def main():
         run_simple_example()
     else:
         print("🚀 启动文本分析API服务器...")
-        app = create_app()
-        uvicorn.run(app, host="0.0.0.0", port=args.port)
+        run_server(host=args.host, port=args.port, workers=args.workers)
 
 
 if __name__ == "__main__":
@@ -1,29 +1,64 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from src.api.routes import router
-from src.api.middleware import RequestLoggingMiddleware
+from src.api.routes import metrics_router, router
+from src.api.middleware import setup_middleware
+from src.core.admission import create_rate_limiter
+from src.core.http_client import aclose_http_clients
+from src.core.jobs import create_job_manager
+from src.core.logs import configure_logging, shutdown_logging
+from src.core.metrics import mark_worker_dead
+from src.core.registry import AgentRegistry
+from src.core.tracing import configure_tracing, shutdown_tracing
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时安装日志与追踪导出、在后台预热共享智能体并启动任务队列，关闭时依次释放
+
+    uvicorn 在启动流程完成后才绑定端口，因此智能体（及其依赖的 langgraph / langchain）
+    在后台线程构建，不计入冷启动到端口可用的时间；``/api/v1/ready`` 在预热完成后返回 200。
+    """
+    registry = app.state.agent_registry
+    job_manager = app.state.job_manager
+    configure_logging()
+    configure_tracing()
+    registry.start_warmup()
+    await job_manager.start(registry.aget)
+    yield
+    await job_manager.stop()
+    registry.shutdown()
+    await aclose_http_clients()
+    shutdown_tracing()
+    shutdown_logging()
+    mark_worker_dead()
+
 
 def create_app() -> FastAPI:
-    """创建 FastAPI 应用"""
+    """创建 FastAPI 应用（服务、测试与基准测试共用的唯一入口）"""
     app = FastAPI(
         title="文本分析服务",
         description="提供文本分类、实体识别和摘要生成功能",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
+    app.state.agent_registry = AgentRegistry()
+    app.state.rate_limiter = create_rate_limiter()
+    app.state.job_manager = create_job_manager()
     
-    # 添加 CORS 中间件
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-    
-    # 添加请求日志中间件
-    app.add_middleware(RequestLoggingMiddleware)
+    # CORS 与请求日志中间件
+    setup_middleware(app)
     
     # 注册路由
     app.include_router(router, prefix="/api/v1")
+    app.include_router(metrics_router)
+
+    @app.get("/")
+    async def root():
+        """根路由"""
+        return {
+            "message": "欢迎使用文本分析智能体",
+            "docs_url": "/docs",
+            "version": app.version
+        }
     
-    return app 
\ No newline at end of file
+    return app 
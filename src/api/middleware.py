@@ -1,40 +1,127 @@
-from fastapi import Request
-from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 import time
+import random
 import logging
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import settings
+from src.core.logs import request_id_var
+from src.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS
+from src.core.tracing import SPAN_KIND_SERVER, parse_traceparent, span
+
+access_logger = logging.getLogger("src.api.access")
+
+# 客户端传入的请求 ID 过长时截断，避免日志被放大
+MAX_REQUEST_ID_LENGTH = 128
+
+
+class RequestLoggingMiddleware:
+    """请求日志中间件（纯 ASGI）
+
+    不使用 Starlette 的 ``BaseHTTPMiddleware``：后者为每个请求额外创建任务和内存流，
+    并且会经过一层流式响应的转发。这里只包装 ``send``，在响应开始时补充
+    ``traceparent`` 与请求 ID 响应头、记录状态码，流式响应原样透传。
+
+    - 请求 ID 取自 ``REQUEST_ID_HEADER`` 请求头，缺失时生成，并写入响应头与日志上下文
+    - 访问日志为结构化字段，按 ``ACCESS_LOG_SAMPLE_RATE`` 采样；5xx 与超过
+      ``ACCESS_LOG_SLOW_THRESHOLD`` 秒的请求总是记录
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: Optional[float] = None,
+                 slow_threshold: Optional[float] = None, request_id_header: Optional[str] = None):
+        self.app = app
+        self.sample_rate = settings.access_log_sample_rate if sample_rate is None else sample_rate
+        self.slow_threshold = settings.access_log_slow_threshold if slow_threshold is None else slow_threshold
+        header = request_id_header or settings.request_id_header
+        self.request_id_header = header.lower().encode("latin-1")
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """请求日志中间件"""
-    
-    async def dispatch(self, request: Request, call_next):
-        # 记录请求开始时间
-        start_time = time.time()
-        
-        # 处理请求
-        response = await call_next(request)
-        
-        # 计算处理时间
-        process_time = time.time() - start_time
-        
-        # 记录请求信息
-        logger.info(
-            f"Method: {request.method} "
-            f"Path: {request.url.path} "
-            f"Status: {response.status_code} "
-            f"Time: {process_time:.2f}s"
-        )
-        
-        return response
-
-
-def setup_middleware(app):
-    """设置中间件"""
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope["method"]
+        headers = dict(scope["headers"])
+        request_id = headers.get(self.request_id_header, b"").decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+        # 与 trace_id 相同，用 random 生成即可：请求 ID 不需要密码学强度，uuid4 每次都要读 urandom
+        request_id = request_id or f"{random.getrandbits(128):032x}"
+        token = request_id_var.set(request_id)
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        status_code = 500
+        route = "unmatched"
+        remote_parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1") or None)
+        try:
+            # 下游的路由、工作流和节点 span 都挂在这个 span 之下
+            with span("http.request", kind=SPAN_KIND_SERVER, remote_parent=remote_parent,
+                      **{"http.method": method}) as request_span:
+
+                async def send_wrapper(message: Message) -> None:
+                    nonlocal status_code
+                    if message["type"] == "http.response.start":
+                        status_code = message["status"]
+                        message["headers"] = list(message.get("headers", [])) + [
+                            (b"traceparent", request_span.traceparent.encode("latin-1")),
+                            (self.request_id_header, request_id.encode("latin-1")),
+                        ]
+                    await send(message)
+
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    route = _route_template(scope)
+                    request_span.name = f"{method} {route}"
+                    request_span.set_attribute("http.route", route)
+                    request_span.set_attribute("http.status_code", status_code)
+        finally:
+            in_progress.dec()
+            process_time = time.perf_counter() - start_time
+            HTTP_REQUEST_DURATION.labels(method, route, str(status_code)).observe(process_time)
+            if self._should_log(status_code, process_time):
+                self._log_access(scope, method, route, status_code, process_time)
+            request_id_var.reset(token)
+
+    def _should_log(self, status_code: int, process_time: float) -> bool:
+        if status_code >= 500 or process_time >= self.slow_threshold:
+            return True
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _log_access(self, scope: Scope, method: str, route: str, status_code: int,
+                    process_time: float) -> None:
+        # 消息参数与结构化字段都留给后台线程格式化，请求路径上只构造记录
+        client = scope.get("client")
+        fields: Dict[str, Any] = {
+            "method": method,
+            "path": scope["path"],
+            "route": route,
+            "status": status_code,
+            "duration_ms": round(process_time * 1000, 2),
+            "client": client[0] if client else None,
+        }
+        access_logger.info("%s %s %d %.1fms", method, scope["path"], status_code,
+                           process_time * 1000, extra=fields)
+
+
+def _route_template(scope: Scope) -> str:
+    """使用路由模板（如 /api/v1/jobs/{job_id}）作为指标标签，避免路径参数造成高基数"""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # 部分 FastAPI 版本中 include_router 的路由模板不含前缀，按路径段数补回
+    segments = scope["path"].split("/")
+    extra = len(segments) - len(template.split("/"))
+    if extra > 0 and ":path}" not in template:
+        return "/".join(segments[:extra + 1]) + template
+    return template
+
+
+def setup_middleware(app: FastAPI) -> None:
+    """设置中间件：请求日志在最外层，CORS 预检请求同样会被记录"""
     # CORS中间件
     app.add_middleware(
         CORSMiddleware,
@@ -43,6 +130,6 @@ def setup_middleware(app):
         allow_methods=["*"],
         allow_headers=["*"],
     )
-    
+
     # 请求日志中间件
-    app.add_middleware(RequestLoggingMiddleware) 
\ No newline at end of file
+    app.add_middleware(RequestLoggingMiddleware)
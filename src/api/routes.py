@@ -1,33 +1,173 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
-from src.core.agent import TextAnalysisAgent
+import json
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Literal
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from src.core.admission import AdmissionError
+from src.core.jobs import JobManager, check_callback_url
+from src.core.metrics import ANALYSIS_ERRORS, render_metrics
+from src.core.resilience import LLMCallError
+from src.config import settings
+from src.core.models import (
+    TextAnalysisRequest, TextAnalysisResponse, BatchAnalysisRequest, BatchAnalysisResponse,
+    JobRequest, JobStatusResponse
+)
 
-router = APIRouter()
+if TYPE_CHECKING:
+    from src.core.agent import TextAnalysisAgent
 
-class TextAnalysisRequest(BaseModel):
-    text: str
-    include_classification: bool = True
-    include_entities: bool = True
-    include_summary: bool = True
-    language: str = "zh"
+router = APIRouter()
+# /metrics 挂在根路径下，与 prometheus.yml 的默认 metrics_path 一致
+metrics_router = APIRouter()
 
-class TextAnalysisResponse(BaseModel):
-    classification: Optional[str] = None
-    entities: Optional[List[str]] = None
-    summary: Optional[str] = None
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标端点"""
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
 
 @router.get("/health")
 async def health_check():
-    """健康检查端点"""
+    """健康检查端点（存活探针）"""
     return {"status": "healthy"}
 
+@router.get("/ready")
+async def readiness_check(http_request: Request):
+    """就绪探针：共享智能体预热完成前返回 503"""
+    if not http_request.app.state.agent_registry.is_ready:
+        return JSONResponse({"status": "warming"}, status_code=503)
+    return {"status": "ready"}
+
+async def get_agent(http_request: Request) -> "TextAnalysisAgent":
+    """获取应用级共享的智能体实例，预热未完成时等待（不阻塞事件循环）"""
+    return await http_request.app.state.agent_registry.aget()
+
+def client_id(http_request: Request) -> str:
+    """限流使用的客户端标识：配置了 RATE_LIMIT_CLIENT_HEADER 时取该请求头，否则取来源地址"""
+    if settings.rate_limit_client_header:
+        value = http_request.headers.get(settings.rate_limit_client_header)
+        if value:
+            return value.split(",")[0].strip()
+    return http_request.client.host if http_request.client else "unknown"
+
+async def check_rate_limit(http_request: Request, cost: int = 1) -> None:
+    """按客户端与全局令牌桶限流，超限时返回 429 并附带 Retry-After"""
+    limiter = getattr(http_request.app.state, "rate_limiter", None)
+    if limiter is None:
+        return
+    try:
+        await limiter.acheck(client_id(http_request), cost)
+    except AdmissionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+
 @router.post("/analyze", response_model=TextAnalysisResponse)
-async def analyze_text(request: TextAnalysisRequest):
+async def analyze_text(request: TextAnalysisRequest, http_request: Request):
     """文本分析端点"""
+    await check_rate_limit(http_request)
     try:
-        agent = TextAnalysisAgent()
-        result = agent.analyze(request)
+        agent = await get_agent(http_request)
+        result = await agent.aanalyze(request)
         return result
+    except (AdmissionError, LLMCallError) as e:
+        ANALYSIS_ERRORS.labels("analyze", type(e).__name__).inc()
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except Exception as e:
+        ANALYSIS_ERRORS.labels("analyze", type(e).__name__).inc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _format_event(event: Dict[str, Any], fmt: str) -> str:
+    payload = json.dumps(event, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+@router.post("/analyze/stream")
+async def analyze_stream(
+    request: TextAnalysisRequest,
+    http_request: Request,
+    format: Literal["ndjson", "sse"] = Query("ndjson", description="输出格式：ndjson 或 sse"),
+    stream_tokens: bool = Query(False, description="是否逐 token 推送摘要")
+):
+    """流式文本分析端点：每个任务完成后立即推送结果"""
+    await check_rate_limit(http_request)
+    try:
+        agent = await get_agent(http_request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in agent.astream_analyze(request, stream_tokens=stream_tokens):
+                yield _format_event(event, format)
+        except Exception as e:
+            ANALYSIS_ERRORS.labels("stream", type(e).__name__).inc()
+            # 响应头已发送，错误只能作为事件推送给客户端
+            error = {"event": "error", "data": str(e)}
+            if isinstance(e, AdmissionError):
+                error["retry_after"] = e.headers["Retry-After"]
+            yield _format_event(error, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+def check_batch_size(request: BatchAnalysisRequest) -> None:
+    """批量请求条目数超过 BATCH_MAX_ITEMS 时返回 422"""
+    if len(request.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=422,
+            detail=f"批量请求最多包含 {settings.batch_max_items} 条，实际 {len(request.items)} 条"
+        )
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_batch(request: BatchAnalysisRequest, http_request: Request):
+    """批量文本分析端点：逐条返回结果或错误，单条失败不影响整个批次"""
+    check_batch_size(request)
+    # 批量请求按条目数扣除令牌
+    await check_rate_limit(http_request, cost=len(request.items))
+    try:
+        agent = await get_agent(http_request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    max_concurrency = min(request.max_concurrency or settings.batch_max_concurrency,
+                          settings.batch_max_concurrency)
+    return await agent.aanalyze_batch(request.items, max_concurrency)
+
+def get_job_manager(http_request: Request) -> JobManager:
+    return http_request.app.state.job_manager
+
+@router.post("/jobs", response_model=JobStatusResponse, status_code=202)
+async def submit_job(request: JobRequest, http_request: Request, response: Response):
+    """提交异步分析任务：立即返回任务 ID，结果通过 GET /jobs/{id} 或回调获取"""
+    check_batch_size(request)
+    if request.callback_url is not None:
+        try:
+            await check_callback_url(str(request.callback_url))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    await check_rate_limit(http_request, cost=len(request.items))
+    try:
+        job = await get_job_manager(http_request).submit(request)
+    except AdmissionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    response.headers["Location"] = str(http_request.url_for("get_job", job_id=job.id))
+    return job
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str, http_request: Request):
+    """查询异步分析任务的状态与结果"""
+    job = await get_job_manager(http_request).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    return job
+
+@router.get("/cache/stats")
+async def cache_stats(http_request: Request):
+    """结果缓存统计：命中、未命中、淘汰次数及当前条目数"""
+    try:
+        agent = await get_agent(http_request)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    if agent.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **agent.cache.stats()}
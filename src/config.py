@@ -1,6 +1,9 @@
 import os
+from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
+load_dotenv()
+
 
 class Settings(BaseSettings):
     """应用配置"""
@@ -14,17 +17,137 @@ class Settings(BaseSettings):
     app_host: str = os.getenv("APP_HOST", "0.0.0.0")
     app_port: int = int(os.getenv("APP_PORT", "8000"))
     app_debug: bool = os.getenv("APP_DEBUG", "false").lower() == "true"
+    # worker 进程数，0 表示 CPU 核数；多于 1 个时限流、缓存与任务默认改用共享的 SQLite 后端
+    app_workers: int = int(os.getenv("APP_WORKERS", "0"))
+    # 关闭或滚动重启时等待进行中请求完成的最长时间（秒）
+    app_graceful_timeout: int = int(os.getenv("APP_GRACEFUL_TIMEOUT", "30"))
     
     # 日志配置
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_format: str = os.getenv("LOG_FORMAT", "json")
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # 访问日志采样比例（0~1）；5xx 与慢请求总是记录
+    access_log_sample_rate: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+    access_log_slow_threshold: float = float(os.getenv("ACCESS_LOG_SLOW_THRESHOLD", "5"))
+    request_id_header: str = os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
     
     # 性能配置
     rate_limit_requests: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
     rate_limit_window: int = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    rate_limit_global_requests: int = int(os.getenv("RATE_LIMIT_GLOBAL_REQUESTS", "0"))
+    rate_limit_client_header: str = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+    # memory 为进程内令牌桶；sqlite 由同一主机上的所有 worker 共享额度
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    rate_limit_sqlite_path: str = os.getenv("RATE_LIMIT_SQLITE_PATH", "rate_limits.sqlite3")
+    # 等待其他 worker 释放 SQLite 写锁的最长时间（秒），超时后按 RATE_LIMIT_FAIL_OPEN 处理
+    rate_limit_sqlite_busy_timeout: float = float(os.getenv("RATE_LIMIT_SQLITE_BUSY_TIMEOUT", "0.2"))
+    # 限流状态不可用时放行（true）还是返回 503（false）
+    rate_limit_fail_open: bool = os.getenv("RATE_LIMIT_FAIL_OPEN", "true").lower() == "true"
+    
+    # LLM HTTP 连接池配置（所有 LLM 客户端共享）
+    llm_http2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    llm_max_keepalive_connections: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    llm_keepalive_expiry: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+    llm_connect_timeout: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    llm_read_timeout: float = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    llm_pool_timeout: float = float(os.getenv("LLM_POOL_TIMEOUT", "10"))
+    
+    # 上游 LLM 自适应并发配置
+    adaptive_concurrency_enabled: bool = os.getenv("ADAPTIVE_CONCURRENCY_ENABLED", "true").lower() == "true"
+    llm_concurrency_initial: int = int(os.getenv("LLM_CONCURRENCY_INITIAL", "8"))
+    llm_concurrency_min: int = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+    llm_concurrency_max: int = int(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+    llm_latency_tolerance: float = float(os.getenv("LLM_LATENCY_TOLERANCE", "2.0"))
+    llm_queue_max: int = int(os.getenv("LLM_QUEUE_MAX", "256"))
+    llm_queue_timeout: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+    
+    # 分析工作流配置
+    analysis_execution_mode: str = os.getenv("ANALYSIS_EXECUTION_MODE", "parallel")
+    analysis_engine: str = os.getenv("ANALYSIS_ENGINE", "graph")
+    
+    # LLM 调用容错配置
+    llm_request_budget: float = float(os.getenv("LLM_REQUEST_BUDGET", "120"))
+    llm_call_timeout: float = float(os.getenv("LLM_CALL_TIMEOUT", "60"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    llm_backoff_base: float = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+    llm_backoff_max: float = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+    llm_hedge_enabled: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    llm_hedge_quantile: float = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+    llm_hedge_min_samples: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    llm_fallback_model: str = os.getenv("LLM_FALLBACK_MODEL", "")
+    llm_fallback_base_url: str = os.getenv("LLM_FALLBACK_BASE_URL", "")
+    llm_fallback_api_key: str = os.getenv("LLM_FALLBACK_API_KEY", "")
+    llm_failover_cooldown: float = float(os.getenv("LLM_FAILOVER_COOLDOWN", "30"))
+
+    # 分类微批处理：窗口期内并发请求的分类合并为一次 LLM 调用（仅异步路径）
+    classification_batch_enabled: bool = os.getenv("CLASSIFICATION_BATCH_ENABLED", "false").lower() == "true"
+    classification_batch_window: float = float(os.getenv("CLASSIFICATION_BATCH_WINDOW", "0.01"))
+    classification_batch_max_size: int = int(os.getenv("CLASSIFICATION_BATCH_MAX_SIZE", "16"))
+
+    # 分类快速路径：本地模型置信度达到阈值时不调用 LLM；为空时不启用
+    fastpath_model_path: str = os.getenv("FASTPATH_MODEL_PATH", "")
+    fastpath_threshold: float = float(os.getenv("FASTPATH_THRESHOLD", "0.9"))
+    # 记录 LLM 分类结果（JSONL）作为快速路径训练数据；为空时不记录
+    classification_label_log: str = os.getenv("CLASSIFICATION_LABEL_LOG", "")
+
+    # 实体词典：为空时不启用；模式 merge 合并词典与 LLM 结果，narrow 让 LLM 只补充
+    # 词典之外的实体，skip 在词典命中不少于 ENTITY_GAZETTEER_MIN_MATCHES 个时不调用 LLM
+    entity_dictionary_path: str = os.getenv("ENTITY_DICTIONARY_PATH", "")
+    entity_gazetteer_mode: str = os.getenv("ENTITY_GAZETTEER_MODE", "merge")
+    entity_gazetteer_min_matches: int = int(os.getenv("ENTITY_GAZETTEER_MIN_MATCHES", "1"))
+    
+    # 长文档分块配置（单位：估算 token 数）
+    long_document_threshold: int = int(os.getenv("LONG_DOCUMENT_THRESHOLD", "8000"))
+    chunk_size: int = int(os.getenv("CHUNK_SIZE", "2000"))
+    chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "200"))
+    chunk_max_concurrency: int = int(os.getenv("CHUNK_MAX_CONCURRENCY", "8"))
+    summary_reduce_fanin: int = int(os.getenv("SUMMARY_REDUCE_FANIN", "8"))
+    
+    # 批量分析配置
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+    
+    # 异步任务配置：JOB_STORE 为 sqlite 时排队中的任务在重启后继续执行
+    job_workers: int = int(os.getenv("JOB_WORKERS", "4"))
+    job_queue_max: int = int(os.getenv("JOB_QUEUE_MAX", "1000"))
+    job_store: str = os.getenv("JOB_STORE", "memory")
+    job_sqlite_path: str = os.getenv("JOB_SQLITE_PATH", "analysis_jobs.sqlite3")
+    job_result_ttl: int = int(os.getenv("JOB_RESULT_TTL", "86400"))
+    job_webhook_timeout: float = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10"))
+    # 允许的回调主机，逗号分隔，".example.com" 匹配子域名；为空时只允许解析到公网地址的主机
+    job_callback_allowed_hosts: str = os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "")
+    # 异步任务中未指定 timeout 的条目的时间预算（秒），0 表示不限
+    job_request_budget: float = float(os.getenv("JOB_REQUEST_BUDGET", "0"))
+    
+    # 结果缓存配置
+    cache_enabled: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    cache_backend: str = os.getenv("CACHE_BACKEND", "memory")
+    cache_max_entries: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    cache_max_bytes: int = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    cache_ttl: int = int(os.getenv("CACHE_TTL", "0"))
+    cache_sqlite_path: str = os.getenv("CACHE_SQLITE_PATH", "analysis_cache.sqlite3")
+    
+    # 近似重复复用配置（依赖结果缓存）
+    neardup_enabled: bool = os.getenv("NEARDUP_ENABLED", "false").lower() == "true"
+    neardup_threshold: float = float(os.getenv("NEARDUP_THRESHOLD", "0.9"))
+    neardup_tasks: str = os.getenv("NEARDUP_TASKS", "classification,entities")
+    neardup_max_entries: int = int(os.getenv("NEARDUP_MAX_ENTRIES", "100000"))
+    neardup_shingle_size: int = int(os.getenv("NEARDUP_SHINGLE_SIZE", "3"))
+    neardup_num_perm: int = int(os.getenv("NEARDUP_NUM_PERM", "64"))
+    neardup_bands: int = int(os.getenv("NEARDUP_BANDS", "8"))
+    
+    # 请求追踪配置
+    tracing_exporter: str = os.getenv("TRACING_EXPORTER", "none")
+    tracing_file_path: str = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
+    tracing_otlp_endpoint: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    tracing_service_name: str = os.getenv("TRACING_SERVICE_NAME", "text-analysis-api")
     
     class Config:
         env_file = ".env"
         case_sensitive = True
+        extra = "ignore"
 
 
 # 创建全局配置实例
@@ -0,0 +1,392 @@
+"""
+准入控制
+
+- ``RateLimiter``：全局与按客户端的令牌桶限流，超限时返回 429；
+  ``SQLiteRateLimiter`` 把令牌桶保存在 SQLite 中，多个 worker 进程共享同一份额度，
+  检查在专用线程中执行，不阻塞事件循环
+- ``AdaptiveConcurrencyLimiter``：按 AIMD 调整并发上游 LLM 调用上限，
+  超过上限的调用进入有界等待队列，队列满或等待超时返回 503
+
+两类拒绝都携带 ``retry_after``（秒），由路由转换为 ``Retry-After`` 响应头。
+"""
+
+import math
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from .metrics import (
+    ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_WAIT, ADMISSION_REJECTIONS, LLM_CONCURRENCY_LIMIT
+)
+from .tracing import span
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionError(Exception):
+    """请求未被准入"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class RateLimited(AdmissionError):
+    """超过请求速率限制"""
+
+    status_code = 429
+
+
+class Overloaded(AdmissionError):
+    """上游 LLM 并发已满且等待队列已满或等待超时"""
+
+    status_code = 503
+
+
+class TokenBucket:
+    """令牌桶：容量为 ``capacity``，每秒补充 ``rate`` 个令牌"""
+
+    def __init__(self, capacity: float, rate: float, tokens: Optional[float] = None,
+                 updated: Optional[float] = None):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity if tokens is None else tokens
+        self.updated = time.monotonic() if updated is None else updated
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """令牌足够时返回 0，否则返回还需等待的秒数"""
+        self._refill(now)
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def consume(self, cost: float) -> None:
+        self.tokens -= min(cost, self.capacity)
+
+
+class RateLimiter:
+    """全局 + 按客户端的令牌桶限流
+
+    每个客户端在 ``window`` 秒内最多 ``requests`` 个请求（允许一次性突发用完），
+    ``global_requests`` 大于 0 时所有客户端共享一个同窗口的全局桶。客户端桶按
+    LRU 保留最多 ``max_clients`` 个，被淘汰的客户端重新获得满桶。
+    """
+
+    def __init__(self, requests: int, window: float, global_requests: int = 0,
+                 max_clients: int = 10000):
+        if requests <= 0 or window <= 0:
+            raise ValueError("requests 与 window 必须大于 0")
+        self.requests = requests
+        self.window = window
+        self.max_clients = max_clients
+        self.global_bucket = (
+            TokenBucket(global_requests, global_requests / window) if global_requests > 0 else None
+        )
+        self._clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _client_bucket(self, client: str) -> TokenBucket:
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = self._clients[client] = TokenBucket(self.requests, self.requests / self.window)
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return bucket
+
+    def check(self, client: str, cost: int = 1) -> None:
+        """为客户端扣除 ``cost`` 个令牌，超限时抛出 ``RateLimited``（不扣除任何令牌）"""
+        now = time.monotonic()
+        with self._lock:
+            self._take(self._client_bucket(client), self.global_bucket, cost, now)
+
+    async def acheck(self, client: str, cost: int = 1) -> None:
+        """异步版本的 ``check``，供请求路径调用；进程内令牌桶只涉及内存操作，直接执行"""
+        self.check(client, cost)
+
+    def _take(self, bucket: TokenBucket, global_bucket: Optional[TokenBucket], cost: int, now: float) -> None:
+        client_wait = bucket.wait_time(cost, now)
+        global_wait = global_bucket.wait_time(cost, now) if global_bucket else 0.0
+        if client_wait or global_wait:
+            reason = "rate_limited_client" if client_wait >= global_wait else "rate_limited_global"
+            ADMISSION_REJECTIONS.labels(reason).inc()
+            raise RateLimited(
+                f"请求过于频繁，限制为每 {self.window:g} 秒 {self.requests} 次",
+                retry_after=max(client_wait, global_wait),
+            )
+        bucket.consume(cost)
+        if global_bucket:
+            global_bucket.consume(cost)
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """令牌桶保存在 SQLite 中的限流器，同一主机上的多个 worker 进程共享额度
+
+    每次检查在 ``BEGIN IMMEDIATE`` 事务中读取并更新客户端桶与全局桶，多进程
+    并发检查时按顺序扣减，不会超发。时间使用墙上时钟（各进程一致）。空闲超过
+    ``window`` 秒的桶已经补满，与不存在等价，定期删除以限制表大小（取代进程内
+    实现的 LRU 上限）。
+
+    ``acheck`` 在专用线程中执行检查，等待写锁最多 ``busy_timeout`` 秒；仍未取得锁
+    （或数据库出错）时按 ``fail_open`` 放行请求，或以 503 拒绝。
+    """
+
+    GLOBAL_KEY = "\0global"
+    # 每多少次检查清理一次空闲桶
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, requests: int, window: float, global_requests: int = 0,
+                 busy_timeout: float = 0.2, fail_open: bool = True):
+        super().__init__(requests, window, global_requests)
+        self.path = path
+        self.fail_open = fail_open
+        self._checks = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit")
+        # 由 _lock 串行化本进程内的访问，事务边界显式控制；多个 worker 同时启动时建表
+        # 可能需要等待较久，之后的检查只等待 busy_timeout
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated ON rate_limit_buckets(updated)"
+        )
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+
+    def _load(self, key: str, capacity: float, now: float) -> TokenBucket:
+        row = self._conn.execute(
+            "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+        ).fetchone()
+        tokens, updated = row if row is not None else (capacity, now)
+        return TokenBucket(capacity, capacity / self.window, tokens, updated)
+
+    async def acheck(self, client: str, cost: int = 1) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.check, client, cost)
+
+    def check(self, client: str, cost: int = 1) -> None:
+        try:
+            self._check(client, cost, time.time())
+        except sqlite3.OperationalError as e:
+            if self.fail_open:
+                logger.warning("限流状态暂不可用，放行请求: %s", e)
+                return
+            ADMISSION_REJECTIONS.labels("rate_limit_unavailable").inc()
+            raise Overloaded("限流状态暂不可用，请稍后重试", retry_after=1) from e
+
+    def _check(self, client: str, cost: int, now: float) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                bucket = self._load(client, self.requests, now)
+                global_bucket = (
+                    self._load(self.GLOBAL_KEY, self.global_bucket.capacity, now) if self.global_bucket else None
+                )
+                self._take(bucket, global_bucket, cost, now)
+                rows = [(client, bucket.tokens, bucket.updated)]
+                if global_bucket:
+                    rows.append((self.GLOBAL_KEY, global_bucket.tokens, global_bucket.updated))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)", rows
+                )
+                self._checks += 1
+                if self._checks % self.PRUNE_EVERY == 0:
+                    self._conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - self.window,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """上游限流（429/503）或超时，说明当前并发已超出上游承受能力"""
+    if getattr(error, "status_code", None) in (429, 503):
+        return True
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in type(error).__name__
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发上限
+
+    每次成功调用后比较近期延迟（短窗口 EWMA）与基线延迟（长窗口 EWMA）：
+    近期延迟未超过基线的 ``latency_tolerance`` 倍时上限加性增长（每 ``limit``
+    次成功约 +1）；延迟明显上升、上游返回 429/503 或超时，则上限乘以
+    ``backoff``，且每个近期延迟周期内最多下降一次，避免同一波拥塞连续减半。
+
+    超过上限的调用按 FIFO 进入等待队列，队列长度达到 ``max_queue`` 或等待
+    超过 ``queue_timeout`` 秒时抛出 ``Overloaded``。所有状态只在事件循环线程中修改。
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 64,
+                 latency_tolerance: float = 2.0, backoff: float = 0.5,
+                 max_queue: int = 256, queue_timeout: float = 30.0):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("并发上限需满足 1 <= min_limit <= initial <= max_limit")
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.recent_latency: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        LLM_CONCURRENCY_LIMIT.set(initial)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def has_capacity(self) -> bool:
+        """当前是否有空闲名额（无需排队）"""
+        return self.in_flight < int(self.limit) and not self._waiters
+
+    def on_overload(self) -> None:
+        """在名额之外观察到的过载信号（如调用方超时取消）"""
+        self._decrease()
+
+    def estimated_wait(self) -> float:
+        """按当前队列长度、近期延迟和并发上限估算排到的等待时间"""
+        latency = self.recent_latency or 1.0
+        return (len(self._waiters) + 1) * latency / max(int(self.limit), 1)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """占用一个上游调用名额，并根据调用结果调整上限"""
+        with span("llm.queue"):
+            await self._acquire()
+        start = time.perf_counter()
+        outcome = "ignored"
+        try:
+            yield
+            outcome = "success"
+        except BaseException as e:
+            if is_overload_error(e):
+                outcome = "overload"
+            raise
+        finally:
+            self._release(outcome, time.perf_counter() - start)
+
+    async def _acquire(self) -> None:
+        if self.has_capacity():
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_REJECTIONS.labels("queue_full").inc()
+            raise Overloaded("上游 LLM 并发已满，等待队列已满", retry_after=self.estimated_wait())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 名额已分配但调用方超时或被取消，归还名额
+                self.in_flight -= 1
+                self._wake()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            ADMISSION_REJECTIONS.labels("queue_timeout").inc()
+            raise Overloaded(
+                f"等待上游 LLM 名额超过 {self.queue_timeout:g} 秒", retry_after=self.estimated_wait()
+            ) from None
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+            ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+            ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start)
+
+    def _release(self, outcome: str, latency: float) -> None:
+        self.in_flight -= 1
+        if outcome == "overload":
+            self._decrease()
+        elif outcome == "success":
+            self._observe(latency)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+
+    def _observe(self, latency: float) -> None:
+        if self.recent_latency is None:
+            self.recent_latency = self.baseline_latency = latency
+        else:
+            self.recent_latency += 0.2 * (latency - self.recent_latency)
+            self.baseline_latency += 0.02 * (latency - self.baseline_latency)
+        if self.recent_latency > self.baseline_latency * self.latency_tolerance:
+            self._decrease()
+        elif self.in_flight + 1 >= self.limit / 2:
+            # 只有名额确实被用到一半以上时才增长，避免低负载时上限无意义地膨胀
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            LLM_CONCURRENCY_LIMIT.set(int(self.limit))
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self.recent_latency or 0.0):
+            return
+        self._last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        LLM_CONCURRENCY_LIMIT.set(int(self.limit))
+        if int(self.limit) != previous:
+            logger.warning("上游 LLM 过载，并发上限 %d -> %d", previous, int(self.limit))
+
+
+def create_rate_limiter() -> Optional[RateLimiter]:
+    """根据配置创建请求限流器，未启用时返回 None"""
+    if not settings.rate_limit_enabled:
+        return None
+    if settings.rate_limit_backend == "sqlite":
+        return SQLiteRateLimiter(settings.rate_limit_sqlite_path, settings.rate_limit_requests,
+                                 settings.rate_limit_window, settings.rate_limit_global_requests,
+                                 busy_timeout=settings.rate_limit_sqlite_busy_timeout,
+                                 fail_open=settings.rate_limit_fail_open)
+    if settings.rate_limit_backend != "memory":
+        raise ValueError(f"不支持的限流后端: {settings.rate_limit_backend}，可选值: memory, sqlite")
+    return RateLimiter(settings.rate_limit_requests, settings.rate_limit_window,
+                       settings.rate_limit_global_requests)
+
+
+def create_llm_limiter() -> Optional[AdaptiveConcurrencyLimiter]:
+    """根据配置创建上游 LLM 自适应并发限制器，未启用时返回 None"""
+    if not settings.adaptive_concurrency_enabled:
+        return None
+    return AdaptiveConcurrencyLimiter(
+        initial=settings.llm_concurrency_initial,
+        min_limit=settings.llm_concurrency_min,
+        max_limit=settings.llm_concurrency_max,
+        latency_tolerance=settings.llm_latency_tolerance,
+        max_queue=settings.llm_queue_max,
+        queue_timeout=settings.llm_queue_timeout,
+    )
@@ -1,94 +1,821 @@
 import os
+import re
+import json
+import math
 import time
-from typing import Dict, Any
-from langgraph.graph import StateGraph, END
-from langchain.prompts import PromptTemplate
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Sequence, Tuple, TypedDict
+from langgraph.graph import StateGraph, START, END
 from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from .models import TextAnalysisRequest, TextAnalysisResponse
+from .models import (
+    TextAnalysisRequest, TextAnalysisResponse, OneShotAnalysisResult,
+    BatchAnalysisResponse, BatchItemResult
+)
+from .admission import AdaptiveConcurrencyLimiter
+from .cache import ResultCache, make_cache_key
+from .callbacks import UsageCallbackHandler
+from .chunking import chunk_text, estimate_tokens, merge_entities
+from .entities import ENTITY_MODES, Gazetteer, parse_entity_list
+from .fastpath import LabelLog, NgramClassifier
+from .http_client import get_http_clients, llm_timeout
+from .metrics import (
+    ANALYSES_IN_PROGRESS, ANALYSIS_ERRORS, CACHE_EVENTS, CLASSIFICATION_FASTPATH,
+    ENTITY_LLM_SKIPPED, GAZETTEER_ENTITIES
+)
+from .microbatch import ClassificationBatcher
+from .prompts import ENGINE_PROMPTS, PROMPTS, PromptRegistry
+from .resilience import DeadlineExceeded, LLMInvoker, RetryPolicy, current_default_budget, request_budget
+from .singleflight import SingleFlight
+from .tracing import Timings, collect_timings, span
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# 工作流执行模式
+EXECUTION_MODES = ("sequential", "parallel")
+
+# 分析任务（结果字段）与工作流节点的对应关系，按原串行链路顺序排列
+TASK_NODES = {
+    "classification": "classification",
+    "entities": "entity_extraction",
+    "summary": "summarization",
+}
+ALL_TASKS = tuple(TASK_NODES)
+
+# 分析引擎：graph 为每个任务单独调用 LLM，oneshot 用一次结构化输出调用完成全部任务
+ANALYSIS_ENGINES = ("graph", "oneshot")
+
+# oneshot 提示词中各任务对应的 JSON 字段说明
+ONESHOT_FIELDS = {
+    "classification": '"classification"：文本类别，只能是 新闻、博客、研究、其他 之一',
+    "entities": '"entities"：文本中所有实体（人物、组织、地点）组成的字符串数组',
+    "summary": '"summary"：用一句话总结文本',
+}
+
+
+class AnalysisState(TypedDict, total=False):
+    """工作流状态：每个节点只写入自己负责的字段，因此可以并行执行"""
+    text: str
+    classification: str
+    entities: List[str]
+    summary: str
+
 
 class TextAnalysisAgent:
-    """文本分析智能体"""
-    def __init__(self):
-        self.llm = self._create_llm()
-        self.workflow = self._create_workflow()
+    """文本分析智能体
+
+    LLM 客户端与编译后的工作流在构造时创建一次，之后可被多个请求复用，
+    因此服务端应通过 ``AgentRegistry`` 共享同一个实例，而不是每个请求新建。
+
+    三个分析节点互不依赖，``parallel`` 模式下以扇出/扇入拓扑并发执行，
+    端到端延迟接近最慢的单次 LLM 调用；``sequential`` 模式保留原有的串行链路。
+
+    工作流按请求所需的任务组合裁剪，只包含被请求的节点，编译结果按任务组合缓存。
+
+    ``oneshot`` 引擎把全部任务合并为一次返回 JSON 的调用，长文本只需发送一次。
+
+    超过 ``LONG_DOCUMENT_THRESHOLD`` 的长文档按句子切块后 map-reduce：分类只看首块，
+    实体与摘要逐块并行提取，再合并去重实体、分层归约摘要。
+
+    传入 ``cache`` 时按任务缓存结果，命中的任务不再调用 LLM；缓存配置了近似重复索引时，
+    精确未命中的任务可复用相似文本的结果（见 ``neardup``）。异步路径上相同
+    (文本, 模型, 提示词版本, 任务) 的并发请求会合并为一次计算（single-flight），
+    只请求摘要的请求也可以复用正在进行的完整分析中的摘要结果。
+
+    传入 ``limiter`` 时异步路径上的每次 LLM 调用都需先取得名额，并发上限随
+    上游延迟和 429 自适应调整，超出上限的调用排队等待。
+
+    所有 LLM 调用经过 ``LLMInvoker``：按请求的时间预算设置超时，瞬时错误带抖动
+    重试，可选对冲请求，主模型不可用时转移到 ``fallback_llm``。
+
+    开启 ``batch_classification`` 时，异步路径上并发请求的分类在短时间窗口内
+    合并为一次多条目调用（见 ``ClassificationBatcher``）。
+
+    传入 ``fast_classifier`` 时分类节点先用本地模型预测，置信度达到
+    ``fast_threshold`` 时不再调用 LLM；传入 ``label_log`` 时记录 LLM 给出的分类。
+
+    传入 ``gazetteer`` 时实体节点先用词典匹配已知实体，按 ``entity_mode`` 与 LLM
+    结果合并（merge）、只让 LLM 补充词典之外的实体（narrow），或在词典命中足够时
+    不调用 LLM（skip）。
+
+    提示词来自 ``prompts`` 注册表（默认为进程共享的 ``PROMPTS``），同一文档的各任务
+    调用共享“系统提示词 + 文档”前缀，便于命中服务商的前缀缓存。
+    """
+    def __init__(self, llm: Optional[ChatOpenAI] = None, execution_mode: Optional[str] = None,
+                 engine: Optional[str] = None, cache: Optional[ResultCache] = None,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 fallback_llm: Optional[ChatOpenAI] = None, retry_policy: Optional[RetryPolicy] = None,
+                 batch_classification: Optional[bool] = None,
+                 fast_classifier: Optional[NgramClassifier] = None, fast_threshold: Optional[float] = None,
+                 label_log: Optional[LabelLog] = None, gazetteer: Optional[Gazetteer] = None,
+                 entity_mode: Optional[str] = None, prompts: Optional[PromptRegistry] = None):
+        self.execution_mode = execution_mode or settings.analysis_execution_mode
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"不支持的执行模式: {self.execution_mode}，可选值: {', '.join(EXECUTION_MODES)}")
+        self.engine = engine or settings.analysis_engine
+        if self.engine not in ANALYSIS_ENGINES:
+            raise ValueError(f"不支持的分析引擎: {self.engine}，可选值: {', '.join(ANALYSIS_ENGINES)}")
+        self.cache = cache
+        self.limiter = limiter
+        self.prompts = prompts or PROMPTS
+        self.fast_classifier = fast_classifier
+        self.fast_threshold = settings.fastpath_threshold if fast_threshold is None else fast_threshold
+        self.label_log = label_log
+        self.gazetteer = gazetteer
+        self.entity_mode = entity_mode or settings.entity_gazetteer_mode
+        if self.entity_mode not in ENTITY_MODES:
+            raise ValueError(f"不支持的实体词典模式: {self.entity_mode}，可选值: {', '.join(ENTITY_MODES)}")
+        self._inflight = SingleFlight()
+        if llm is None:
+            llm = self._create_llm()
+            fallback_llm = fallback_llm or self._create_fallback_llm()
+        self.llm = llm
+        self.fallback_llm = fallback_llm
+        # OpenAI 兼容接口支持 JSON 模式，约束 oneshot 调用只输出合法 JSON
+        self.oneshot_llm = _json_mode(self.llm)
+        retry_policy = retry_policy or RetryPolicy.from_settings()
+        self.invoker = LLMInvoker([self.llm, fallback_llm], retry_policy, limiter)
+        self.oneshot_invoker = LLMInvoker([self.oneshot_llm, _json_mode(fallback_llm)], retry_policy, limiter)
+        if batch_classification is None:
+            batch_classification = settings.classification_batch_enabled
+        self.classification_batcher = ClassificationBatcher(
+            self.invoker,
+            batch_messages=self._classification_batch_messages,
+            single_messages=lambda text: self._classification_messages({"text": text}),
+            parse_single=lambda content: self._parse_classification(content)["classification"],
+            window=settings.classification_batch_window,
+            max_batch_size=settings.classification_batch_max_size,
+        ) if batch_classification else None
+        self.model_name = getattr(self.llm, "model_name", None) or os.getenv("OPENAI_MODEL", "qwen-plus")
+        self._workflows: Dict[Tuple[str, ...], Any] = {}
+        self._workflows_lock = threading.Lock()
+        self.workflow = self.get_workflow(ALL_TASKS)
 
     def _create_llm(self) -> ChatOpenAI:
         api_key = os.getenv("OPENAI_API_KEY")
         base_url = os.getenv("OPENAI_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
         model = os.getenv("OPENAI_MODEL", "qwen-plus")
-        print("API KEY:", api_key)
-        print("BASE URL:", base_url)
-        print("MODEL:", model)
         if not api_key:
             raise ValueError("请设置 OPENAI_API_KEY 环境变量")
+        logger.info("创建 LLM 客户端: model=%s base_url=%s", model, base_url)
+        http_client, http_async_client = get_http_clients()
         return ChatOpenAI(
             model=model,
             temperature=0,
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            # 重试由 LLMInvoker 统一处理，避免与 SDK 内置重试叠加
+            max_retries=0,
+            # 共享进程级连接池
+            timeout=llm_timeout(),
+            http_client=http_client,
+            http_async_client=http_async_client
         )
 
-    def _create_workflow(self) -> StateGraph:
-        workflow = StateGraph(dict)
-        workflow.add_node("classification", self._classification_node)
-        workflow.add_node("entity_extraction", self._entity_extraction_node)
-        workflow.add_node("summarization", self._summarization_node)
-        workflow.set_entry_point("classification")
-        workflow.add_edge("classification", "entity_extraction")
-        workflow.add_edge("entity_extraction", "summarization")
-        workflow.add_edge("summarization", END)
+    def _create_fallback_llm(self) -> Optional[ChatOpenAI]:
+        """配置了备用模型或地址时创建备用 LLM 客户端，未配置的项沿用主模型配置"""
+        if not settings.llm_fallback_model and not settings.llm_fallback_base_url:
+            return None
+        model = settings.llm_fallback_model or os.getenv("OPENAI_MODEL", "qwen-plus")
+        base_url = settings.llm_fallback_base_url or os.getenv(
+            "OPENAI_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
+        logger.info("创建备用 LLM 客户端: model=%s base_url=%s", model, base_url)
+        http_client, http_async_client = get_http_clients()
+        return ChatOpenAI(
+            model=model,
+            temperature=0,
+            api_key=settings.llm_fallback_api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=base_url,
+            max_retries=0,
+            timeout=llm_timeout(),
+            http_client=http_client,
+            http_async_client=http_async_client
+        )
+
+    def get_workflow(self, tasks: Tuple[str, ...]):
+        """获取只包含指定任务节点的编译工作流（按任务组合缓存）"""
+        workflow = self._workflows.get(tasks)
+        if workflow is None:
+            with self._workflows_lock:
+                workflow = self._workflows.get(tasks)
+                if workflow is None:
+                    workflow = self._create_workflow(tasks)
+                    self._workflows[tasks] = workflow
+        return workflow
+
+    def _create_workflow(self, tasks: Tuple[str, ...] = ALL_TASKS) -> StateGraph:
+        # 每个节点同时提供同步与异步实现：invoke 走同步路径，ainvoke 走异步路径
+        node_functions = {
+            "classification": RunnableLambda(
+                self._classification_node, afunc=self._aclassification_node, name="classification"),
+            "entity_extraction": RunnableLambda(
+                self._entity_extraction_node, afunc=self._aentity_extraction_node, name="entity_extraction"),
+            "summarization": RunnableLambda(
+                self._summarization_node, afunc=self._asummarization_node, name="summarization"),
+        }
+        nodes = [TASK_NODES[task] for task in ALL_TASKS if task in tasks]
+        if not nodes:
+            raise ValueError("至少需要一个分析任务")
+        workflow = StateGraph(AnalysisState)
+        for node in nodes:
+            workflow.add_node(node, node_functions[node])
+        if self.execution_mode == "parallel":
+            # 扇出：三个节点在同一步中并发执行；扇入：全部完成后结束
+            for node in nodes:
+                workflow.add_edge(START, node)
+                workflow.add_edge(node, END)
+        else:
+            workflow.add_edge(START, nodes[0])
+            for current, following in zip(nodes, nodes[1:]):
+                workflow.add_edge(current, following)
+            workflow.add_edge(nodes[-1], END)
         return workflow.compile()
 
-    def _classification_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        prompt = PromptTemplate(
-            input_variables=["text"],
-            template="将以下文本分类到以下类别之一：新闻、博客、研究、其他。\n\n文本：{text}\n\n类别：（只输出类别本身，不要理由）"
-        )
-        message = HumanMessage(content=prompt.format(text=state["text"]))
-        classification = self.llm.invoke([message]).content.strip()
-        new_state = dict(state)
-        new_state["classification"] = classification
-        return new_state
-
-    def _entity_extraction_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        prompt = PromptTemplate(
-            input_variables=["text"],
-            template="从以下文本中提取所有实体（人物、组织、地点）。以逗号分隔列表形式返回结果。\n\n文本：{text}\n\n实体："
-        )
-        message = HumanMessage(content=prompt.format(text=state["text"]))
-        entities = self.llm.invoke([message]).content.strip().split(", ")
-        new_state = dict(state)
-        new_state["entities"] = entities
-        return new_state
-
-    def _summarization_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        prompt = PromptTemplate(
-            input_variables=["text"],
-            template="用一句话总结以下文本。\n\n文本：{text}\n\n摘要："
-        )
-        message = HumanMessage(content=prompt.format(text=state["text"]))
-        summary = self.llm.invoke([message]).content.strip()
-        new_state = dict(state)
-        new_state["summary"] = summary
-        return new_state
+    def _classification_messages(self, state: AnalysisState) -> List[BaseMessage]:
+        return self.prompts.messages("classification", state["text"])
+
+    def _classification_batch_messages(self, texts: Sequence[str]) -> List[BaseMessage]:
+        items = "\n\n".join(f"[{number}] {text}" for number, text in enumerate(texts, 1))
+        return self.prompts.messages("classification_batch", items=items, count=len(texts))
+
+    def _entity_extraction_messages(self, state: AnalysisState) -> List[BaseMessage]:
+        return self.prompts.messages("entities", state["text"])
+
+    def _narrowed_entity_messages(self, text: str, known: List[str]) -> List[BaseMessage]:
+        return self.prompts.messages("entities_narrowed", text, known="、".join(known))
+
+    def _summarization_messages(self, state: AnalysisState) -> List[BaseMessage]:
+        return self.prompts.messages("summary", state["text"])
+
+    def _oneshot_messages(self, text: str, tasks: Tuple[str, ...]) -> List[BaseMessage]:
+        fields = "\n".join(f"- {ONESHOT_FIELDS[task]}" for task in tasks)
+        return self.prompts.messages("oneshot", text, fields=fields)
+
+    def _run_node(self, node: str, build: Callable[[AnalysisState], List[BaseMessage]],
+                  parse: Callable[[str], Dict[str, Any]], state: AnalysisState,
+                  config: RunnableConfig) -> Dict[str, Any]:
+        """执行一个节点，分别记录提示词构建、LLM 调用和结果解析的耗时"""
+        with span(node):
+            with span(f"{node}.prompt"):
+                messages = build(state)
+            with span(f"{node}.llm"):
+                reply = self.invoker.invoke(messages, config=config)
+            with span(f"{node}.parse"):
+                return parse(reply.content)
+
+    async def _arun_node(self, node: str, build: Callable[[AnalysisState], List[BaseMessage]],
+                         parse: Callable[[str], Dict[str, Any]], state: AnalysisState,
+                         config: RunnableConfig) -> Dict[str, Any]:
+        with span(node):
+            with span(f"{node}.prompt"):
+                messages = build(state)
+            with span(f"{node}.llm"):
+                reply = await self.invoker.ainvoke(messages, config=config)
+            with span(f"{node}.parse"):
+                return parse(reply.content)
+
+    @staticmethod
+    def _parse_classification(content: str) -> Dict[str, Any]:
+        return {"classification": content.strip()}
+
+    @staticmethod
+    def _parse_entities(content: str) -> Dict[str, Any]:
+        return {"entities": parse_entity_list(content)}
+
+    @staticmethod
+    def _parse_summary(content: str) -> Dict[str, Any]:
+        return {"summary": content.strip()}
+
+    def _fast_classify(self, text: str) -> Optional[str]:
+        """本地模型置信度达到阈值时返回类别，否则返回 None"""
+        if self.fast_classifier is None:
+            return None
+        with span("classification.fastpath") as current:
+            label, confidence = self.fast_classifier.predict(text)
+            hit = confidence >= self.fast_threshold
+            current.set_attribute("confidence", round(confidence, 4))
+            current.set_attribute("hit", hit)
+        CLASSIFICATION_FASTPATH.labels("hit" if hit else "fallback").inc()
+        return label if hit else None
+
+    def _record_label(self, text: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        if self.label_log is not None:
+            self.label_log.record(text, result["classification"])
+        return result
+
+    def _classification_node(self, state: AnalysisState, config: RunnableConfig) -> Dict[str, Any]:
+        label = self._fast_classify(state["text"])
+        if label is not None:
+            return {"classification": label}
+        return self._record_label(state["text"], self._run_node(
+            "classification", self._classification_messages, self._parse_classification, state, config))
+
+    def _match_entities(self, text: str) -> Tuple[List[str], Optional[Callable[[AnalysisState], List[BaseMessage]]]]:
+        """词典匹配到的实体，以及需要调用 LLM 时使用的提示词构建函数（无需调用时为 None）"""
+        if self.gazetteer is None:
+            return [], self._entity_extraction_messages
+        with span("entity_extraction.gazetteer") as current:
+            known = self.gazetteer.entities(text)
+            current.set_attribute("matches", len(known))
+        GAZETTEER_ENTITIES.inc(len(known))
+        if self.entity_mode == "skip" and len(known) >= settings.entity_gazetteer_min_matches:
+            ENTITY_LLM_SKIPPED.inc()
+            return known, None
+        if self.entity_mode == "narrow" and known:
+            return known, lambda state: self._narrowed_entity_messages(state["text"], known)
+        return known, self._entity_extraction_messages
+
+    def _entity_extraction_node(self, state: AnalysisState, config: RunnableConfig) -> Dict[str, Any]:
+        known, build = self._match_entities(state["text"])
+        if build is None:
+            return {"entities": known}
+        result = self._run_node("entity_extraction", build, self._parse_entities, state, config)
+        return {"entities": merge_entities([known, result["entities"]])}
+
+    def _summarization_node(self, state: AnalysisState, config: RunnableConfig) -> Dict[str, Any]:
+        return self._run_node("summarization", self._summarization_messages,
+                              self._parse_summary, state, config)
+
+    async def _aclassification_node(self, state: AnalysisState, config: RunnableConfig) -> Dict[str, Any]:
+        label = self._fast_classify(state["text"])
+        if label is not None:
+            return {"classification": label}
+        if self.classification_batcher is not None:
+            with span("classification"), span("classification.batch"):
+                label = await self.classification_batcher.classify(state["text"], config)
+            return self._record_label(state["text"], {"classification": label})
+        return self._record_label(state["text"], await self._arun_node(
+            "classification", self._classification_messages, self._parse_classification, state, config))
+
+    async def _aentity_extraction_node(self, state: AnalysisState, config: RunnableConfig) -> Dict[str, Any]:
+        known, build = self._match_entities(state["text"])
+        if build is None:
+            return {"entities": known}
+        result = await self._arun_node("entity_extraction", build, self._parse_entities, state, config)
+        return {"entities": merge_entities([known, result["entities"]])}
+
+    async def _asummarization_node(self, state: AnalysisState, config: RunnableConfig) -> Dict[str, Any]:
+        return await self._arun_node("summarization", self._summarization_messages,
+                                     self._parse_summary, state, config)
+
+    @staticmethod
+    def requested_tasks(request: TextAnalysisRequest) -> Tuple[str, ...]:
+        """根据请求开关确定需要执行的任务"""
+        flags = {
+            "classification": request.include_classification,
+            "entities": request.include_entities,
+            "summary": request.include_summary,
+        }
+        return tuple(task for task in ALL_TASKS if flags[task])
+
+    def resolve_engine(self, request: TextAnalysisRequest) -> str:
+        """请求中指定的引擎优先，否则使用智能体默认引擎"""
+        return request.engine or self.engine
 
     def analyze(self, request: TextAnalysisRequest) -> TextAnalysisResponse:
         start_time = time.time()
-        result = self.workflow.invoke({"text": request.text})
-        response = TextAnalysisResponse(
+        tasks = self.requested_tasks(request)
+        engine = self.resolve_engine(request)
+        with _timings_for(request) as timings, ANALYSES_IN_PROGRESS.track_inprogress(), _budget_for(request):
+            with span("analysis", engine=engine, tasks=",".join(tasks)):
+                cached, missing, near_duplicate = self._lookup_cache(request.text, engine, tasks)
+                usage = UsageCallbackHandler()
+                result = dict(cached)
+                if missing:
+                    computed = self._execute(request.text, missing, engine, {"callbacks": [usage]})
+                    self._store_cache(request.text, engine, computed)
+                    result.update(computed)
+        return self._build_response(request, tasks, engine, result, usage, start_time, missing, timings,
+                                    near_duplicate)
+
+    async def aanalyze(self, request: TextAnalysisRequest) -> TextAnalysisResponse:
+        """异步分析：节点通过 ``ainvoke`` 调用 LLM，不会阻塞事件循环"""
+        start_time = time.time()
+        tasks = self.requested_tasks(request)
+        engine = self.resolve_engine(request)
+        with _timings_for(request) as timings, ANALYSES_IN_PROGRESS.track_inprogress(), _budget_for(request):
+            with span("analysis", engine=engine, tasks=",".join(tasks)):
+                cached, missing, near_duplicate = await self._alookup_cache(request.text, engine, tasks)
+                usage = UsageCallbackHandler()
+                result = dict(cached)
+                coalesced: Tuple[str, ...] = ()
+                if missing:
+                    try:
+                        computed, coalesced = await self._acompute_coalesced(request.text, missing, engine, usage)
+                    finally:
+                        usage.abandon()
+                    result.update(computed)
+        response = self._build_response(request, tasks, engine, result, usage, start_time, missing, timings,
+                                        near_duplicate)
+        response.metadata["coalesced"] = list(coalesced)
+        CACHE_EVENTS.labels("coalesced").inc(len(coalesced))
+        return response
+
+    async def astream_analyze(self, request: TextAnalysisRequest,
+                              stream_tokens: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """流式分析：每个任务完成后立即产出结果事件
+
+        事件格式：
+        - ``{"event": "result", "task": 任务名, "data": 结果}``：任务完成（缓存命中的任务最先产出）
+        - ``{"event": "token", "task": "summary", "data": 片段}``：摘要生成中的 token（需开启 stream_tokens）
+        - ``{"event": "done", "data": {"processing_time": ..., "metadata": ...}}``：全部完成
+        """
+        start_time = time.time()
+        tasks = self.requested_tasks(request)
+        engine = self.resolve_engine(request)
+        with _timings_for(request) as timings, _budget_for(request):
+            with span("analysis", engine=engine, tasks=",".join(tasks), stream=True):
+                cached, missing, near_duplicate = await self._alookup_cache(request.text, engine, tasks)
+                usage = UsageCallbackHandler()
+                result = dict(cached)
+                for task in tasks:
+                    if task in cached:
+                        yield {"event": "result", "task": task, "data": cached[task]}
+
+                try:
+                    if missing and engine == "graph" and document_chunks(request.text) is None:
+                        node_tasks = {node: task for task, node in TASK_NODES.items()}
+                        stream_mode = ["updates", "messages"] if stream_tokens else ["updates"]
+                        config = {"callbacks": [usage], "metadata": {"stream_tokens": stream_tokens}}
+                        async for mode, chunk in self.get_workflow(missing).astream(
+                                {"text": request.text}, config=config, stream_mode=stream_mode):
+                            if mode == "messages":
+                                message, chunk_metadata = chunk
+                                if chunk_metadata.get("langgraph_node") == "summarization" and message.content:
+                                    yield {"event": "token", "task": "summary", "data": message.content}
+                                continue
+                            for node, update in chunk.items():
+                                task = node_tasks[node]
+                                result[task] = update[task]
+                                yield {"event": "result", "task": task, "data": update[task]}
+                        await self._astore_cache(request.text, engine, {task: result[task] for task in missing})
+                    elif missing:
+                        computed, _ = await self._acompute_coalesced(request.text, missing, engine, usage)
+                        result.update(computed)
+                        for task in missing:
+                            yield {"event": "result", "task": task, "data": computed[task]}
+                finally:
+                    usage.abandon()
+
+        response = self._build_response(request, tasks, engine, result, usage, start_time, missing, timings,
+                                        near_duplicate)
+        yield {"event": "done", "data": {
+            "processing_time": response.processing_time,
+            "metadata": response.metadata
+        }}
+
+    async def aanalyze_batch(self, requests: List[TextAnalysisRequest],
+                             max_concurrency: Optional[int] = None) -> BatchAnalysisResponse:
+        """批量分析：相同条目只分析一次，并发数受限，单个条目失败不影响其余条目"""
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(max_concurrency or settings.batch_max_concurrency)
+        unique: Dict[Tuple[str, Tuple[str, ...], str], asyncio.Task] = {}
+
+        async def run_one(request: TextAnalysisRequest) -> TextAnalysisResponse:
+            async with semaphore:
+                return await self.aanalyze(request)
+
+        item_tasks = []
+        for request in requests:
+            key = (request.text, self.requested_tasks(request), self.resolve_engine(request))
+            if key not in unique:
+                unique[key] = asyncio.ensure_future(run_one(request))
+            item_tasks.append(unique[key])
+        await asyncio.gather(*unique.values(), return_exceptions=True)
+
+        results = []
+        for index, task in enumerate(item_tasks):
+            error = task.exception()
+            if error is None:
+                results.append(BatchItemResult(index=index, result=task.result()))
+            else:
+                logger.warning("批量分析第 %d 条失败: %s", index, error)
+                ANALYSIS_ERRORS.labels("batch", type(error).__name__).inc()
+                results.append(BatchItemResult(index=index, error=str(error) or type(error).__name__))
+        failed = sum(1 for item in results if item.error is not None)
+        return BatchAnalysisResponse(
+            results=results,
+            total=len(results),
+            succeeded=len(results) - failed,
+            failed=failed,
+            unique=len(unique),
+            processing_time=time.time() - start_time
+        )
+
+    async def _acompute_coalesced(self, text: str, tasks: Tuple[str, ...], engine: str,
+                                  usage: UsageCallbackHandler) -> Tuple[Dict[str, Any], Tuple[str, ...]]:
+        """计算缺失的任务；已有相同任务在进行时直接等待其结果
+
+        返回 (任务结果, 复用了进行中计算的任务)。
+        """
+        prompt_version = self._prompt_version(engine)
+        keys = {task: make_cache_key(text, self.model_name, prompt_version, task) for task in tasks}
+        followers = self._inflight.join(keys)
+        leading = tuple(task for task in tasks if task not in followers)
+        results: Dict[str, Any] = {}
+        if leading:
+            flight = self._inflight.lead({task: keys[task] for task in leading})
+            try:
+                computed = await self._aexecute(text, leading, engine, {"callbacks": [usage]})
+                # 先交付结果再写缓存：写缓存期间请求被取消也不会把键留在进行中表里
+                flight.resolve(computed)
+                await self._astore_cache(text, engine, computed)
+            except BaseException as e:
+                # resolve 之后 fail 不会改动已完成的 future，只保证键一定被移除
+                flight.fail(e)
+                raise
+            results.update(computed)
+
+        retry = []
+        for task, future in followers.items():
+            try:
+                with span("coalesce.wait", task=task):
+                    results[task] = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # leader 的请求被取消（例如客户端断开）时自行计算，而不是一起失败
+                if not future.cancelled():
+                    raise
+                retry.append(task)
+            except DeadlineExceeded:
+                # 超时的是 leader 自己的时间预算，按本请求的预算重新计算
+                retry.append(task)
+        if retry:
+            computed = await self._aexecute(text, tuple(retry), engine, {"callbacks": [usage]})
+            await self._astore_cache(text, engine, computed)
+            results.update(computed)
+        return results, tuple(task for task in followers if task not in retry)
+
+    def _prompt_version(self, engine: str) -> str:
+        # 由模板内容与版本号计算，修改任何相关模板都会使旧的缓存结果失效
+        return f"{engine}/{self.prompts.version(ENGINE_PROMPTS[engine])}"
+
+    def _lookup_cache(self, text: str, engine: str, tasks: Tuple[str, ...]
+                      ) -> Tuple[Dict[str, Any], Tuple[str, ...], Optional[Dict[str, Any]]]:
+        """返回 (命中的任务结果, 未命中的任务, 近似重复匹配)，近似重复复用的结果已并入命中结果"""
+        if self.cache is None or not tasks:
+            return {}, tasks, None
+        prompt_version = self._prompt_version(engine)
+        with span("cache.lookup"):
+            cached, missing = self.cache.lookup(text, self.model_name, prompt_version, tasks)
+        if not missing or self.cache.near_duplicates is None:
+            return cached, missing, None
+        with span("cache.near_duplicate"):
+            match = self.cache.lookup_similar(text, self.model_name, prompt_version, missing)
+        if match is None:
+            return cached, missing, None
+        cached.update(match["results"])
+        return cached, tuple(task for task in missing if task not in match["results"]), match
+
+    def _store_cache(self, text: str, engine: str, results: Dict[str, Any]) -> None:
+        """写入结果缓存；缓存故障只记录日志，不影响已经算出的结果"""
+        if self.cache is None:
+            return
+        try:
+            with span("cache.store"):
+                self.cache.store(text, self.model_name, self._prompt_version(engine), results)
+        except Exception as e:
+            logger.warning("写入结果缓存失败: %s", e)
+            CACHE_EVENTS.labels("store_error").inc(len(results))
+
+    async def _alookup_cache(self, text: str, engine: str, tasks: Tuple[str, ...]
+                             ) -> Tuple[Dict[str, Any], Tuple[str, ...], Optional[Dict[str, Any]]]:
+        # 磁盘后端在线程池中查询，不阻塞事件循环；内存后端直接查询，省去线程切换
+        if self.cache is not None and self.cache.backend.blocking:
+            return await asyncio.to_thread(self._lookup_cache, text, engine, tasks)
+        return self._lookup_cache(text, engine, tasks)
+
+    async def _astore_cache(self, text: str, engine: str, results: Dict[str, Any]) -> None:
+        if self.cache is not None and self.cache.backend.blocking:
+            await asyncio.to_thread(self._store_cache, text, engine, results)
+        else:
+            self._store_cache(text, engine, results)
+
+    def _execute(self, text: str, tasks: Tuple[str, ...], engine: str,
+                 config: RunnableConfig) -> Dict[str, Any]:
+        chunks = document_chunks(text)
+        if chunks is not None:
+            return self._execute_chunked(chunks, tasks, engine, config)
+        return self._execute_direct(text, tasks, engine, config)
+
+    def _execute_direct(self, text: str, tasks: Tuple[str, ...], engine: str,
+                        config: RunnableConfig) -> Dict[str, Any]:
+        if engine == "oneshot":
+            with span("oneshot"):
+                with span("oneshot.prompt"):
+                    messages = self._oneshot_messages(text, tasks)
+                with span("oneshot.llm"):
+                    reply = self.oneshot_invoker.invoke(messages, config=config)
+                with span("oneshot.parse"):
+                    return parse_oneshot_reply(reply.content, tasks)
+        with span("workflow"):
+            return self.get_workflow(tasks).invoke({"text": text}, config=config)
+
+    def _execute_chunked(self, chunks: Tuple[str, ...], tasks: Tuple[str, ...], engine: str,
+                         config: RunnableConfig) -> Dict[str, Any]:
+        """同步路径的长文档 map-reduce：各块在线程池中并行执行，不创建事件循环
+
+        调用方可能已处在运行中的事件循环里（``asyncio.run`` 会失败），进程共享的
+        异步 HTTP 客户端也不应绑定到用完即弃的事件循环上。
+        """
+        with ThreadPoolExecutor(max_workers=settings.chunk_max_concurrency,
+                                thread_name_prefix="chunk") as pool:
+            def run_all(jobs: List[Tuple[str, Tuple[str, ...], str]]) -> List[Dict[str, Any]]:
+                # 每个块复制调用方的上下文，保留时间预算与追踪 span
+                futures = [pool.submit(contextvars.copy_context().run, self._execute_direct,
+                                       text, chunk_tasks, chunk_engine, config)
+                           for text, chunk_tasks, chunk_engine in jobs]
+                return [future.result() for future in futures]
+
+            with span("chunked.map", chunks=len(chunks)):
+                outputs = run_all(_map_jobs(chunks, tasks, engine))
+            results, summaries = _merge_map_outputs(tasks, outputs)
+            while len(summaries) > 1:
+                with span("chunked.reduce", inputs=len(summaries)):
+                    reduced = run_all([(group, ("summary",), "graph") for group in _summary_groups(summaries)])
+                summaries = [output["summary"] for output in reduced]
+        if "summary" in tasks:
+            results["summary"] = summaries[0]
+        return results
+
+    async def _aexecute(self, text: str, tasks: Tuple[str, ...], engine: str,
+                        config: RunnableConfig) -> Dict[str, Any]:
+        chunks = document_chunks(text)
+        if chunks is not None:
+            return await self._aexecute_chunked(chunks, tasks, engine, config)
+        return await self._aexecute_direct(text, tasks, engine, config)
+
+    async def _aexecute_direct(self, text: str, tasks: Tuple[str, ...], engine: str,
+                               config: RunnableConfig) -> Dict[str, Any]:
+        if engine == "oneshot":
+            with span("oneshot"):
+                with span("oneshot.prompt"):
+                    messages = self._oneshot_messages(text, tasks)
+                with span("oneshot.llm"):
+                    reply = await self.oneshot_invoker.ainvoke(messages, config=config)
+                with span("oneshot.parse"):
+                    return parse_oneshot_reply(reply.content, tasks)
+        with span("workflow"):
+            return await self.get_workflow(tasks).ainvoke({"text": text}, config=config)
+
+    async def _aexecute_chunked(self, chunks: Tuple[str, ...], tasks: Tuple[str, ...], engine: str,
+                                config: RunnableConfig) -> Dict[str, Any]:
+        """长文档 map-reduce：分类只看首块，实体和摘要逐块并行后合并"""
+        semaphore = asyncio.Semaphore(settings.chunk_max_concurrency)
+
+        async def run(text: str, chunk_tasks: Tuple[str, ...], chunk_engine: str = engine) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._aexecute_direct(text, chunk_tasks, chunk_engine, config)
+
+        with span("chunked.map", chunks=len(chunks)):
+            outputs = await asyncio.gather(*(run(*job) for job in _map_jobs(chunks, tasks, engine)))
+        results, summaries = _merge_map_outputs(tasks, outputs)
+        while len(summaries) > 1:
+            with span("chunked.reduce", inputs=len(summaries)):
+                reduced = await asyncio.gather(*(run(group, ("summary",), "graph")
+                                                 for group in _summary_groups(summaries)))
+            summaries = [output["summary"] for output in reduced]
+        if "summary" in tasks:
+            results["summary"] = summaries[0]
+        return results
+
+    def _build_response(self, request: TextAnalysisRequest, tasks: Tuple[str, ...], engine: str,
+                        result: Dict[str, Any], usage: UsageCallbackHandler, start_time: float,
+                        missing: Tuple[str, ...], timings: Optional[Timings] = None,
+                        near_duplicate: Optional[Dict[str, Any]] = None) -> TextAnalysisResponse:
+        metadata = {
+            "model": self.model_name,
+            "engine": engine,
+            "execution_mode": self.execution_mode,
+            "text_length": len(request.text),
+            "tasks": list(tasks),
+            "usage": usage.to_dict()
+        }
+        chunks = document_chunks(request.text)
+        if chunks is not None:
+            metadata["long_document"] = {
+                "estimated_tokens": _estimate_tokens_cached(request.text),
+                "chunks": len(chunks)
+            }
+        if self.cache is not None:
+            metadata["cache"] = {
+                "hits": [task for task in tasks if task not in missing],
+                "misses": list(missing)
+            }
+        if near_duplicate is not None:
+            metadata["near_duplicate"] = {
+                "matched": near_duplicate["matched"],
+                "similarity": round(near_duplicate["similarity"], 4),
+                "tasks": [task for task in tasks if task in near_duplicate["results"]]
+            }
+        if timings is not None:
+            metadata["timings"] = timings.to_dict()
+        return TextAnalysisResponse(
             original_text=request.text,
-            classification=result.get("classification") if request.include_classification else None,
-            entities=result.get("entities") if request.include_entities else None,
-            summary=result.get("summary") if request.include_summary else None,
+            classification=result.get("classification"),
+            entities=result.get("entities"),
+            summary=result.get("summary"),
             processing_time=time.time() - start_time,
-            metadata={
-                "model": os.getenv("OPENAI_MODEL", "qwen-plus"),
-                "text_length": len(request.text)
-            }
+            metadata=metadata
         )
-        return response 
\ No newline at end of file
+
+
+def _json_mode(llm: Optional[Any]) -> Optional[Any]:
+    if isinstance(llm, ChatOpenAI):
+        return llm.bind(response_format={"type": "json_object"})
+    return llm
+
+
+def _budget_for(request: TextAnalysisRequest):
+    """请求指定的时间预算优先，否则使用默认预算（``LLM_REQUEST_BUDGET``，后台任务不限）
+
+    长文档的默认预算按 map 阶段的轮数放大：每轮最多 ``CHUNK_MAX_CONCURRENCY`` 块并行，
+    另加一轮用于分类与摘要归约，使默认预算不会随文档变长而必然耗尽。
+    """
+    if request.timeout:
+        return request_budget(request.timeout)
+    budget = current_default_budget()
+    chunks = document_chunks(request.text)
+    if budget and chunks is not None:
+        budget *= math.ceil(len(chunks) / max(settings.chunk_max_concurrency, 1)) + 1
+    return request_budget(budget)
+
+
+def _timings_for(request: TextAnalysisRequest):
+    """请求开启 ``include_timings`` 时收集各阶段耗时"""
+    return collect_timings() if request.include_timings else nullcontext()
+
+
+def _map_jobs(chunks: Tuple[str, ...], tasks: Tuple[str, ...],
+              engine: str) -> List[Tuple[str, Tuple[str, ...], str]]:
+    """长文档的 map 阶段：分类只看首块，实体和摘要逐块执行"""
+    map_tasks = tuple(task for task in tasks if task != "classification")
+    jobs = [(chunk, map_tasks, engine) for chunk in chunks] if map_tasks else []
+    if "classification" in tasks:
+        jobs.insert(0, (chunks[0], ("classification",), engine))
+    return jobs
+
+
+def _merge_map_outputs(tasks: Tuple[str, ...], outputs: List[Dict[str, Any]]
+                       ) -> Tuple[Dict[str, Any], List[str]]:
+    """合并 map 阶段的结果，返回 (分类与实体结果, 待归约的各块摘要)"""
+    outputs = list(outputs)
+    results: Dict[str, Any] = {}
+    if "classification" in tasks:
+        results["classification"] = outputs.pop(0)["classification"]
+    if "entities" in tasks:
+        results["entities"] = merge_entities(output["entities"] for output in outputs)
+    summaries = [output["summary"] for output in outputs] if "summary" in tasks else []
+    return results, summaries
+
+
+def _summary_groups(summaries: List[str]) -> List[str]:
+    # 分层归约：每 fanin 个摘要合并为一个，直到只剩一个
+    fanin = max(settings.summary_reduce_fanin, 2)
+    return ["\n".join(summaries[i:i + fanin]) for i in range(0, len(summaries), fanin)]
+
+
+def document_chunks(text: str) -> Optional[Tuple[str, ...]]:
+    """长文档返回分块结果，普通文档返回 None"""
+    # token 数不会超过字符数，短文本无需估算
+    if len(text) <= settings.long_document_threshold:
+        return None
+    return _chunk_long_document(text, settings.long_document_threshold,
+                                settings.chunk_size, settings.chunk_overlap)
+
+
+# 同一请求的执行、流式与元数据会多次查询，按文本缓存避免重复估算和切分
+_estimate_tokens_cached = lru_cache(maxsize=16)(estimate_tokens)
+
+
+@lru_cache(maxsize=16)
+def _chunk_long_document(text: str, threshold: int, chunk_size: int,
+                         overlap: int) -> Optional[Tuple[str, ...]]:
+    if _estimate_tokens_cached(text) <= threshold:
+        return None
+    return tuple(chunk_text(text, chunk_size, overlap))
+
+
+def parse_oneshot_reply(content: str, tasks: Tuple[str, ...]) -> Dict[str, Any]:
+    """解析 oneshot 引擎的 JSON 输出，只保留请求的任务字段"""
+    # 兼容模型用 ```json 代码块包裹输出，或在 JSON 前后附带说明文字的情况
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        raise ValueError(f"oneshot 输出中未找到 JSON 对象: {content[:200]}")
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"oneshot 输出不是合法的 JSON: {e}") from e
+    parsed = OneShotAnalysisResult.model_validate(data)
+    return {task: getattr(parsed, task) for task in tasks}
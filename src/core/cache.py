@@ -0,0 +1,328 @@
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple
+
+from .metrics import CACHE_EVENTS
+from ..config import settings
+
+if TYPE_CHECKING:
+    from .neardup import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：统一全半角并折叠空白，使仅有格式差异的文本命中同一缓存"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def document_key(text: str) -> str:
+    """规范化文本的 SHA-256 摘要，标识一篇文档"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def task_cache_key(document: str, model: str, prompt_version: str, task: str) -> str:
+    """按 (文档键, 模型, 提示词版本, 任务) 计算缓存键，近似重复复用按文档键取结果"""
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, task, document):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def make_cache_key(text: str, model: str, prompt_version: str, task: str) -> str:
+    """按 (规范化文本, 模型, 提示词版本, 任务) 计算内容寻址的缓存键"""
+    return task_cache_key(document_key(text), model, prompt_version, task)
+
+
+class CacheBackend:
+    """缓存后端接口
+
+    ``blocking`` 为 True 的后端（磁盘 I/O）在异步路径上由线程池调用，不阻塞事件循环。
+    """
+
+    blocking = False
+
+    def __init__(self):
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """进程内 LRU 缓存，按条目数和序列化字节数限制容量，可选 TTL"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: Optional[float] = None):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, created_at = entry
+            if self.ttl and time.time() - created_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.time())
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+                CACHE_EVENTS.labels("eviction").inc()
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """基于 SQLite 的磁盘缓存，服务重启后依然有效，按最近访问时间淘汰
+
+    读路径只执行查询：命中时的访问时间先记录在内存中，累计 ``TOUCH_BATCH`` 条、
+    距上次写回超过 ``TOUCH_INTERVAL`` 秒或下一次写入时批量更新，缓存命中不占用
+    写锁。条目数在进程内计数，超过 ``max_entries`` 的 10%（高水位）后一次淘汰到
+    ``max_entries``；其他 worker 写入的条目不在本进程的计数中，因此每
+    ``RECOUNT_EVERY`` 次写入用 ``COUNT(*)`` 校准一次。
+    """
+
+    blocking = True
+    # 访问时间批量写回的条数与时间间隔
+    TOUCH_BATCH = 256
+    TOUCH_INTERVAL = 5.0
+    # 每多少次写入重新统计一次条目数
+    RECOUNT_EVERY = 1000
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl: Optional[float] = None):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.high_water = max_entries + max(max_entries // 10, 1)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._last_flush = time.monotonic()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_analysis_cache_accessed ON analysis_cache(accessed_at)"
+        )
+        self._conn.commit()
+        self._count = len(self)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                # 过期条目留给后续淘汰，读路径不写库
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH or time.monotonic() - self._last_flush > self.TOUCH_INTERVAL:
+                self._flush_touched()
+                self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self._count += exists is None
+            self._writes += 1
+            if self._writes % self.RECOUNT_EVERY == 0 or self._count > self.high_water:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+            if self._count > self.high_water:
+                self._prune(now)
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE analysis_cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+        self._last_flush = time.monotonic()
+
+    def _prune(self, now: float) -> None:
+        """先删除过期条目，仍超过 ``max_entries`` 时按访问时间淘汰最旧的条目"""
+        removed = 0
+        if self.ttl:
+            removed += self._conn.execute(
+                "DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl,)
+            ).rowcount
+        overflow = self._count - removed - self.max_entries
+        if overflow > 0:
+            removed += self._conn.execute(
+                "DELETE FROM analysis_cache WHERE key IN ("
+                "SELECT key FROM analysis_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            ).rowcount
+        self._count -= removed
+        self.evictions += removed
+        CACHE_EVENTS.labels("eviction").inc(removed)
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+
+
+class ResultCache:
+    """分析结果缓存
+
+    每个任务的结果单独存储，因此只请求部分任务、或与历史请求任务组合不同的
+    请求也能复用已缓存的部分，只为缺失的任务调用 LLM。
+
+    传入 ``near_duplicates`` 时，写入结果的文本同时加入近似重复索引；精确未命中的
+    任务可通过 ``lookup_similar`` 复用相似文本的结果。
+    """
+
+    def __init__(self, backend: CacheBackend, near_duplicates: Optional["NearDuplicateIndex"] = None):
+        self.backend = backend
+        self.near_duplicates = near_duplicates
+        self.hits = 0
+        self.misses = 0
+        self.near_duplicate_hits = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, text: str, model: str, prompt_version: str,
+               tasks: Iterable[str]) -> Tuple[Dict[str, Any], Tuple[str, ...]]:
+        """返回 (命中的任务结果, 未命中的任务)"""
+        cached: Dict[str, Any] = {}
+        missing = []
+        for task in tasks:
+            value = self.backend.get(make_cache_key(text, model, prompt_version, task))
+            if value is None:
+                missing.append(task)
+            else:
+                cached[task] = value
+        with self._lock:
+            self.hits += len(cached)
+            self.misses += len(missing)
+        CACHE_EVENTS.labels("hit").inc(len(cached))
+        CACHE_EVENTS.labels("miss").inc(len(missing))
+        return cached, tuple(missing)
+
+    def lookup_similar(self, text: str, model: str, prompt_version: str,
+                       tasks: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """为精确未命中的任务查找近似重复文本的已缓存结果
+
+        按相似度从高到低检查索引中的候选，返回第一个有可复用结果的候选
+        ``{"matched": 文档键, "similarity": 估计相似度, "results": {任务: 结果}}``，
+        没有时返回 None。只复用索引配置允许的任务。
+        """
+        index = self.near_duplicates
+        if index is None:
+            return None
+        tasks = [task for task in tasks if task in index.tasks]
+        if not tasks:
+            return None
+        own = document_key(text)
+        for matched, similarity in index.query(text):
+            if matched == own:
+                continue
+            results = {}
+            for task in tasks:
+                value = self.backend.get(task_cache_key(matched, model, prompt_version, task))
+                if value is not None:
+                    results[task] = value
+            if results:
+                with self._lock:
+                    self.near_duplicate_hits += len(results)
+                CACHE_EVENTS.labels("near_duplicate").inc(len(results))
+                return {"matched": matched, "similarity": similarity, "results": results}
+        return None
+
+    def store(self, text: str, model: str, prompt_version: str, results: Dict[str, Any]) -> None:
+        for task, value in results.items():
+            if value is not None:
+                self.backend.set(make_cache_key(text, model, prompt_version, task), value)
+        # 只索引真正计算出可复用结果的文本；复用得来的结果不写回，避免相似度沿改动链逐步漂移
+        index = self.near_duplicates
+        if index is not None and any(results.get(task) is not None for task in index.tasks):
+            index.add(text)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+        }
+        if self.near_duplicates is not None:
+            stats["near_duplicates"] = dict(self.near_duplicates.stats(), hits=self.near_duplicate_hits)
+        return stats
+
+
+def create_result_cache(near_duplicates: Optional["NearDuplicateIndex"] = None) -> Optional[ResultCache]:
+    """根据配置创建结果缓存，未启用时返回 None
+
+    ``near_duplicates`` 为可选的近似重复索引（见 ``neardup.create_near_duplicate_index``）。
+    """
+    if not settings.cache_enabled:
+        return None
+    ttl = settings.cache_ttl or None
+    if settings.cache_backend == "sqlite":
+        backend: CacheBackend = SQLiteCacheBackend(
+            settings.cache_sqlite_path, max_entries=settings.cache_max_entries, ttl=ttl
+        )
+    elif settings.cache_backend == "memory":
+        backend = MemoryCacheBackend(
+            max_entries=settings.cache_max_entries, max_bytes=settings.cache_max_bytes, ttl=ttl
+        )
+    else:
+        raise ValueError(f"不支持的缓存后端: {settings.cache_backend}，可选值: memory, sqlite")
+    logger.info("结果缓存已启用: backend=%s", settings.cache_backend)
+    return ResultCache(backend, near_duplicates)
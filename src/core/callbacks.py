@@ -0,0 +1,99 @@
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .metrics import LLM_CALL_DURATION, LLM_CALLS, LLM_CALLS_IN_PROGRESS, LLM_TOKENS
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """统计单个请求内的 LLM 调用次数与 token 用量，并记录 Prometheus 指标
+
+    并行模式下节点运行在不同线程/协程中，因此累加操作需要加锁。
+    每次调用按所在的工作流节点（``langgraph_node``）记录耗时和 token，
+    不在工作流中的调用（如 oneshot 引擎）记为 ``oneshot``。
+
+    ``cached_tokens`` 为服务商报告的命中前缀缓存的输入 token 数（包含在
+    ``prompt_tokens`` 中）。
+
+    被取消的调用（客户端断开、对冲请求落败、任务队列关闭）不会触发
+    ``on_llm_error``，分析结束时由 ``abandon`` 以 ``cancelled`` 状态结算。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running: Dict[UUID, Tuple[float, str]] = {}
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node", "oneshot")
+        with self._lock:
+            self._running[run_id] = (time.perf_counter(), node)
+        LLM_CALLS_IN_PROGRESS.inc()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        prompt_tokens, completion_tokens, cached_tokens = _extract_token_usage(response)
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_tokens += cached_tokens
+        node = self._finish(run_id, "success")
+        LLM_TOKENS.labels(node, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(node, "completion").inc(completion_tokens)
+        LLM_TOKENS.labels(node, "cached").inc(cached_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "error")
+
+    def abandon(self) -> None:
+        """结算仍未结束的调用，避免 ``llm_calls_in_progress`` 泄漏"""
+        with self._lock:
+            running = list(self._running)
+        for run_id in running:
+            self._finish(run_id, "cancelled")
+
+    def _finish(self, run_id: UUID, status: str) -> str:
+        with self._lock:
+            started = self._running.pop(run_id, None)
+        if started is None:
+            return "unknown"
+        start_time, node = started
+        LLM_CALLS_IN_PROGRESS.dec()
+        LLM_CALL_DURATION.labels(node).observe(time.perf_counter() - start_time)
+        LLM_CALLS.labels(node, status).inc()
+        return node
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+        }
+
+
+def _extract_token_usage(response: LLMResult):
+    """从 LLM 响应中提取 (prompt_tokens, completion_tokens, cached_tokens)"""
+    prompt_tokens = completion_tokens = cached_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+                cached_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    if not prompt_tokens and not completion_tokens and response.llm_output:
+        token_usage = response.llm_output.get("token_usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens", 0)
+        completion_tokens = token_usage.get("completion_tokens", 0)
+        cached_tokens = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0
+    return prompt_tokens, completion_tokens, cached_tokens
@@ -0,0 +1,94 @@
+import re
+import unicodedata
+from typing import Iterable, List
+
+# 中日韩统一表意文字（含扩展 A 区）按每字一个 token 估算
+_TOKEN_PATTERN = re.compile(r"[㐀-䶿一-鿿]|[A-Za-z0-9_]+|\S")
+
+# 句末标点（中英文）之后、或换行处切分；英文句点要求后跟空白，避免切开小数和缩写
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[。！？!?；;…\n])|(?<=\.)(?=\s)")
+
+
+def _token_cost(length: int) -> int:
+    return 1 if length <= 4 else (length + 3) // 4
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：汉字每字一个，英文单词/数字约每 4 个字符一个"""
+    return sum(_token_cost(match.end() - match.start()) for match in _TOKEN_PATTERN.finditer(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    """按中英文句末标点和换行切分句子，保留标点和换行"""
+    return [sentence for sentence in _SENTENCE_BOUNDARY.split(text) if sentence]
+
+
+def _split_long_sentence(sentence: str, chunk_size: int) -> List[str]:
+    """超过块大小的单句在 token 边界处硬切分"""
+    pieces = []
+    start = 0
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(sentence):
+        cost = _token_cost(match.end() - match.start())
+        if tokens + cost > chunk_size and match.start() > start:
+            pieces.append(sentence[start:match.start()])
+            start = match.start()
+            tokens = 0
+        tokens += cost
+    pieces.append(sentence[start:])
+    return pieces
+
+
+def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[str]:
+    """把文本切分为不超过 ``chunk_size`` 个 token 的块
+
+    以句子为单位贪心装箱，相邻块之间重叠约 ``overlap`` 个 token 的完整句子，
+    避免实体或语义在块边界被截断。
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必须大于 0")
+    if overlap >= chunk_size:
+        raise ValueError("overlap 必须小于 chunk_size")
+
+    units = []
+    for sentence in split_sentences(text):
+        tokens = estimate_tokens(sentence)
+        if tokens > chunk_size:
+            units.extend((piece, estimate_tokens(piece)) for piece in _split_long_sentence(sentence, chunk_size))
+        else:
+            units.append((sentence, tokens))
+
+    chunks: List[str] = []
+    current: List[tuple] = []
+    current_tokens = 0
+    for unit in units:
+        if current and current_tokens + unit[1] > chunk_size:
+            chunks.append("".join(piece for piece, _ in current))
+            # 从当前块末尾保留不超过 overlap 的句子作为下一块的开头
+            carried: List[tuple] = []
+            carried_tokens = 0
+            for piece in reversed(current):
+                if carried_tokens + piece[1] > overlap or carried_tokens + piece[1] + unit[1] > chunk_size:
+                    break
+                carried.insert(0, piece)
+                carried_tokens += piece[1]
+            current, current_tokens = carried, carried_tokens
+        current.append(unit)
+        current_tokens += unit[1]
+    if current:
+        chunks.append("".join(piece for piece, _ in current))
+    return chunks
+
+
+def merge_entities(entity_lists: Iterable[List[str]]) -> List[str]:
+    """合并各块的实体列表：按规范化形式去重，保留首次出现的顺序和写法"""
+    merged: List[str] = []
+    seen = set()
+    for entities in entity_lists:
+        for entity in entities or []:
+            entity = entity.strip()
+            key = unicodedata.normalize("NFKC", entity).casefold()
+            if entity and key not in seen:
+                seen.add(key)
+                merged.append(entity)
+    return merged
@@ -0,0 +1,259 @@
+"""
+本地分类快速路径
+
+``NgramClassifier`` 以字符 n-gram 为特征、softmax 线性模型为分类器，从记录下来的
+LLM 分类结果训练得到。分类节点先用它预测，最高类别概率达到阈值时直接采用，
+否则回退到 LLM。开启 ``LabelLog`` 后 LLM 给出的分类会追加到 JSONL 文件，作为
+下一轮训练数据。
+
+训练并导出模型::
+
+    python -m src.core.fastpath train --data classification_labels.jsonl --output classifier.json
+"""
+
+import sys
+import json
+import math
+import queue
+import random
+import logging
+import argparse
+from collections import Counter
+from logging.handlers import QueueListener
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .cache import normalize_text
+from .logs import NonBlockingQueueHandler
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# 分类提示词中的固定类别
+CLASSIFICATION_LABELS = ("新闻", "博客", "研究", "其他")
+
+MODEL_FORMAT = "char-ngram-softmax"
+MODEL_VERSION = 1
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (1, 3), max_chars: int = 2000) -> Counter:
+    """规范化文本前 ``max_chars`` 个字符的字符 n-gram 计数"""
+    text = normalize_text(text)[:max_chars]
+    low, high = ngram_range
+    grams: Counter = Counter()
+    for n in range(low, high + 1):
+        grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+class NgramClassifier:
+    """字符 n-gram + softmax 线性分类器
+
+    特征为词表内 n-gram 的 L2 归一化计数；``weights[j][k]`` 是第 j 个 n-gram
+    对第 k 个类别的权重。模型以 JSON 保存，不依赖第三方机器学习库。
+    """
+
+    def __init__(self, labels: Sequence[str], vocab: Sequence[str], weights: List[List[float]],
+                 bias: List[float], ngram_range: Tuple[int, int] = (1, 3), max_chars: int = 2000):
+        if len(vocab) != len(weights) or len(bias) != len(labels):
+            raise ValueError("模型维度不一致")
+        self.labels = tuple(labels)
+        self.vocab = {gram: index for index, gram in enumerate(vocab)}
+        self.weights = weights
+        self.bias = bias
+        self.ngram_range = tuple(ngram_range)
+        self.max_chars = max_chars
+
+    def _features(self, text: str) -> List[Tuple[int, float]]:
+        grams = char_ngrams(text, self.ngram_range, self.max_chars)
+        features = [(self.vocab[gram], float(count)) for gram, count in grams.items() if gram in self.vocab]
+        norm = math.sqrt(sum(value * value for _, value in features)) or 1.0
+        return [(index, value / norm) for index, value in features]
+
+    def _proba(self, features: List[Tuple[int, float]]) -> List[float]:
+        scores = list(self.bias)
+        for index, value in features:
+            for k, weight in enumerate(self.weights[index]):
+                scores[k] += weight * value
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        return dict(zip(self.labels, self._proba(self._features(text))))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """返回 (类别, 置信度)"""
+        proba = self._proba(self._features(text))
+        best = max(range(len(proba)), key=proba.__getitem__)
+        return self.labels[best], proba[best]
+
+    @classmethod
+    def train(cls, samples: Iterable[Tuple[str, str]], labels: Sequence[str] = CLASSIFICATION_LABELS,
+              ngram_range: Tuple[int, int] = (1, 3), max_chars: int = 2000, min_count: int = 2,
+              epochs: int = 10, learning_rate: float = 0.5, seed: int = 0) -> "NgramClassifier":
+        """用 (文本, 类别) 样本做 SGD 训练，不在 ``labels`` 中的样本被忽略"""
+        label_index = {label: k for k, label in enumerate(labels)}
+        data = [(char_ngrams(text, ngram_range, max_chars), label_index[label])
+                for text, label in samples if label in label_index]
+        if not data:
+            raise ValueError("没有可用的训练样本")
+        document_counts: Counter = Counter()
+        for grams, _ in data:
+            document_counts.update(grams.keys())
+        vocab = sorted(gram for gram, count in document_counts.items() if count >= min_count)
+        model = cls(labels, vocab, [[0.0] * len(labels) for _ in vocab], [0.0] * len(labels),
+                    ngram_range, max_chars)
+        examples = []
+        for grams, target in data:
+            features = [(model.vocab[gram], float(count)) for gram, count in grams.items() if gram in model.vocab]
+            norm = math.sqrt(sum(value * value for _, value in features)) or 1.0
+            examples.append(([(index, value / norm) for index, value in features], target))
+
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(examples)
+            rate = learning_rate / (1 + epoch)
+            for features, target in examples:
+                proba = model._proba(features)
+                gradient = [p - (1.0 if k == target else 0.0) for k, p in enumerate(proba)]
+                for k, g in enumerate(gradient):
+                    model.bias[k] -= rate * g
+                for index, value in features:
+                    row = model.weights[index]
+                    for k, g in enumerate(gradient):
+                        row[k] -= rate * g * value
+        return model
+
+    def save(self, path: str) -> None:
+        vocab = sorted(self.vocab, key=self.vocab.__getitem__)
+        data = {
+            "format": MODEL_FORMAT,
+            "version": MODEL_VERSION,
+            "labels": list(self.labels),
+            "ngram_range": list(self.ngram_range),
+            "max_chars": self.max_chars,
+            "vocab": vocab,
+            "weights": [[round(w, 6) for w in row] for row in self.weights],
+            "bias": [round(b, 6) for b in self.bias],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "NgramClassifier":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != MODEL_FORMAT or data.get("version") != MODEL_VERSION:
+            raise ValueError(f"不支持的分类模型格式: {data.get('format')} v{data.get('version')}")
+        return cls(data["labels"], data["vocab"], data["weights"], data["bias"],
+                   tuple(data["ngram_range"]), data["max_chars"])
+
+
+class LabelLog:
+    """把 LLM 给出的分类以 JSONL 追加到文件，用作快速路径的训练数据
+
+    与服务日志相同（见 ``logs``），请求路径只把记录放入有界队列，由后台线程通过
+    一直打开的文件句柄写出；队列满时丢弃记录。``close`` 写出剩余记录并关闭文件。
+    """
+
+    def __init__(self, path: str, max_chars: int = 2000, max_pending: int = 10000):
+        self.path = path
+        self.max_chars = max_chars
+        output = logging.FileHandler(path, encoding="utf-8", delay=True)
+        output.setFormatter(logging.Formatter("%(message)s"))
+        self._handler = NonBlockingQueueHandler(queue.Queue(max_pending))
+        self._listener: Optional[QueueListener] = QueueListener(self._handler.queue, output)
+        self._listener.start()
+        self._output = output
+
+    def record(self, text: str, label: str) -> None:
+        if label not in CLASSIFICATION_LABELS:
+            return
+        line = json.dumps({"text": text[:self.max_chars], "label": label}, ensure_ascii=False)
+        self._handler.handle(logging.makeLogRecord({"msg": line}))
+
+    def close(self) -> None:
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+            self._output.close()
+
+
+def read_samples(path: str) -> List[Tuple[str, str]]:
+    """读取 ``LabelLog`` 格式的 JSONL 样本"""
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                samples.append((item["text"], item["label"].strip()))
+    return samples
+
+
+def load_fast_classifier() -> Optional[NgramClassifier]:
+    """加载配置的快速路径模型；未配置或加载失败时返回 None（全部走 LLM）"""
+    if not settings.fastpath_model_path:
+        return None
+    try:
+        model = NgramClassifier.load(settings.fastpath_model_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("加载分类快速路径模型失败，分类将全部调用 LLM: %s", e)
+        return None
+    logger.info("分类快速路径已启用: model=%s n-grams=%d threshold=%.2f",
+                settings.fastpath_model_path, len(model.vocab), settings.fastpath_threshold)
+    return model
+
+
+def create_label_log() -> Optional[LabelLog]:
+    """根据配置创建 LLM 分类结果记录，未配置时返回 None"""
+    return LabelLog(settings.classification_label_log) if settings.classification_label_log else None
+
+
+def evaluate(model: NgramClassifier, samples: Sequence[Tuple[str, str]],
+             threshold: float) -> Dict[str, float]:
+    """返回快速路径覆盖率（置信度达到阈值的比例）、其中的准确率与总体准确率"""
+    covered = correct_covered = correct = 0
+    for text, label in samples:
+        predicted, confidence = model.predict(text)
+        correct += predicted == label
+        if confidence >= threshold:
+            covered += 1
+            correct_covered += predicted == label
+    total = len(samples) or 1
+    return {
+        "coverage": covered / total,
+        "covered_accuracy": correct_covered / covered if covered else 0.0,
+        "accuracy": correct / total,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="训练并导出分类快速路径模型")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="从 LLM 分类记录训练模型")
+    train.add_argument("--data", required=True, help="JSONL 训练数据（CLASSIFICATION_LABEL_LOG 的输出）")
+    train.add_argument("--output", required=True, help="模型输出路径（JSON）")
+    train.add_argument("--holdout", type=float, default=0.1, help="留出评估的样本比例")
+    train.add_argument("--epochs", type=int, default=10)
+    train.add_argument("--min-count", type=int, default=2, help="n-gram 至少出现的文档数")
+    train.add_argument("--threshold", type=float, default=settings.fastpath_threshold,
+                       help="评估时使用的置信度阈值")
+    args = parser.parse_args(argv)
+
+    samples = read_samples(args.data)
+    random.Random(0).shuffle(samples)
+    split = int(len(samples) * (1 - args.holdout))
+    model = NgramClassifier.train(samples[:split], epochs=args.epochs, min_count=args.min_count)
+    model.save(args.output)
+    print(f"训练样本 {split} 条，词表 {len(model.vocab)} 个 n-gram，模型已保存到 {args.output}")
+    if split < len(samples):
+        report = evaluate(model, samples[split:], args.threshold)
+        print(f"留出集 {len(samples) - split} 条：总体准确率 {report['accuracy']:.1%}，"
+              f"阈值 {args.threshold:g} 下覆盖率 {report['coverage']:.1%}、"
+              f"覆盖部分准确率 {report['covered_accuracy']:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
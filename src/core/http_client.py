@@ -0,0 +1,90 @@
+"""
+进程级共享的 LLM HTTP 客户端
+
+所有 ``ChatOpenAI`` 实例（主模型、备用模型、兼容入口中的简单智能体）共用同一对
+同步/异步 httpx 客户端，从而共享连接池：连接数上限、keep-alive 与超时统一由
+``Settings`` 配置。安装了 ``h2`` 时启用 HTTP/2，多个并发请求复用同一条连接；
+未安装时回退到 HTTP/1.1 连接池。
+
+在请求上下文中发出的 LLM 调用会带上当前请求 ID（``REQUEST_ID_HEADER``），
+便于与服务商侧的日志对应。
+"""
+
+import logging
+import threading
+import importlib.util
+from typing import Optional, Tuple
+
+import httpx
+
+from .logs import current_request_id
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_clients: Optional[Tuple[httpx.Client, httpx.AsyncClient]] = None
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def llm_timeout() -> httpx.Timeout:
+    """LLM 请求的连接/读写/连接池等待超时
+
+    OpenAI SDK 会用自身的超时覆盖 httpx 客户端的超时，因此创建 ``ChatOpenAI`` 时
+    也需要通过 ``timeout`` 参数传入。
+    """
+    return httpx.Timeout(settings.llm_read_timeout, connect=settings.llm_connect_timeout,
+                         pool=settings.llm_pool_timeout)
+
+
+def _propagate_request_id(request: httpx.Request) -> None:
+    request_id = current_request_id()
+    if request_id and settings.request_id_header not in request.headers:
+        request.headers[settings.request_id_header] = request_id
+
+
+async def _apropagate_request_id(request: httpx.Request) -> None:
+    _propagate_request_id(request)
+
+
+def create_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """按配置创建一对新的同步/异步客户端"""
+    http2 = settings.llm_http2
+    if http2 and not http2_available():
+        logger.warning("未安装 h2，LLM 客户端回退到 HTTP/1.1（pip install 'httpx[http2]'）")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_keepalive_connections,
+        keepalive_expiry=settings.llm_keepalive_expiry,
+    )
+    options = dict(limits=limits, timeout=llm_timeout(), http2=http2, follow_redirects=True)
+    logger.info("创建共享 LLM HTTP 客户端: http2=%s max_connections=%d keepalive=%d",
+                http2, settings.llm_max_connections, settings.llm_max_keepalive_connections)
+    return (httpx.Client(**options, event_hooks={"request": [_propagate_request_id]}),
+            httpx.AsyncClient(**options, event_hooks={"request": [_apropagate_request_id]}))
+
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """获取进程级共享的 (同步, 异步) 客户端，首次调用或关闭后重新创建"""
+    global _clients
+    clients = _clients
+    if clients is None or clients[0].is_closed or clients[1].is_closed:
+        with _lock:
+            clients = _clients
+            if clients is None or clients[0].is_closed or clients[1].is_closed:
+                clients = _clients = create_http_clients()
+    return clients
+
+
+async def aclose_http_clients() -> None:
+    """关闭共享客户端（应用关闭时调用），之后的 ``get_http_clients`` 会重新创建"""
+    global _clients
+    with _lock:
+        clients, _clients = _clients, None
+    if clients is not None:
+        clients[0].close()
+        await clients[1].aclose()
@@ -0,0 +1,430 @@
+"""
+异步分析任务
+
+``POST /api/v1/jobs`` 把分析请求放入进程内任务队列后立即返回任务 ID，由固定数量的
+后台协程执行，客户端通过 ``GET /api/v1/jobs/{id}`` 查询状态与结果，或提供
+``callback_url`` 在任务结束时接收推送。长文档与批量分析因此不再长时间占用
+nginx / uvicorn 的连接。
+
+任务记录保存在 ``JobStore`` 中：``MemoryJobStore`` 随进程退出丢失；
+``SQLiteJobStore`` 持久化到磁盘，服务重启后排队中与执行到一半的任务会重新入队。
+
+多个 worker 进程共享 ``SQLiteJobStore`` 时，任何 worker 都能查询到任务；每个任务
+记录提交它的进程（``owner``），由该进程执行。进程退出（重启、滚动重启或崩溃）后，
+其余 worker 定期扫描并认领（``JobStore.claim``）这些任务重新执行。进程存活判断
+基于 pid，因此共享存储只适用于同一主机上的 worker。
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import ipaddress
+import inspect
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+from .admission import Overloaded
+from .metrics import JOB_DURATION, JOB_QUEUE_DEPTH, JOB_WEBHOOKS, JOBS
+from .models import JobRequest, JobStatusResponse
+from .resilience import default_budget
+from ..config import settings
+
+if TYPE_CHECKING:
+    from .agent import TextAnalysisAgent
+
+logger = logging.getLogger(__name__)
+
+# 返回智能体（或可等待的智能体，如 ``AgentRegistry.aget``）的函数
+AgentProvider = Callable[[], Union["TextAnalysisAgent", Awaitable["TextAnalysisAgent"]]]
+
+UNFINISHED = ("queued", "running")
+# 清理过期任务的最小间隔（秒），避免每次提交都扫描存储
+PURGE_INTERVAL = 60.0
+# 扫描已退出 worker 遗留任务的间隔（秒）
+ORPHAN_SCAN_INTERVAL = 10.0
+
+
+def process_alive(pid: int) -> bool:
+    """同一主机上 pid 对应的进程是否存在"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """任务存储接口，任务记录为可 JSON 序列化的字典
+
+    ``blocking`` 为 True 的存储（磁盘 I/O）由 ``JobManager`` 在线程池中调用，不阻塞事件循环。
+    """
+
+    blocking = False
+
+    def save(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """按提交顺序返回排队中和执行中的任务"""
+        raise NotImplementedError
+
+    def purge(self, finished_before: float) -> int:
+        """删除在给定时间之前结束的任务，返回删除数"""
+        raise NotImplementedError
+
+    def claim(self, job_id: str, previous_owner: Optional[int], owner: int) -> bool:
+        """任务的 owner 仍为 ``previous_owner`` 时改为 ``owner`` 并返回 True（原子操作）"""
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    """进程内任务存储"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = [dict(job) for job in self._jobs.values() if job["status"] in UNFINISHED]
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < finished_before]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def claim(self, job_id: str, previous_owner: Optional[int], owner: int) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.get("owner") != previous_owner:
+                return False
+            job["owner"] = owner
+            return True
+
+
+class SQLiteJobStore(JobStore):
+    """基于 SQLite 的任务存储，服务重启后任务依然存在"""
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL, "
+            "finished_at REAL, payload TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs(status)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_finished ON analysis_jobs(finished_at)"
+        )
+        self._conn.commit()
+
+    def save(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_jobs (id, status, created_at, finished_at, payload) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job["id"], job["status"], job["created_at"], job["finished_at"],
+                 json.dumps(job, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM analysis_jobs WHERE status IN (?, ?) ORDER BY created_at",
+                UNFINISHED,
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM analysis_jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (finished_before,),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def claim(self, job_id: str, previous_owner: Optional[int], owner: int) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE analysis_jobs SET payload = json_set(payload, '$.owner', ?) "
+                "WHERE id = ? AND json_extract(payload, '$.owner') IS ?",
+                (owner, job_id, previous_owner),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+
+def to_status(job: Dict[str, Any]) -> JobStatusResponse:
+    """任务记录的对外视图（不含原始请求）"""
+    return JobStatusResponse(**{name: job.get(name) for name in JobStatusResponse.model_fields})
+
+
+def _host_allowed(host: str, allowed: List[str]) -> bool:
+    # ".example.com" 匹配其所有子域名，其余条目需完全相同
+    return any(host == entry or (entry.startswith(".") and host.endswith(entry)) for entry in allowed)
+
+
+async def check_callback_url(url: str) -> None:
+    """校验回调地址，不允许时抛出 ``ValueError``
+
+    回调会把完整的分析结果 POST 出去，为防止 SSRF：主机在 ``JOB_CALLBACK_ALLOWED_HOSTS``
+    中时直接放行（由运维显式信任，可以是内网地址）；配置了白名单而主机不在其中时拒绝；
+    未配置白名单时，主机解析出的所有地址都必须是公网地址（拒绝回环、私有网段、
+    链路本地如 169.254.169.254 等）。提交任务和推送前各校验一次。
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError(f"回调地址无效: {url}")
+    allowed = [entry.strip().lower() for entry in settings.job_callback_allowed_hosts.split(",") if entry.strip()]
+    if allowed:
+        if _host_allowed(host, allowed):
+            return
+        raise ValueError(f"回调主机不在 JOB_CALLBACK_ALLOWED_HOSTS 中: {host}")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM)
+    except OSError as e:
+        raise ValueError(f"无法解析回调主机 {host}: {e}") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"回调地址指向非公网地址: {host} -> {address}")
+
+
+class JobManager:
+    """进程内任务队列与工作协程
+
+    ``start`` 需要在应用的事件循环中调用（应用生命周期内），之后 ``submit``
+    才能接收任务。排队任务数达到 ``max_queued`` 时拒绝提交（503，附带按近期
+    任务耗时估算的 ``Retry-After``）。关闭时执行中的任务被取消，使用 SQLite
+    存储时它们会在下次启动时、或由仍在运行的其他 worker 认领后重新执行。
+    """
+
+    def __init__(self, store: JobStore, workers: int = 4, max_queued: int = 1000,
+                 result_ttl: float = 86400, webhook_timeout: float = 10.0):
+        if workers < 1:
+            raise ValueError("JOB_WORKERS 至少为 1")
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.webhook_timeout = webhook_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._agent_provider: Optional[AgentProvider] = None
+        self._webhook_client: Optional[httpx.AsyncClient] = None
+        self._average_duration = 1.0
+        self._last_purge = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self, agent_provider: AgentProvider) -> None:
+        """启动工作协程，并把上次未完成的任务重新入队"""
+        self._agent_provider = agent_provider
+        self._queue = asyncio.Queue()
+        await self._adopt(include_own=True)
+        self._webhook_client = httpx.AsyncClient(timeout=self.webhook_timeout)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._watch_orphans()))
+
+    async def stop(self) -> None:
+        """取消工作协程并关闭回调客户端"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+            self._webhook_client = None
+
+    async def _store_call(self, method: Callable[..., Any], *args: Any) -> Any:
+        # 磁盘存储可能等待其他 worker 的写锁，在线程池中执行；内存存储直接调用，省去线程切换
+        if self.store.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def submit(self, request: JobRequest) -> JobStatusResponse:
+        """保存任务并放入队列，立即返回排队中的任务状态"""
+        if not self.running:
+            raise RuntimeError("任务队列未启动")
+        if self.queued >= self.max_queued:
+            JOBS.labels("rejected").inc()
+            retry_after = self._average_duration * self.queued / self.workers
+            raise Overloaded(f"任务队列已满（{self.max_queued}）", retry_after)
+        await self._purge()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "request": request.model_dump(mode="json"),
+            "owner": os.getpid(),
+        }
+        await self._store_call(self.store.save, job)
+        self._queue.put_nowait(job["id"])
+        JOBS.labels("queued").inc()
+        JOB_QUEUE_DEPTH.set(self.queued)
+        return to_status(job)
+
+    async def get(self, job_id: str) -> Optional[JobStatusResponse]:
+        job = await self._store_call(self.store.get, job_id)
+        return to_status(job) if job is not None else None
+
+    async def _adopt(self, include_own: bool) -> int:
+        """认领无人执行的未完成任务并入队
+
+        跳过仍存活的其他进程的任务；``include_own`` 为 False 时也跳过本进程的任务
+        （它们已经在本进程的队列中）。
+        """
+        pid = os.getpid()
+        adopted = 0
+        for job in await self._store_call(self.store.unfinished):
+            owner = job.get("owner")
+            if owner == pid and not include_own:
+                continue
+            if owner not in (None, pid) and process_alive(owner):
+                continue
+            if not await self._store_call(self.store.claim, job["id"], owner, pid):
+                continue
+            job.update(status="queued", started_at=None, owner=pid)
+            await self._store_call(self.store.save, job)
+            self._queue.put_nowait(job["id"])
+            adopted += 1
+        if adopted:
+            logger.info("恢复 %d 个未完成的任务", adopted)
+        JOB_QUEUE_DEPTH.set(self.queued)
+        return adopted
+
+    async def _watch_orphans(self) -> None:
+        while True:
+            await asyncio.sleep(ORPHAN_SCAN_INTERVAL)
+            try:
+                await self._adopt(include_own=False)
+            except Exception:
+                logger.exception("扫描遗留任务时出错")
+
+    async def _purge(self) -> None:
+        now = time.time()
+        if self.result_ttl <= 0 or now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        removed = await self._store_call(self.store.purge, now - self.result_ttl)
+        if removed:
+            logger.info("清理 %d 个过期任务", removed)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            JOB_QUEUE_DEPTH.set(self.queued)
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("执行任务 %s 时出错", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await self._store_call(self.store.get, job_id)
+        if job is None:
+            return
+        request = JobRequest(**job["request"])
+        job.update(status="running", started_at=time.time())
+        await self._store_call(self.store.save, job)
+        try:
+            agent = self._agent_provider()
+            if inspect.isawaitable(agent):
+                agent = await agent
+            max_concurrency = min(request.max_concurrency or settings.batch_max_concurrency,
+                                  settings.batch_max_concurrency)
+            # 后台任务没有等待中的客户端，默认预算取 JOB_REQUEST_BUDGET 而不是 LLM_REQUEST_BUDGET
+            with default_budget(settings.job_request_budget):
+                result = await agent.aanalyze_batch(request.items, max_concurrency)
+            job.update(status="succeeded", result=result.model_dump(mode="json"))
+        except Exception as e:
+            logger.warning("任务 %s 失败: %s", job_id, e)
+            job.update(status="failed", error=str(e) or type(e).__name__)
+        job["finished_at"] = time.time()
+        await self._store_call(self.store.save, job)
+        duration = job["finished_at"] - job["started_at"]
+        self._average_duration = 0.8 * self._average_duration + 0.2 * duration
+        JOBS.labels(job["status"]).inc()
+        JOB_DURATION.observe(duration)
+        if request.callback_url is not None:
+            await self._notify(str(request.callback_url), job)
+
+    async def _notify(self, url: str, job: Dict[str, Any]) -> None:
+        """向回调地址推送任务状态，失败只记录日志，不影响任务结果"""
+        try:
+            # 提交后 DNS 可能已改为指向内网，推送前重新校验
+            await check_callback_url(url)
+        except ValueError as e:
+            logger.warning("任务 %s 回调被拒绝: %s", job["id"], e)
+            JOB_WEBHOOKS.labels("rejected").inc()
+            return
+        try:
+            response = await self._webhook_client.post(url, json=to_status(job).model_dump(mode="json"))
+            response.raise_for_status()
+            JOB_WEBHOOKS.labels("success").inc()
+        except httpx.HTTPError as e:
+            logger.warning("任务 %s 回调失败: %s", job["id"], e)
+            JOB_WEBHOOKS.labels("error").inc()
+
+
+def create_job_manager() -> JobManager:
+    """根据配置创建任务队列"""
+    if settings.job_store == "sqlite":
+        store: JobStore = SQLiteJobStore(settings.job_sqlite_path)
+    elif settings.job_store == "memory":
+        store = MemoryJobStore()
+    else:
+        raise ValueError(f"不支持的任务存储: {settings.job_store}，可选值: memory, sqlite")
+    return JobManager(store, workers=settings.job_workers, max_queued=settings.job_queue_max,
+                      result_ttl=settings.job_result_ttl, webhook_timeout=settings.job_webhook_timeout)
@@ -0,0 +1,135 @@
+"""
+日志配置
+
+请求路径上只把日志记录放入有界队列（``QueueHandler``），格式化和写出由
+``QueueListener`` 的后台线程完成，不在事件循环中做字符串格式化或阻塞 I/O；
+队列满时丢弃新记录并计数，日志永远不拖慢请求本身。
+
+- ``LOG_FORMAT=json`` 每行输出一个 JSON 对象，``logger.info(..., extra={...})``
+  传入的字段作为顶层键输出，便于日志系统直接按字段检索；``text`` 为人类可读格式
+- 每条记录带上当前请求的 ``request_id``（由 ``RequestLoggingMiddleware`` 设置），
+  请求内任意模块打出的日志都能与访问日志关联
+"""
+
+import sys
+import json
+import queue
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Optional
+
+from .metrics import LOG_RECORDS_DROPPED
+from ..config import settings
+
+LOG_FORMATS = ("json", "text")
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# LogRecord 自带的属性（以及 uvicorn 附加的带颜色消息），其余属性视为通过 extra 传入的结构化字段
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id",
+                                                                "color_message"}
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """在调用方线程中把当前请求 ID 写入记录（上下文变量不会传到写日志的后台线程）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """不阻塞的队列处理器：入队前不做格式化，队列满时丢弃记录"""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.addFilter(RequestIdFilter())
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 记录只在本进程内的线程间传递，无需像默认实现那样提前格式化为字符串
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+def create_formatter(fmt: str) -> logging.Formatter:
+    if fmt == "json":
+        return JsonFormatter()
+    if fmt == "text":
+        return logging.Formatter(TEXT_FORMAT)
+    raise ValueError(f"不支持的日志格式: {fmt}，可选值: {', '.join(LOG_FORMATS)}")
+
+
+_lock = threading.Lock()
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(stream: Optional[IO[str]] = None, fmt: Optional[str] = None,
+                      level: Optional[str] = None) -> NonBlockingQueueHandler:
+    """在根 logger 上安装队列处理器并启动后台写出线程，重复调用时先关闭旧的"""
+    global _handler, _listener
+    formatter = create_formatter(fmt or settings.log_format)
+    with _lock:
+        _shutdown_locked()
+        output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+        output.setFormatter(formatter)
+        _handler = NonBlockingQueueHandler(queue.Queue(settings.log_queue_size))
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel((level or settings.log_level).upper())
+        return _handler
+
+
+def shutdown_logging() -> None:
+    """写出队列中剩余的记录后停止后台线程"""
+    with _lock:
+        _shutdown_locked()
+
+
+def _shutdown_locked() -> None:
+    global _handler, _listener
+    handler, listener = _handler, _listener
+    _handler = _listener = None
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+    if listener is not None:
+        listener.stop()
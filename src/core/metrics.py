@@ -0,0 +1,173 @@
+"""
+Prometheus 指标定义
+
+所有指标注册在默认 registry 上，由 ``/metrics`` 端点导出。标签只使用取值
+有限的维度（路由模板、节点名、状态），避免高基数导致的内存和采集开销。
+
+多 worker 部署时设置 ``PROMETHEUS_MULTIPROC_DIR``（``main.py server`` 会自动设置），
+各进程把指标写入该目录下的 mmap 文件，``/metrics`` 汇总所有 worker 的数据；
+Gauge 以 ``livesum`` 方式合并存活进程的值。
+"""
+
+import os
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+
+# LLM 调用耗时通常在百毫秒到数十秒之间
+LLM_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求处理耗时（秒）",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "正在处理的 HTTP 请求数",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds",
+    "单次 LLM 调用耗时（秒），按工作流节点区分",
+    ["node"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "LLM 调用次数",
+    ["node", "status"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM token 用量（prompt / completion，以及 prompt 中命中前缀缓存的 cached）",
+    ["node", "type"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "LLM 调用重试次数",
+    ["target", "error_type"],
+)
+LLM_HEDGES = Counter(
+    "llm_hedged_requests_total",
+    "发出对冲请求后先返回的一方（original / hedge）",
+    ["winner"],
+)
+LLM_FAILOVERS = Counter(
+    "llm_failovers_total",
+    "主模型失败后转移到备用模型的次数",
+)
+LLM_CALLS_IN_PROGRESS = Gauge(
+    "llm_calls_in_progress",
+    "正在进行的 LLM 调用数",
+    multiprocess_mode="livesum",
+)
+
+ANALYSES_IN_PROGRESS = Gauge(
+    "analyses_in_progress",
+    "正在进行的分析请求数",
+    multiprocess_mode="livesum",
+)
+ANALYSIS_ERRORS = Counter(
+    "analysis_errors_total",
+    "分析失败次数",
+    ["endpoint", "error_type"],
+)
+
+CACHE_EVENTS = Counter(
+    "analysis_cache_events_total",
+    "结果缓存事件（hit / miss / eviction / coalesced / near_duplicate / store_error），按任务计数",
+    ["event"],
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "准入控制拒绝次数（rate_limited_client / rate_limited_global / rate_limit_unavailable / queue_full / queue_timeout）",
+    ["reason"],
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "等待上游 LLM 名额的调用数",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "排队等待上游 LLM 名额的时间（秒）",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "llm_concurrency_limit",
+    "当前自适应并发上游 LLM 调用上限",
+    multiprocess_mode="livesum",
+)
+LLM_BATCH_SIZE = Histogram(
+    "llm_batch_size",
+    "微批处理合并到一次上游调用中的分类条目数",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+CLASSIFICATION_FASTPATH = Counter(
+    "classification_fastpath_total",
+    "分类快速路径结果（hit 为本地模型直接给出，fallback 为置信度不足改用 LLM）",
+    ["outcome"],
+)
+GAZETTEER_ENTITIES = Counter(
+    "gazetteer_entities_total",
+    "实体词典匹配到的实体数",
+)
+ENTITY_LLM_SKIPPED = Counter(
+    "entity_llm_skipped_total",
+    "因实体词典命中足够而跳过的实体抽取 LLM 调用次数",
+)
+JOBS = Counter(
+    "analysis_jobs_total",
+    "异步分析任务状态变化（queued / succeeded / failed / rejected）",
+    ["status"],
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "analysis_job_queue_depth",
+    "排队等待执行的异步分析任务数",
+    multiprocess_mode="livesum",
+)
+JOB_DURATION = Histogram(
+    "analysis_job_duration_seconds",
+    "异步分析任务的执行耗时（秒，不含排队）",
+    buckets=LLM_LATENCY_BUCKETS + (128, 256, 512),
+)
+JOB_WEBHOOKS = Counter(
+    "analysis_job_webhooks_total",
+    "任务结束回调的推送结果（success / error / rejected）",
+    ["outcome"],
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "日志队列已满而丢弃的日志记录数",
+)
+
+
+def multiprocess_dir() -> str:
+    """多进程指标目录，未启用时为空字符串"""
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """返回 (指标文本, Content-Type)；多进程模式下汇总所有 worker 写入的指标"""
+    if multiprocess_dir():
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    """worker 退出时清理本进程的 livesum Gauge 文件，使其不再计入汇总"""
+    if multiprocess_dir():
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
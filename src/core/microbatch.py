@@ -0,0 +1,136 @@
+"""
+跨请求的分类微批处理
+
+分类任务输出只有一个词，单独一次 LLM 调用的开销主要是请求本身。开启后，
+``ClassificationBatcher`` 在 ``window`` 秒内收集并发请求的分类文本，合并为一个
+带编号的多条目提示词发送，再把各条结果分发回等待的请求。批次达到
+``max_batch_size`` 时立即发送；批量回复中缺失或无法解析的条目单独重新分类。
+"""
+
+import re
+import asyncio
+import logging
+import contextvars
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from .metrics import LLM_BATCH_SIZE
+from .resilience import DeadlineExceeded, LLMInvoker, current_deadline, remaining_budget, shared_deadline
+
+logger = logging.getLogger(__name__)
+
+# 批量回复中的一行：“3. 新闻”、“[3] 新闻”、“3：新闻”等
+_BATCH_LINE = re.compile(r"^\s*\[?(\d+)\]?\s*[.．、:：)）]?\s*(.+?)\s*$")
+# 等待中的条目：(文本, future, config, 上下文, 截止时间)
+_Pending = Tuple[str, asyncio.Future, Any, contextvars.Context, Optional[float]]
+
+
+def parse_batch_reply(content: str, count: int) -> Dict[int, str]:
+    """解析带编号的批量回复，返回 {从 0 开始的序号: 结果}，忽略越界与重复编号"""
+    results: Dict[int, str] = {}
+    for line in content.splitlines():
+        match = _BATCH_LINE.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        if 0 <= index < count and index not in results:
+            results[index] = match.group(2)
+    return results
+
+
+class ClassificationBatcher:
+    """收集窗口期内的分类请求并合并为一次 LLM 调用
+
+    批量调用沿用批次中第一个请求的 config 与上下文（回调、追踪），因此该调用的
+    token 用量只计入第一个请求。批量调用的截止时间取批次中最晚的一个，每个请求
+    再按自己的剩余预算等待结果。所有状态只在事件循环线程中修改。
+    """
+
+    def __init__(self, invoker: LLMInvoker,
+                 batch_messages: Callable[[Sequence[str]], List[BaseMessage]],
+                 single_messages: Callable[[str], List[BaseMessage]],
+                 parse_single: Callable[[str], str],
+                 window: float = 0.01, max_batch_size: int = 16):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size 必须大于 0")
+        self.invoker = invoker
+        self.batch_messages = batch_messages
+        self.single_messages = single_messages
+        self.parse_single = parse_single
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def classify(self, text: str, config: Any = None) -> str:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 新的事件循环（如同步路径的 asyncio.run）不能复用旧循环中的批次
+            self._loop, self._pending, self._timer = loop, [], None
+        future = loop.create_future()
+        self._pending.append((text, future, config, contextvars.copy_context(), current_deadline()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        remaining = remaining_budget()
+        if remaining is None:
+            return await future
+        try:
+            return await asyncio.wait_for(future, max(remaining, 0))
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded("分析超出时间预算") from e
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        # 在第一个请求的上下文中执行，使追踪 span 归属于该请求
+        task = self._loop.create_task(self._run(batch), context=batch[0][3])
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        with shared_deadline([deadline for _, _, _, _, deadline in batch]):
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch: List[_Pending]) -> None:
+        texts = [text for text, _, _, _, _ in batch]
+        config = batch[0][2]
+        LLM_BATCH_SIZE.observe(len(batch))
+        try:
+            if len(batch) == 1:
+                reply = await self.invoker.ainvoke(self.single_messages(texts[0]), config=config)
+                results = {0: self.parse_single(reply.content)}
+            else:
+                reply = await self.invoker.ainvoke(self.batch_messages(texts), config=config)
+                results = parse_batch_reply(reply.content, len(batch))
+                missing = [index for index in range(len(batch)) if index not in results]
+                if missing:
+                    logger.warning("批量分类回复缺少 %d/%d 条，逐条重试", len(missing), len(batch))
+                    replies = await asyncio.gather(*(
+                        self.invoker.ainvoke(self.single_messages(texts[index]), config=config)
+                        for index in missing
+                    ))
+                    results.update(
+                        (index, self.parse_single(item.content)) for index, item in zip(missing, replies)
+                    )
+        except BaseException as e:
+            for _, future, _, _, _ in batch:
+                if not future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for index, (_, future, _, _, _) in enumerate(batch):
+            if not future.done():
+                future.set_result(results[index])
@@ -1,5 +1,5 @@
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Dict, Any
+from pydantic import BaseModel, Field, HttpUrl, field_validator
 
 
 class TextAnalysisRequest(BaseModel):
@@ -9,6 +9,11 @@ class TextAnalysisRequest(BaseModel):
     include_entities: bool = Field(True, description="是否包含实体提取")
     include_summary: bool = Field(True, description="是否包含文本摘要")
     language: str = Field("zh", description="文本语言")
+    engine: Optional[Literal["graph", "oneshot"]] = Field(
+        None, description="分析引擎：graph（每个任务单独调用 LLM）或 oneshot（一次调用返回全部结果），默认使用服务配置"
+    )
+    include_timings: bool = Field(False, description="是否在 metadata.timings 中返回各阶段耗时（毫秒）")
+    timeout: Optional[float] = Field(None, gt=0, description="本次分析的总时间预算（秒），默认使用服务配置")
 
 
 class TextAnalysisResponse(BaseModel):
@@ -21,6 +26,60 @@ class TextAnalysisResponse(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict, description="元数据")
 
 
+class BatchAnalysisRequest(BaseModel):
+    """批量文本分析请求模型"""
+    items: List[TextAnalysisRequest] = Field(..., min_length=1, description="待分析的请求列表")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="最大并发数，默认使用服务配置")
+
+
+class BatchItemResult(BaseModel):
+    """批量分析中单个条目的结果"""
+    index: int = Field(..., description="条目在请求列表中的位置")
+    result: Optional[TextAnalysisResponse] = Field(None, description="分析结果，失败时为空")
+    error: Optional[str] = Field(None, description="错误信息，成功时为空")
+
+
+class BatchAnalysisResponse(BaseModel):
+    """批量文本分析响应模型"""
+    results: List[BatchItemResult] = Field(..., description="按请求顺序排列的条目结果")
+    total: int = Field(..., description="条目总数")
+    succeeded: int = Field(..., description="成功条目数")
+    failed: int = Field(..., description="失败条目数")
+    unique: int = Field(..., description="去重后实际分析的条目数")
+    processing_time: float = Field(..., description="处理时间（秒）")
+
+
+class JobRequest(BatchAnalysisRequest):
+    """异步分析任务请求：单篇文档传一个条目即可"""
+    callback_url: Optional[HttpUrl] = Field(None, description="任务结束后以 POST 推送任务状态的地址")
+
+
+class JobStatusResponse(BaseModel):
+    """异步分析任务状态"""
+    id: str = Field(..., description="任务 ID")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(..., description="任务状态")
+    created_at: float = Field(..., description="提交时间（Unix 时间戳）")
+    started_at: Optional[float] = Field(None, description="开始执行时间")
+    finished_at: Optional[float] = Field(None, description="结束时间")
+    result: Optional[BatchAnalysisResponse] = Field(None, description="分析结果，任务成功后返回")
+    error: Optional[str] = Field(None, description="错误信息，任务失败时返回")
+
+
+class OneShotAnalysisResult(BaseModel):
+    """oneshot 引擎的结构化输出"""
+    classification: Optional[str] = Field(None, description="文本分类结果")
+    entities: Optional[List[str]] = Field(None, description="提取的实体列表")
+    summary: Optional[str] = Field(None, description="文本摘要")
+
+    @field_validator("entities", mode="before")
+    @classmethod
+    def _split_entities(cls, value):
+        # 模型偶尔会把实体列表输出为逗号分隔的字符串
+        if isinstance(value, str):
+            return [item.strip() for item in value.replace("，", ",").split(",") if item.strip()]
+        return value
+
+
 class HealthResponse(BaseModel):
     """健康检查响应模型"""
     status: str = Field(..., description="服务状态")
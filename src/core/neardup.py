@@ -0,0 +1,255 @@
+"""
+近似重复文本索引
+
+同一篇文章常以少量改动重复出现（时间戳、结尾的版权声明等），精确哈希的结果缓存
+无法命中。``NearDuplicateIndex`` 为文本计算 MinHash 签名，用 LSH 分段（banding）
+索引，查询时只比较与输入至少有一段签名完全相同的候选，耗时与索引规模基本无关。
+
+- 特征：规范化文本的字符 k-shingle 集合（默认 k=3），不依赖分词，适合中文
+- 签名：one-permutation MinHash，每个 shingle 只哈希一次后分桶取最小值，空桶从
+  右侧最近的非空桶借值（densification）；每个桶只保留低 16 位（b-bit MinHash）
+- 相似度：两个签名相同桶的比例，是 shingle 集合 Jaccard 相似度的无偏估计
+- 索引：签名分为 ``bands`` 段，每段哈希后写入各自的开放寻址表；表与签名都存放在
+  ``array`` 中，不为每个条目创建 Python 对象
+
+索引容量固定，写满后按写入顺序覆盖最早的条目。默认参数下每个条目约占 300 字节，
+100 万条目的内存与查询延迟见 ``benchmarks/bench_neardup.py``。
+"""
+
+import zlib
+import logging
+import threading
+from array import array
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from .cache import document_key, normalize_text
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# 开放寻址表中的空槽
+_EMPTY = 0xFFFFFFFF
+# 文档键（规范化文本的 SHA-256 摘要）按字节存放
+_DOC_KEY_BYTES = 32
+# 可以复用的任务
+REUSABLE_TASKS = ("classification", "entities", "summary")
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """规范化文本的字符 shingle 集合，短于 ``size`` 的文本整体作为一个 shingle"""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash_signature(text: str, num_perm: int = 64, shingle_size: int = 3) -> array:
+    """计算 one-permutation MinHash 签名（``num_perm`` 个 16 位值）"""
+    crc32 = zlib.crc32
+    mins = [_EMPTY] * num_perm
+    for shingle in shingles(text, shingle_size):
+        # crc32 是线性的，乘以奇数常量并折叠高位后再分桶，使相近的 shingle 落入不同的桶
+        value = (crc32(shingle.encode("utf-8")) * 0x9E3779B1) & 0xFFFFFFFF
+        value ^= value >> 15
+        bucket = value % num_perm
+        value //= num_perm
+        if value < mins[bucket]:
+            mins[bucket] = value
+    signature = array("H", bytes(2 * num_perm))
+    for bucket in range(num_perm):
+        offset = 0
+        # shingle 数远少于桶数时从右侧最近的非空桶借值，借来的值按距离扰动，避免各空桶取值相同
+        while mins[(bucket + offset) % num_perm] == _EMPTY:
+            offset += 1
+        signature[bucket] = (mins[(bucket + offset) % num_perm] + offset * 0x9E37) & 0xFFFF
+    return signature
+
+
+# 命中缓存时查询和写入索引使用同一文本，签名只计算一次
+cached_signature = lru_cache(maxsize=16)(minhash_signature)
+
+
+def estimate_similarity(a: array, b: array) -> float:
+    """由两个签名估计 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH 近似重复索引
+
+    条目以写入顺序编号，``slot = 编号 % max_entries``；签名与文档键按槽位存放在
+    连续数组中。每段一张开放寻址表（线性探测），键为该段签名的 32 位哈希，值为
+    槽位；覆盖旧条目时用后移删除（backward shift）从表中移除，不留墓碑。
+
+    ``threshold`` 为复用结果所需的最低估计相似度；``tasks`` 为允许复用的任务。
+    """
+
+    def __init__(self, max_entries: int = 100000, threshold: float = 0.9, num_perm: int = 64,
+                 bands: int = 8, shingle_size: int = 3,
+                 tasks: Iterable[str] = ("classification", "entities")):
+        tasks = tuple(tasks)
+        if num_perm % bands:
+            raise ValueError(f"签名长度 {num_perm} 必须能被分段数 {bands} 整除")
+        if not 0 < threshold <= 1:
+            raise ValueError(f"相似度阈值必须在 (0, 1] 之间: {threshold}")
+        for task in tasks:
+            if task not in REUSABLE_TASKS:
+                raise ValueError(f"不支持的复用任务: {task}，可选值: {', '.join(REUSABLE_TASKS)}")
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.tasks = tasks
+        # 负载因子不超过 0.5，线性探测的平均探测长度保持在常数级
+        size = 1
+        while size < 2 * max_entries:
+            size *= 2
+        self._mask = size - 1
+        self._keys = [array("I", [0]) * size for _ in range(bands)]
+        self._slots = [array("I", [_EMPTY]) * size for _ in range(bands)]
+        self._signatures = array("H")
+        self._documents = bytearray()
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def signature(self, text: str) -> array:
+        return cached_signature(text, self.num_perm, self.shingle_size)
+
+    def add(self, text: str) -> bool:
+        """索引文本，已索引过相同文本时返回 False"""
+        return self.add_signature(self.signature(text), bytes.fromhex(document_key(text)))
+
+    def add_signature(self, signature: array, digest: bytes) -> bool:
+        """按签名和 32 字节文档键写入条目，基准测试可跳过签名计算直接构造索引"""
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            if self._contains(band_keys[0], digest):
+                return False
+            slot = self._written % self.max_entries
+            if self._written >= self.max_entries:
+                self._evict(slot)
+                start = slot * self.num_perm
+                self._signatures[start:start + self.num_perm] = signature
+                self._documents[slot * _DOC_KEY_BYTES:(slot + 1) * _DOC_KEY_BYTES] = digest
+            else:
+                self._signatures.extend(signature)
+                self._documents += digest
+            for band, key in enumerate(band_keys):
+                self._insert(band, key, slot)
+            self._written += 1
+        return True
+
+    def query(self, text: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """返回相似度不低于阈值的已索引文本，按相似度降序排列
+
+        每项为 (文档键, 估计相似度)，文档键即 ``cache.document_key`` 的返回值。
+        """
+        return self.query_signature(self.signature(text), limit)
+
+    def query_signature(self, signature: array, limit: int = 3) -> List[Tuple[str, float]]:
+        matches = []
+        n = self.num_perm
+        with self._lock:
+            for slot in self._candidates(signature):
+                similarity = estimate_similarity(signature, self._signatures[slot * n:(slot + 1) * n])
+                if similarity >= self.threshold:
+                    digest = bytes(self._documents[slot * _DOC_KEY_BYTES:(slot + 1) * _DOC_KEY_BYTES])
+                    matches.append((digest.hex(), similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches[:limit]
+
+    def memory_bytes(self) -> int:
+        """签名、文档键与 LSH 表占用的字节数"""
+        table = sum(keys.itemsize * len(keys) + slots.itemsize * len(slots)
+                    for keys, slots in zip(self._keys, self._slots))
+        return table + self._signatures.itemsize * len(self._signatures) + len(self._documents)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "memory_bytes": self.memory_bytes(),
+            "threshold": self.threshold,
+            "tasks": list(self.tasks),
+        }
+
+    def __len__(self) -> int:
+        return min(self._written, self.max_entries)
+
+    def _band_keys(self, signature: array) -> List[int]:
+        data = signature.tobytes()
+        width = 2 * self.rows
+        return [zlib.crc32(data[band * width:(band + 1) * width]) for band in range(self.bands)]
+
+    def _candidates(self, signature: array) -> set:
+        candidates = set()
+        mask = self._mask
+        for band, key in enumerate(self._band_keys(signature)):
+            keys, slots = self._keys[band], self._slots[band]
+            position = key & mask
+            while slots[position] != _EMPTY:
+                if keys[position] == key:
+                    candidates.add(slots[position])
+                position = (position + 1) & mask
+        return candidates
+
+    def _contains(self, key: int, digest: bytes) -> bool:
+        keys, slots = self._keys[0], self._slots[0]
+        position = key & self._mask
+        while slots[position] != _EMPTY:
+            slot = slots[position]
+            if keys[position] == key and self._documents[slot * _DOC_KEY_BYTES:(slot + 1) * _DOC_KEY_BYTES] == digest:
+                return True
+            position = (position + 1) & self._mask
+        return False
+
+    def _insert(self, band: int, key: int, slot: int) -> None:
+        keys, slots = self._keys[band], self._slots[band]
+        position = key & self._mask
+        while slots[position] != _EMPTY:
+            position = (position + 1) & self._mask
+        keys[position] = key
+        slots[position] = slot
+
+    def _evict(self, slot: int) -> None:
+        start = slot * self.num_perm
+        for band, key in enumerate(self._band_keys(self._signatures[start:start + self.num_perm])):
+            self._remove(band, key, slot)
+
+    def _remove(self, band: int, key: int, slot: int) -> None:
+        keys, slots, mask = self._keys[band], self._slots[band], self._mask
+        hole = key & mask
+        while slots[hole] != slot:
+            hole = (hole + 1) & mask
+        # 后移删除：把探测链上本应位于空洞之前的条目前移，保证查找遇到空槽即可停止
+        position = hole
+        while True:
+            position = (position + 1) & mask
+            if slots[position] == _EMPTY:
+                break
+            home = keys[position] & mask
+            if (position - home) & mask >= (position - hole) & mask:
+                keys[hole] = keys[position]
+                slots[hole] = slots[position]
+                hole = position
+        slots[hole] = _EMPTY
+
+
+def create_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """根据配置创建近似重复索引，未启用时返回 None"""
+    if not settings.neardup_enabled:
+        return None
+    if not settings.cache_enabled:
+        logger.warning("NEARDUP_ENABLED 需要同时启用结果缓存（CACHE_ENABLED），近似重复复用未启用")
+        return None
+    tasks = [task.strip() for task in settings.neardup_tasks.split(",") if task.strip()]
+    index = NearDuplicateIndex(
+        max_entries=settings.neardup_max_entries, threshold=settings.neardup_threshold,
+        num_perm=settings.neardup_num_perm, bands=settings.neardup_bands,
+        shingle_size=settings.neardup_shingle_size, tasks=tasks,
+    )
+    logger.info("近似重复复用已启用: threshold=%.2f, tasks=%s", index.threshold, ",".join(index.tasks))
+    return index
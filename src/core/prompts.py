@@ -0,0 +1,130 @@
+"""
+提示词注册表
+
+所有提示词模板在导入时编译一次（预先拆分为字面量与占位符片段），运行时只做
+字符串拼接。每个模板带有显式版本号，注册表据此与模板内容计算各引擎的提示词
+指纹，作为结果缓存键的一部分：修改任何模板都会使相关缓存失效。
+
+消息布局面向服务商的前缀缓存（prompt caching）设计::
+
+    system: 固定的系统提示词
+    user:   文本：<文档>
+    user:   <任务指令>
+
+同一文档的分类、实体、摘要三次调用共享“系统提示词 + 文档”这一前缀，只有最后
+一条任务指令不同，因此后两次调用可以命中前一次写入的前缀缓存。
+"""
+
+import hashlib
+from string import Formatter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+SYSTEM_PROMPT = (
+    "你是一名严谨的中文文本分析助手。用户会先给出待分析的文本，随后给出具体任务。"
+    "请只依据文本内容作答，严格按任务要求的格式输出，不要添加任何解释。"
+)
+DOCUMENT_TEMPLATE = "文本：\n{text}"
+
+
+class CompiledPrompt:
+    """预编译的提示词模板，占位符语法与 ``str.format`` 相同"""
+
+    __slots__ = ("name", "template", "version", "fields", "_parts", "fingerprint")
+
+    def __init__(self, name: str, template: str, version: int = 1):
+        self.name = name
+        self.template = template
+        self.version = version
+        parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if spec or conversion or (field is not None and not field.isidentifier()):
+                raise ValueError(f"提示词 {name} 只支持简单占位符: {{{field}}}")
+            parts.append((literal, field))
+        self._parts = parts
+        self.fields = frozenset(field for _, field in parts if field is not None)
+        self.fingerprint = hashlib.sha256(f"{name}@{version}\0{template}".encode("utf-8")).hexdigest()
+
+    def render(self, **values: str) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"提示词 {self.name} 缺少变量: {', '.join(sorted(missing))}")
+        return "".join(
+            literal if field is None else literal + str(values[field]) for literal, field in self._parts
+        )
+
+
+class PromptRegistry:
+    """按名称管理编译后的模板，并组装带共享前缀的消息列表"""
+
+    def __init__(self, system: str = SYSTEM_PROMPT, document: str = DOCUMENT_TEMPLATE):
+        self.system = CompiledPrompt("system", system)
+        self.document = CompiledPrompt("document", document)
+        self._prompts: Dict[str, CompiledPrompt] = {}
+        self._system_message = SystemMessage(content=self.system.render())
+
+    def register(self, name: str, template: str, version: int = 1) -> CompiledPrompt:
+        prompt = self._prompts[name] = CompiledPrompt(name, template, version)
+        return prompt
+
+    def get(self, name: str) -> CompiledPrompt:
+        try:
+            return self._prompts[name]
+        except KeyError:
+            raise KeyError(f"未注册的提示词: {name}") from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._prompts
+
+    def messages(self, name: str, text: Optional[str] = None, **values: str) -> List[BaseMessage]:
+        """系统提示词 +（可选的）文档 + 任务指令"""
+        messages: List[BaseMessage] = [self._system_message]
+        if text is not None:
+            messages.append(HumanMessage(content=self.document.render(text=text)))
+        messages.append(HumanMessage(content=self.get(name).render(**values)))
+        return messages
+
+    def version(self, names: Iterable[str]) -> str:
+        """指定模板（连同系统提示词和文档模板）的组合指纹"""
+        digest = hashlib.sha256()
+        for prompt in (self.system, self.document, *(self.get(name) for name in sorted(names))):
+            digest.update(prompt.fingerprint.encode("ascii"))
+        return digest.hexdigest()[:16]
+
+
+# 分析引擎用到的模板，用于计算缓存键中的提示词版本
+ENGINE_PROMPTS: Dict[str, Sequence[str]] = {
+    "graph": ("classification", "classification_batch", "entities", "entities_narrowed", "summary"),
+    # 长文档摘要的归约步骤总是使用 summary 模板
+    "oneshot": ("oneshot", "summary"),
+}
+
+
+def create_prompt_registry() -> PromptRegistry:
+    registry = PromptRegistry()
+    registry.register(
+        "classification",
+        "将上述文本分类到以下类别之一：新闻、博客、研究、其他。\n\n类别：（只输出类别本身，不要理由）",
+    )
+    registry.register(
+        "classification_batch",
+        "将以下每条文本分别分类到以下类别之一：新闻、博客、研究、其他。\n\n{items}\n\n"
+        "按编号逐行输出，每行格式为“编号. 类别”，共 {count} 行，不要输出理由：",
+    )
+    registry.register("entities", "从上述文本中提取所有实体（人物、组织、地点）。以逗号分隔列表形式返回结果。\n\n实体：")
+    registry.register(
+        "entities_narrowed",
+        "从上述文本中提取所有实体（人物、组织、地点）。其中 {known} 已经识别，不要重复输出；"
+        "以逗号分隔列表形式返回其余实体，没有则输出“无”。\n\n实体：",
+    )
+    registry.register("summary", "用一句话总结上述文本。\n\n摘要：")
+    registry.register(
+        "oneshot",
+        "请分析上述文本，只输出一个 JSON 对象，不要输出其他内容。JSON 包含以下字段：\n{fields}\n\nJSON：",
+    )
+    return registry
+
+
+# 进程内共享的默认注册表，导入时编译一次
+PROMPTS = create_prompt_registry()
@@ -0,0 +1,103 @@
+import time
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, Callable, Optional
+
+from .admission import create_llm_limiter
+from .cache import create_result_cache
+from .entities import load_gazetteer
+from .fastpath import create_label_log, load_fast_classifier
+from .neardup import create_near_duplicate_index
+
+if TYPE_CHECKING:
+    from .agent import TextAnalysisAgent
+
+logger = logging.getLogger(__name__)
+
+
+def create_default_agent() -> "TextAnalysisAgent":
+    """按服务配置构建智能体（含结果缓存与近似重复复用、上游并发限制、分类快速路径与实体词典）
+
+    ``agent`` 模块依赖 langgraph / langchain_openai，导入耗时占冷启动的大部分，
+    因此在构建时才导入，不计入应用导入与端口绑定之前的时间。
+    """
+    from .agent import TextAnalysisAgent
+
+    cache = create_result_cache(near_duplicates=create_near_duplicate_index())
+    return TextAnalysisAgent(cache=cache, limiter=create_llm_limiter(),
+                             fast_classifier=load_fast_classifier(), label_log=create_label_log(),
+                             gazetteer=load_gazetteer())
+
+
+class AgentRegistry:
+    """进程级智能体注册表
+
+    在应用启动时构建一次 ``TextAnalysisAgent``（LLM 客户端及其连接池、
+    编译后的工作流），之后所有请求共享该实例。启动失败（例如未配置
+    API 密钥）时不会阻止服务启动，而是在首次请求时再次尝试构建。
+
+    服务中由 ``start_warmup`` 在后台线程构建，应用启动不等待构建完成，uvicorn
+    可以立即绑定端口；构建完成前到达的请求通过 ``aget`` 等待同一次构建。
+    """
+
+    def __init__(self, factory: Callable[[], "TextAnalysisAgent"] = create_default_agent):
+        self._factory = factory
+        self._agent: Optional["TextAnalysisAgent"] = None
+        self._lock = threading.Lock()
+        self._building: Optional[asyncio.Future] = None
+        self.setup_time: Optional[float] = None
+
+    def get(self) -> "TextAnalysisAgent":
+        """获取共享的智能体实例，必要时进行构建"""
+        agent = self._agent
+        if agent is not None:
+            return agent
+        with self._lock:
+            if self._agent is None:
+                start_time = time.perf_counter()
+                self._agent = self._factory()
+                self.setup_time = time.perf_counter() - start_time
+                logger.info("智能体初始化完成，耗时 %.1fms", self.setup_time * 1000)
+            return self._agent
+
+    async def aget(self) -> "TextAnalysisAgent":
+        """获取共享的智能体实例；尚未构建时在线程中构建，不阻塞事件循环，并发调用共享同一次构建"""
+        agent = self._agent
+        if agent is not None:
+            return agent
+        if self._building is None or self._building.done():
+            self._building = asyncio.ensure_future(asyncio.to_thread(self.get))
+        return await asyncio.shield(self._building)
+
+    def startup(self) -> None:
+        """预热智能体，阻塞到构建完成或失败"""
+        try:
+            self.get()
+        except Exception as e:
+            logger.warning("智能体预热失败，将在首次请求时重试: %s", e)
+
+    def start_warmup(self) -> Optional[asyncio.Future]:
+        """在后台线程预热智能体（需在事件循环中调用），失败时在首次请求时重试"""
+        if self._agent is None and (self._building is None or self._building.done()):
+            self._building = asyncio.ensure_future(asyncio.to_thread(self.get))
+            self._building.add_done_callback(self._log_warmup_failure)
+        return self._building
+
+    @staticmethod
+    def _log_warmup_failure(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("智能体预热失败，将在首次请求时重试: %s", future.exception())
+
+    def shutdown(self) -> None:
+        """应用关闭时释放智能体，写出尚未落盘的分类记录"""
+        with self._lock:
+            agent, self._agent = self._agent, None
+        self._building = None
+        label_log = getattr(agent, "label_log", None)
+        if label_log is not None:
+            label_log.close()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._agent is not None
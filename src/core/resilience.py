@@ -0,0 +1,337 @@
+"""
+LLM 调用的容错层
+
+所有节点与 oneshot 调用都经过 ``LLMInvoker``：
+
+- 截止时间：``request_budget()`` 为整个分析请求设置时间预算，每次调用的超时取
+  ``call_timeout`` 与剩余预算中的较小值，预算耗尽时抛出 ``DeadlineExceeded``；
+  未指定预算的请求使用 ``default_budget()``（默认 ``LLM_REQUEST_BUDGET``）
+- 重试：对瞬时错误（超时、连接错误、429/5xx）按带抖动的指数退避重试，
+  上游返回 ``Retry-After`` 时优先采用
+- 对冲请求：调用耗时超过近期延迟的 p95 仍未返回时，再发出一个相同请求，
+  取先返回的结果并取消另一个（需开启 ``LLM_HEDGE_ENABLED``）
+- 故障转移：主模型重试耗尽或返回认证/模型不存在错误时改用备用模型，
+  并在 ``failover_cooldown`` 秒内优先使用备用模型
+"""
+
+import sys
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+from .admission import AdaptiveConcurrencyLimiter, AdmissionError
+from .metrics import LLM_FAILOVERS, LLM_HEDGES, LLM_RETRIES
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# 可重试的上游状态码
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+# 主模型返回这些状态码时重试无意义，但备用模型可能可用
+FAILOVER_STATUS = frozenset({401, 403, 404})
+
+TARGET_NAMES = ("primary", "fallback")
+
+
+class LLMCallError(Exception):
+    """LLM 调用在重试与故障转移后仍然失败"""
+
+    status_code = 502
+    headers: Dict[str, str] = {}
+
+
+class DeadlineExceeded(LLMCallError):
+    """请求的时间预算已耗尽"""
+
+    status_code = 504
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+_default_budget: ContextVar[Optional[float]] = ContextVar("llm_default_budget", default=None)
+
+
+@contextmanager
+def request_budget(seconds: Optional[float]) -> Iterator[None]:
+    """为当前请求内的所有 LLM 调用设置总时间预算；嵌套时取更早的截止时间"""
+    if not seconds:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(min(deadline, outer) if outer else deadline)
+    try:
+        yield
+    finally:
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            _deadline.set(outer)
+
+
+@contextmanager
+def default_budget(seconds: float) -> Iterator[None]:
+    """在当前上下文中覆盖未指定 ``timeout`` 的请求的默认预算，0 表示不限（用于后台任务）"""
+    token = _default_budget.set(seconds)
+    try:
+        yield
+    finally:
+        _default_budget.reset(token)
+
+
+def current_default_budget() -> float:
+    """未指定 ``timeout`` 的请求的时间预算（秒），0 表示不限"""
+    seconds = _default_budget.get()
+    return settings.llm_request_budget if seconds is None else seconds
+
+
+def current_deadline() -> Optional[float]:
+    """当前上下文的截止时间（``time.monotonic()`` 时刻），未设置预算时为 None"""
+    return _deadline.get()
+
+
+@contextmanager
+def shared_deadline(deadlines: Sequence[Optional[float]]) -> Iterator[None]:
+    """代表多个请求的共享调用使用其中最晚的截止时间，任一请求不限时则不限
+
+    各请求仍按自己的预算等待共享调用的结果，预算较短的请求不会让整批提前失败。
+    """
+    token = _deadline.set(None if None in deadlines else max(deadlines, default=None))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """超时、连接错误和 429/5xx 视为瞬时错误，值得重试"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, httpx.TransportError)):
+        return True
+    # openai 随 LLM 客户端按需导入；尚未导入时错误不可能来自 openai SDK
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(error, openai.APIConnectionError):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """重试、超时与对冲参数"""
+
+    def __init__(self, max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 call_timeout: Optional[float] = 60.0, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 failover_cooldown: float = 30.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.call_timeout = call_timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.failover_cooldown = failover_cooldown
+
+    @classmethod
+    def from_settings(cls) -> "RetryPolicy":
+        return cls(
+            max_retries=settings.llm_max_retries,
+            backoff_base=settings.llm_backoff_base,
+            backoff_max=settings.llm_backoff_max,
+            call_timeout=settings.llm_call_timeout or None,
+            hedge=settings.llm_hedge_enabled,
+            hedge_quantile=settings.llm_hedge_quantile,
+            hedge_min_samples=settings.llm_hedge_min_samples,
+            failover_cooldown=settings.llm_failover_cooldown,
+        )
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """第 ``attempt`` 次失败后的等待时间：full jitter 指数退避，上游给出 Retry-After 时优先"""
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+class LLMInvoker:
+    """按 ``RetryPolicy`` 调用主模型，必要时转移到备用模型
+
+    ``targets`` 依次为主模型和可选的备用模型（任意 LangChain Runnable）。
+    异步路径支持超时、对冲请求和并发限制；同步路径只做重试与故障转移，
+    截止时间在两次尝试之间检查。
+    """
+
+    def __init__(self, targets: Sequence[Any], policy: Optional[RetryPolicy] = None,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None, latency_window: int = 200):
+        self.targets = [target for target in targets if target is not None]
+        if not self.targets:
+            raise ValueError("至少需要一个 LLM")
+        self.policy = policy or RetryPolicy.from_settings()
+        self.limiter = limiter
+        self._latencies: List[Deque[float]] = [deque(maxlen=latency_window) for _ in self.targets]
+        self._primary_down_until = 0.0
+
+    def _order(self) -> List[int]:
+        order = list(range(len(self.targets)))
+        if len(order) > 1 and time.monotonic() < self._primary_down_until:
+            order.reverse()
+        return order
+
+    def _mark_failed(self, index: int, error: BaseException) -> None:
+        if index == 0 and len(self.targets) > 1:
+            self._primary_down_until = time.monotonic() + self.policy.failover_cooldown
+            LLM_FAILOVERS.inc()
+            logger.warning("主模型调用失败，转移到备用模型: %s", error)
+
+    def hedge_delay(self, index: int) -> Optional[float]:
+        """近期成功调用延迟的分位数，样本不足时返回 None"""
+        samples = self._latencies[index]
+        if len(samples) < self.policy.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(self.policy.hedge_quantile * (len(ordered) - 1))]
+
+    def _attempt_timeout(self, error: Optional[BaseException]) -> Optional[float]:
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("分析超出时间预算") from error
+        timeouts = [t for t in (self.policy.call_timeout, remaining) if t is not None]
+        return min(timeouts) if timeouts else None
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        delay = self.policy.backoff(attempt, error)
+        remaining = remaining_budget()
+        if remaining is not None and delay >= remaining:
+            raise DeadlineExceeded("分析超出时间预算，放弃重试") from error
+        return delay
+
+    def _exhausted(self, error: Optional[BaseException]) -> LLMCallError:
+        if isinstance(error, DeadlineExceeded):
+            return error
+        return LLMCallError(f"LLM 调用失败: {type(error).__name__}: {error}")
+
+    async def ainvoke(self, messages: Any, config: Optional[Dict[str, Any]] = None) -> Any:
+        error: Optional[BaseException] = None
+        for index in self._order():
+            for attempt in range(self.policy.max_retries + 1):
+                timeout = self._attempt_timeout(error)
+                try:
+                    return await asyncio.wait_for(self._ahedged(index, messages, config), timeout)
+                except asyncio.TimeoutError as e:
+                    error = e
+                    remaining = remaining_budget()
+                    if remaining is not None and remaining <= 0:
+                        raise DeadlineExceeded("分析超出时间预算") from e
+                    if self.limiter is not None:
+                        self.limiter.on_overload()
+                except AdmissionError:
+                    # 本地并发名额不足不是上游故障：不重试、不转移，交给 API 层返回 503 + Retry-After
+                    raise
+                except Exception as e:
+                    error = e
+                    # 非瞬时错误不再重试当前模型
+                    if not is_transient_error(e):
+                        break
+                if attempt < self.policy.max_retries:
+                    LLM_RETRIES.labels(TARGET_NAMES[index], type(error).__name__).inc()
+                    await asyncio.sleep(self._backoff(attempt, error))
+            if _status_code(error) not in FAILOVER_STATUS and not is_transient_error(error):
+                # 不可重试、也不值得转移的错误（如请求本身有误）原样抛出
+                raise error
+            self._mark_failed(index, error)
+        raise self._exhausted(error) from error
+
+    def invoke(self, messages: Any, config: Optional[Dict[str, Any]] = None) -> Any:
+        error: Optional[BaseException] = None
+        for index in self._order():
+            for attempt in range(self.policy.max_retries + 1):
+                self._attempt_timeout(error)
+                try:
+                    return self._timed(index, messages, config)
+                except Exception as e:
+                    error = e
+                    # 非瞬时错误不再重试当前模型
+                    if not is_transient_error(e):
+                        break
+                if attempt < self.policy.max_retries:
+                    LLM_RETRIES.labels(TARGET_NAMES[index], type(error).__name__).inc()
+                    time.sleep(self._backoff(attempt, error))
+            if _status_code(error) not in FAILOVER_STATUS and not is_transient_error(error):
+                # 不可重试、也不值得转移的错误（如请求本身有误）原样抛出
+                raise error
+            self._mark_failed(index, error)
+        raise self._exhausted(error) from error
+
+    def _timed(self, index: int, messages: Any, config: Optional[Dict[str, Any]]) -> Any:
+        start = time.perf_counter()
+        reply = self.targets[index].invoke(messages, config=config)
+        self._latencies[index].append(time.perf_counter() - start)
+        return reply
+
+    async def _atimed(self, index: int, messages: Any, config: Optional[Dict[str, Any]]) -> Any:
+        start = time.perf_counter()
+        reply = await self.targets[index].ainvoke(messages, config=config)
+        self._latencies[index].append(time.perf_counter() - start)
+        return reply
+
+    async def _acall(self, index: int, messages: Any, config: Optional[Dict[str, Any]]) -> Any:
+        if self.limiter is None:
+            return await self._atimed(index, messages, config)
+        async with self.limiter.slot():
+            return await self._atimed(index, messages, config)
+
+    def _can_hedge(self, config: Optional[Dict[str, Any]]) -> bool:
+        if not self.policy.hedge:
+            return False
+        # 逐 token 推送时两个请求的 token 会交错输出
+        if ((config or {}).get("metadata") or {}).get("stream_tokens"):
+            return False
+        return self.limiter is None or self.limiter.has_capacity()
+
+    async def _ahedged(self, index: int, messages: Any, config: Optional[Dict[str, Any]]) -> Any:
+        """发出请求；超过对冲阈值仍未返回时再发一个，取先成功的结果"""
+        delay = self.hedge_delay(index) if self.policy.hedge else None
+        first = asyncio.ensure_future(self._acall(index, messages, config))
+        if delay is None:
+            return await first
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not self._can_hedge(config):
+                return await first
+            hedge = asyncio.ensure_future(self._acall(index, messages, config))
+            pending.add(hedge)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.labels("hedge" if task is hedge else "original").inc()
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,70 @@
+import asyncio
+from typing import Any, Dict
+
+
+class Flight:
+    """一次由 leader 负责的计算，持有各键对应的 future"""
+
+    def __init__(self, owner: "SingleFlight", keys: Dict[str, str]):
+        loop = asyncio.get_running_loop()
+        self._owner = owner
+        self.keys = keys
+        self.futures: Dict[str, asyncio.Future] = {}
+        for name in keys:
+            future = loop.create_future()
+            # 没有等待者时也要取走异常，避免 "exception was never retrieved" 警告
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self.futures[name] = future
+
+    def resolve(self, results: Dict[str, Any]) -> None:
+        self._owner._release(self)
+        for name, future in self.futures.items():
+            if not future.done():
+                future.set_result(results.get(name))
+
+    def fail(self, error: BaseException) -> None:
+        self._owner._release(self)
+        for future in self.futures.values():
+            if future.done():
+                continue
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+
+
+class SingleFlight:
+    """进行中计算的去重表（single-flight）
+
+    以缓存键为粒度登记正在进行的计算。相同键的并发请求不再各自调用 LLM，
+    而是等待首个请求（leader）的结果。所有操作都在事件循环线程中同步完成，
+    ``join`` 与 ``lead`` 之间没有 await，因此无需额外加锁。
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def join(self, keys: Dict[str, str]) -> Dict[str, asyncio.Future]:
+        """返回 {名称: future}，只包含当前事件循环中已在进行的键"""
+        loop = asyncio.get_running_loop()
+        joined = {}
+        for name, key in keys.items():
+            future = self._calls.get(key)
+            if future is not None and future.get_loop() is loop:
+                joined[name] = future
+        return joined
+
+    def lead(self, keys: Dict[str, str]) -> Flight:
+        """登记由当前请求负责计算的键"""
+        flight = Flight(self, keys)
+        for name, key in keys.items():
+            self._calls[key] = flight.futures[name]
+        return flight
+
+    def _release(self, flight: Flight) -> None:
+        for name, key in flight.keys.items():
+            if self._calls.get(key) is flight.futures[name]:
+                del self._calls[key]
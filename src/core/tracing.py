@@ -0,0 +1,329 @@
+"""
+轻量级请求追踪
+
+span 通过 ``contextvars`` 在中间件、路由、工作流与节点之间传递父子关系，
+asyncio 任务和 LangChain 线程池都会复制上下文，因此无需显式传参。
+
+- ``collect_timings()`` 在当前上下文中按 span 名称累计耗时，用于响应中的
+  ``metadata.timings``（仅在请求开启 ``include_timings`` 时收集）
+- 配置 ``TRACING_EXPORTER`` 后，结束的 span 由后台线程批量导出为 OTLP/JSON：
+  ``file`` 每行写入一个 ExportTraceServiceRequest（可被 OpenTelemetry Collector
+  的 otlpjsonfile receiver 读取），``otlp`` 以 OTLP/HTTP JSON 发送到 collector
+"""
+
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# OTLP 中的 SpanKind 与状态码
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+TRACING_EXPORTERS = ("none", "file", "otlp")
+
+
+class Span:
+    """一次计时区间，字段与 OTLP span 一一对应"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent", "parent_id", "kind", "attributes",
+                 "status", "start_ns", "end_ns", "_start", "_end")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None,
+                 remote_parent: Optional[Tuple[str, str]] = None, kind: int = SPAN_KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.parent = parent
+        if parent is not None:
+            self.trace_id, self.parent_id = parent.trace_id, parent.span_id
+        elif remote_parent is not None:
+            self.trace_id, self.parent_id = remote_parent
+        else:
+            self.trace_id, self.parent_id = f"{random.getrandbits(128):032x}", None
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self._end = time.perf_counter()
+        self.end_ns = self.start_ns + int((self._end - self._start) * 1e9)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self._end if self._end is not None else time.perf_counter()
+        return (end - self._start) * 1000
+
+    @property
+    def traceparent(self) -> str:
+        """W3C Trace Context 请求头"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def root(self) -> "Span":
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+    def to_otlp(self) -> Dict[str, Any]:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """解析 W3C ``traceparent`` 请求头，返回 (trace_id, parent_span_id)，格式不合法时返回 None"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    trace_id, span_id = parts[1].lower(), parts[2].lower()
+    try:
+        int(trace_id, 16), int(span_id, 16)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id
+
+
+class Timings:
+    """按 span 名称累计耗时（毫秒）；同名 span（如长文档的各个分块）耗时相加"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, float] = {}
+
+    def add(self, name: str, duration_ms: float) -> None:
+        with self._lock:
+            self._totals[name] = self._totals.get(name, 0.0) + duration_ms
+
+    def to_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: round(value, 3) for name, value in self._totals.items()}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_current_timings: ContextVar[Optional[Timings]] = ContextVar("current_timings", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, remote_parent: Optional[Tuple[str, str]] = None,
+         **attributes: Any) -> Iterator[Span]:
+    """开启一个子 span；没有父 span 时开启新的 trace"""
+    parent = _current_span.get()
+    current = Span(name, parent, None if parent else remote_parent, kind, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = STATUS_ERROR
+        current.set_attribute("error.type", type(e).__name__)
+        raise
+    finally:
+        current.end()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # 异步生成器在其他上下文中被关闭时无法 reset，退回父 span
+            _current_span.set(parent)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(current.name, current.duration_ms)
+        processor = _processor
+        if processor is not None:
+            processor.on_end(current)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Timings]:
+    """在当前上下文中收集 span 耗时
+
+    若当前处于 HTTP 请求的 span 中，``queue`` 记录从收到请求到开始收集之间的等待时间。
+    """
+    timings = Timings()
+    parent = _current_span.get()
+    if parent is not None:
+        timings.add("queue", parent.root().duration_ms)
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        try:
+            _current_timings.reset(token)
+        except ValueError:
+            _current_timings.set(None)
+
+
+class SpanExporter:
+    """span 导出接口"""
+
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_otlp_attribute("service.name", settings.tracing_service_name)]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+    }]}
+
+
+class FileSpanExporter(SpanExporter):
+    """把每批 span 作为一行 OTLP/JSON 追加写入文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans: List[Span]) -> None:
+        self._file.write(json.dumps(_otlp_payload(spans), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def shutdown(self) -> None:
+        self._file.close()
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """以 OTLP/HTTP JSON 协议发送到 collector（如 http://localhost:4318/v1/traces）"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        import httpx
+
+        self.endpoint = endpoint
+        self._client = httpx.Client(timeout=timeout)
+
+    def export(self, spans: List[Span]) -> None:
+        response = self._client.post(self.endpoint, json=_otlp_payload(spans))
+        response.raise_for_status()
+
+    def shutdown(self) -> None:
+        self._client.close()
+
+
+class BatchSpanProcessor:
+    """在后台线程中批量导出 span，请求路径上只做一次无阻塞入队
+
+    队列满时丢弃新的 span 并计数，导出失败只记录日志，追踪永远不影响请求本身。
+    """
+
+    def __init__(self, exporter: SpanExporter, max_queue_size: int = 2048,
+                 max_batch_size: int = 512, schedule_delay: float = 1.0):
+        self.exporter = exporter
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(max_queue_size)
+        self._worker = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._worker.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            batch: List[Span] = []
+            try:
+                item = self._queue.get(timeout=self.schedule_delay)
+                while True:
+                    if item is None:
+                        running = False
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.max_batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning("导出 %d 个 span 失败: %s", len(batch), e)
+
+    def shutdown(self) -> None:
+        """导出队列中剩余的 span 后停止后台线程"""
+        self._queue.put(None)
+        self._worker.join()
+        self.exporter.shutdown()
+
+
+_processor: Optional[BatchSpanProcessor] = None
+
+
+def configure_tracing(exporter: Optional[SpanExporter] = None) -> Optional[BatchSpanProcessor]:
+    """按配置安装 span 导出器；未指定 exporter 且 ``TRACING_EXPORTER=none`` 时不导出"""
+    global _processor
+    shutdown_tracing()
+    if exporter is None:
+        if settings.tracing_exporter == "file":
+            exporter = FileSpanExporter(settings.tracing_file_path)
+        elif settings.tracing_exporter == "otlp":
+            exporter = OTLPHttpSpanExporter(settings.tracing_otlp_endpoint)
+        elif settings.tracing_exporter != "none":
+            raise ValueError(
+                f"不支持的追踪导出器: {settings.tracing_exporter}，可选值: {', '.join(TRACING_EXPORTERS)}"
+            )
+    if exporter is not None:
+        _processor = BatchSpanProcessor(exporter)
+        logger.info("请求追踪导出已启用: %s", type(exporter).__name__)
+    return _processor
+
+
+def shutdown_tracing() -> None:
+    global _processor
+    processor, _processor = _processor, None
+    if processor is not None:
+        processor.shutdown()
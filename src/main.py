@@ -1,27 +1,9 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from src.api.routes import router
-from src.api.middleware import setup_middleware
+"""
+ASGI 入口：``uvicorn src.main:app``
 
-# 创建FastAPI应用
-app = FastAPI(
-    title="文本分析智能体",
-    description="基于LangGraph和FastAPI的智能文本分析系统",
-    version="1.0.0"
-)
+应用统一由 ``src.api.app.create_app`` 构建，这里不再单独配置中间件和路由。
+"""
 
-# 设置中间件
-setup_middleware(app)
+from src.api.app import create_app
 
-# 注册路由
-app.include_router(router, prefix="/api/v1")
-
-# 根路由
-@app.get("/")
-async def root():
-    """根路由"""
-    return {
-        "message": "欢迎使用文本分析智能体",
-        "docs_url": "/docs",
-        "version": "1.0.0"
-    } 
\ No newline at end of file
+app = create_app()
@@ -0,0 +1,88 @@
+"""
+多 worker 服务启动
+
+``run_server`` 通过 uvicorn 的多进程模式启动 N 个 worker（默认 CPU 核数），
+所有 worker 共享同一个监听端口，由内核分配连接：
+
+- 滚动重启：向主进程发送 ``SIGHUP``，逐个启动新 worker，就绪后再停止旧 worker
+- 优雅关闭：``SIGTERM`` / ``SIGINT`` 后 worker 停止接收新连接，最多等待
+  ``APP_GRACEFUL_TIMEOUT`` 秒让进行中的请求完成，再执行应用的关闭流程
+- 扩缩容：``SIGTTIN`` / ``SIGTTOU`` 增加或减少一个 worker
+
+多于一个 worker 时，未显式配置的限流、结果缓存与任务存储改用 SQLite 后端，
+各 worker 共享限流额度和缓存结果，扩容不会拆分限流预算或重复调用上游 LLM；
+同时启用 Prometheus 多进程模式，``/metrics`` 汇总所有 worker 的指标。
+"""
+
+import os
+import glob
+import logging
+import tempfile
+from typing import Optional
+
+import uvicorn
+
+from .config import settings
+from .core.logs import configure_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+# 多 worker 时各组件默认使用的共享后端
+SHARED_BACKENDS = {"RATE_LIMIT_BACKEND": "sqlite", "CACHE_BACKEND": "sqlite", "JOB_STORE": "sqlite"}
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """worker 数，未指定时取 ``APP_WORKERS``，0 表示 CPU 核数"""
+    if workers is None:
+        workers = settings.app_workers
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+def prepare_multiprocess_metrics() -> str:
+    """设置并清空 Prometheus 多进程指标目录，返回目录路径
+
+    目录中残留的上次运行的数据会被计入汇总，因此每次启动前清空。
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="prometheus-multiproc-")
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def prepare_workers() -> None:
+    """在启动 worker 前配置共享后端与多进程指标（worker 进程继承这些环境变量）"""
+    for name, shared in SHARED_BACKENDS.items():
+        value = os.environ.setdefault(name, shared)
+        if value != shared:
+            logger.warning("%s=%s 在多个 worker 间不共享，扩容会拆分其状态", name, value)
+    path = prepare_multiprocess_metrics()
+    logger.info("Prometheus 多进程指标目录: %s", path)
+
+
+def run_server(host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None,
+               reload: bool = False) -> None:
+    """启动服务，阻塞直到主进程退出"""
+    host = host or settings.app_host
+    port = port or settings.app_port
+    # 代码热重载只支持单进程
+    workers = 1 if reload else resolve_workers(workers)
+    configure_logging()
+    try:
+        if workers > 1:
+            prepare_workers()
+        logger.info("启动服务: %s:%d，worker 数 %d", host, port, workers)
+    finally:
+        # uvicorn 接管主进程的信号处理与日志，此前的日志先写出
+        shutdown_logging()
+    # 访问日志由 RequestLoggingMiddleware 输出，关闭 uvicorn 自带的重复记录
+    uvicorn.run(
+        "src.main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        reload=reload,
+        timeout_graceful_shutdown=settings.app_graceful_timeout,
+        access_log=False,
+    )
@@ -0,0 +1,240 @@
+import asyncio
+import sqlite3
+import multiprocessing
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.core.admission import (
+    AdaptiveConcurrencyLimiter, Overloaded, RateLimited, RateLimiter, SQLiteRateLimiter, TokenBucket
+)
+from src.core.agent import TextAnalysisAgent
+from src.core.models import TextAnalysisRequest
+from src.core.registry import AgentRegistry
+
+
+class UpstreamThrottled(Exception):
+    status_code = 429
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(capacity=2, rate=1.0)
+    now = bucket.updated
+    assert bucket.wait_time(1, now) == 0
+    bucket.consume(2)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now + 1.0) == 0
+
+
+def test_rate_limiter_isolates_clients_and_enforces_global_budget():
+    limiter = RateLimiter(requests=2, window=60, global_requests=3)
+    limiter.check("a")
+    limiter.check("a")
+    with pytest.raises(RateLimited) as exc:
+        limiter.check("a")
+    assert exc.value.status_code == 429
+    assert 0 < exc.value.retry_after <= 30
+    assert exc.value.headers["Retry-After"] == str(int(exc.value.retry_after) + 1)
+
+    limiter.check("b")
+    with pytest.raises(RateLimited, match="请求过于频繁"):
+        limiter.check("c")
+    # 被拒绝的请求不扣除令牌
+    assert limiter._clients["c"].tokens == 2
+
+
+def test_api_returns_429_with_retry_after():
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=StubChatModel()))
+    app.state.rate_limiter = RateLimiter(requests=2, window=60)
+    with TestClient(app) as client:
+        statuses = [client.post("/api/v1/analyze", json={"text": f"文本{i}"}).status_code for i in range(2)]
+        rejected = client.post("/api/v1/analyze", json={"text": "文本2"})
+        batch = client.post("/api/v1/analyze/batch", json={"items": [{"text": "x"}]})
+        health = client.get("/api/v1/health")
+    assert statuses == [200, 200]
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert batch.status_code == 429
+    assert health.status_code == 200
+
+
+def test_limiter_caps_concurrent_llm_calls_and_queues_the_rest():
+    limiter = AdaptiveConcurrencyLimiter(initial=2, max_limit=2)
+    agent = TextAnalysisAgent(llm=StubChatModel(latency=0.05), limiter=limiter)
+    peak = 0
+
+    async def watch():
+        nonlocal peak
+        while True:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.005)
+
+    async def run():
+        watcher = asyncio.ensure_future(watch())
+        results = await asyncio.gather(*(
+            agent.aanalyze(TextAnalysisRequest(text=f"文本{i}")) for i in range(4)
+        ))
+        watcher.cancel()
+        return results
+
+    results = asyncio.run(run())
+    assert all(result.summary for result in results)
+    assert peak == 2
+    assert limiter.in_flight == 0 and limiter.queue_depth == 0
+
+
+def test_limiter_rejects_when_queue_is_full_or_wait_times_out():
+    async def hold(limiter, seconds):
+        async with limiter.slot():
+            await asyncio.sleep(seconds)
+
+    async def run():
+        full = AdaptiveConcurrencyLimiter(initial=1, max_limit=1, max_queue=1)
+        holder = asyncio.ensure_future(hold(full, 0.1))
+        queued = asyncio.ensure_future(hold(full, 0))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as exc:
+            await hold(full, 0)
+        assert exc.value.status_code == 503 and exc.value.retry_after > 0
+        await asyncio.gather(holder, queued)
+
+        slow = AdaptiveConcurrencyLimiter(initial=1, max_limit=1, queue_timeout=0.02)
+        holder = asyncio.ensure_future(hold(slow, 0.1))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded, match="等待上游 LLM 名额"):
+            await hold(slow, 0)
+        await holder
+        assert slow.in_flight == 0 and slow.queue_depth == 0
+
+    asyncio.run(run())
+
+
+def test_overloaded_is_not_retried_or_failed_over():
+    limiter = AdaptiveConcurrencyLimiter(initial=1, max_limit=1, max_queue=0)
+    primary, fallback = StubChatModel(), StubChatModel()
+    agent = TextAnalysisAgent(llm=primary, fallback_llm=fallback, limiter=limiter)
+    request = TextAnalysisRequest(text="北京是中国的首都。", include_entities=False, include_summary=False)
+
+    async def run():
+        async with limiter.slot():
+            with pytest.raises(Overloaded) as exc:
+                await agent.aanalyze(request)
+        return exc.value
+
+    error = asyncio.run(run())
+    # 本地排队已满直接以 503 + Retry-After 拒绝，不算上游故障
+    assert error.status_code == 503 and error.headers["Retry-After"]
+    assert primary.call_count == fallback.call_count == 0
+    assert agent.invoker._primary_down_until == 0
+
+
+def test_aimd_grows_on_success_and_halves_on_throttling():
+    async def call(limiter, error=None):
+        async with limiter.slot():
+            await asyncio.sleep(0)
+            if error:
+                raise error
+
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial=4, max_limit=8)
+        # 名额使用过半时才增长
+        await asyncio.gather(*(call(limiter) for _ in range(40)))
+        grown = limiter.limit
+        assert 4 < grown <= 8
+
+        with pytest.raises(UpstreamThrottled):
+            await call(limiter, UpstreamThrottled())
+        assert limiter.limit == pytest.approx(grown / 2)
+        # 同一个延迟周期内的连续失败只下降一次
+        limiter.recent_latency = 60
+        with pytest.raises(UpstreamThrottled):
+            await call(limiter, UpstreamThrottled())
+        assert limiter.limit == pytest.approx(grown / 2)
+
+        with pytest.raises(ValueError):
+            await call(limiter, ValueError("与过载无关"))
+        assert limiter.limit == pytest.approx(grown / 2)
+
+    asyncio.run(run())
+
+
+def test_aimd_shrinks_when_latency_grows():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, latency_tolerance=2.0)
+    for _ in range(5):
+        limiter._observe(0.1)
+    assert limiter.limit >= 8
+    for _ in range(10):
+        limiter._observe(1.0)
+        limiter._last_decrease = 0
+    assert limiter.limit == limiter.min_limit
+
+
+def _take_tokens(path, attempts):
+    # 允许等待写锁并在取不到时拒绝，使放行数只取决于额度
+    limiter = SQLiteRateLimiter(path, requests=50, window=3600, busy_timeout=10, fail_open=False)
+    allowed = 0
+    for _ in range(attempts):
+        try:
+            limiter.check("shared")
+            allowed += 1
+        except RateLimited:
+            pass
+    return allowed
+
+
+def test_sqlite_rate_limiter_shares_budget_between_processes(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    first = SQLiteRateLimiter(path, requests=2, window=60, global_requests=3)
+    second = SQLiteRateLimiter(path, requests=2, window=60, global_requests=3)
+    first.check("a")
+    second.check("a")
+    with pytest.raises(RateLimited) as exc:
+        first.check("a")
+    assert 0 < exc.value.retry_after <= 30
+    second.check("b")
+    with pytest.raises(RateLimited):
+        first.check("c")
+
+    # 多个进程并发扣减同一个桶，总放行数恰好等于额度
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        allowed = pool.starmap(_take_tokens, [(str(tmp_path / "shared.sqlite3"), 30)] * 4)
+    assert sum(allowed) == 50
+
+
+def test_locked_sqlite_limiter_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    limiter = SQLiteRateLimiter(path, requests=1, window=60, busy_timeout=0.3, fail_open=False)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            with pytest.raises(Overloaded):
+                await limiter.acheck("a")
+        finally:
+            task.cancel()
+        return ticks
+
+    # 等待写锁期间事件循环照常运行
+    assert asyncio.run(scenario()) >= 10
+
+    limiter.fail_open = True
+    limiter.check("a")
+    limiter.check("a")
+    holder.execute("ROLLBACK")
+    limiter.check("a")
+    with pytest.raises(RateLimited):
+        limiter.check("a")
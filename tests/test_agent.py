@@ -13,6 +13,9 @@ print("================\n")
 from src.core.agent import TextAnalysisAgent
 from src.core.models import TextAnalysisRequest, TextAnalysisResponse
 
+# 需要真实的 OPENAI_API_KEY 与网络，CI 中以 -m "not integration" 跳过
+pytestmark = pytest.mark.integration
+
 @pytest.fixture
 def agent():
     return TextAnalysisAgent()
@@ -12,6 +12,7 @@ def test_health():
     assert resp.status_code == 200
     assert resp.json()["status"] == "healthy"
 
+@pytest.mark.integration
 def test_analyze():
     data = {
         "text": """
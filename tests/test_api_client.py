@@ -1,8 +1,12 @@
 import requests
 import json
 import argparse
+import pytest
 from typing import Dict, Any
 
+# 需要本地已启动的服务与真实的 OPENAI_API_KEY，CI 中以 -m "not integration" 跳过
+pytestmark = pytest.mark.integration
+
 def test_api(port: int = 8000):
     # API 基础 URL
     base_url = f"http://localhost:{port}/api/v1"
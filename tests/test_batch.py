@@ -0,0 +1,82 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.core.agent import TextAnalysisAgent
+from src.core.models import TextAnalysisRequest
+from src.core.registry import AgentRegistry
+
+
+class FlakyLLM(StubChatModel):
+    """文本中包含“失败”时抛出异常"""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if "失败" in self._prompt(messages):
+            raise RuntimeError("upstream error")
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+class PeakConcurrencyLLM(StubChatModel):
+    """记录同时进行的调用数的峰值"""
+
+    active: int = 0
+    peak: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.active -= 1
+
+
+def _client(llm):
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=llm))
+    return TestClient(app)
+
+
+def test_batch_returns_per_item_results_and_errors():
+    llm = FlakyLLM()
+    client = _client(llm)
+    resp = client.post("/api/v1/analyze/batch", json={"items": [
+        {"text": "北京是中国的首都。"},
+        {"text": "这条会失败。"},
+        {"text": "北京是中国的首都。"},
+        {"text": "上海是直辖市。", "include_entities": False, "include_summary": False},
+    ]})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["total"] == 4 and body["succeeded"] == 3 and body["failed"] == 1
+    assert body["unique"] == 3
+    assert [item["index"] for item in body["results"]] == [0, 1, 2, 3]
+    assert body["results"][1]["result"] is None
+    assert "upstream error" in body["results"][1]["error"]
+    assert body["results"][2]["result"]["classification"] == "新闻"
+    assert body["results"][3]["result"]["summary"] is None
+    # 重复条目只分析一次：3 + 1 次成功调用，失败条目的调用未计入 call_count
+    assert llm.call_count == 4
+
+
+def test_batch_respects_concurrency_limit():
+    llm = PeakConcurrencyLLM(latency=0.05)
+    agent = TextAnalysisAgent(llm=llm, execution_mode="sequential")
+    requests = [TextAnalysisRequest(text=f"文本{i}", include_entities=False, include_summary=False)
+                for i in range(4)]
+    response = asyncio.run(agent.aanalyze_batch(requests, max_concurrency=2))
+    assert response.succeeded == 4
+    # 每条一次分类调用，同时进行的调用不超过并发上限（且确实并发执行）
+    assert llm.call_count == 4
+    assert llm.peak == 2
+
+
+def test_batch_rejects_oversized_requests(monkeypatch):
+    from src.config import settings
+
+    monkeypatch.setattr(settings, "batch_max_items", 2)
+    client = _client(StubChatModel())
+    resp = client.post("/api/v1/analyze/batch", json={"items": [{"text": "a"}, {"text": "b"}, {"text": "c"}]})
+    assert resp.status_code == 422
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import threading
+
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.cache import (
+    MemoryCacheBackend, ResultCache, SQLiteCacheBackend, make_cache_key, normalize_text
+)
+from src.core.models import TextAnalysisRequest
+
+
+def test_cache_key_normalizes_whitespace_and_width():
+    assert normalize_text("  北京　是\n中国的首都。 ") == "北京 是 中国的首都。"
+    key = make_cache_key("北京 是首都", "qwen-plus", "1/graph", "summary")
+    assert key == make_cache_key(" 北京\t是首都\n", "qwen-plus", "1/graph", "summary")
+    assert key != make_cache_key("北京 是首都", "qwen-max", "1/graph", "summary")
+    assert key != make_cache_key("北京 是首都", "qwen-plus", "2/graph", "summary")
+
+
+def test_memory_backend_lru_eviction_and_ttl():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+    assert backend.get("b") is None
+    assert backend.get("a") == 1 and backend.get("c") == 3
+    assert backend.evictions == 1
+
+    backend = MemoryCacheBackend(ttl=0.05)
+    backend.set("a", 1)
+    time.sleep(0.1)
+    assert backend.get("a") is None
+
+
+def test_memory_backend_byte_bound():
+    backend = MemoryCacheBackend(max_bytes=20)
+    backend.set("a", "x" * 10)
+    backend.set("b", "y" * 10)
+    assert len(backend) == 1
+    assert backend.total_bytes <= 20
+
+
+def test_sqlite_backend_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCacheBackend(path).set("a", ["北京", "中国"])
+    backend = SQLiteCacheBackend(path, max_entries=1)
+    assert backend.get("a") == ["北京", "中国"]
+    # 高水位为 max_entries + 10%（至少 1 条），超过后一次淘汰到 max_entries
+    backend.set("b", "摘要")
+    assert len(backend) == 2 and backend.evictions == 0
+    backend.set("c", "实体")
+    assert len(backend) == 1 and backend.evictions == 2
+    assert backend.get("c") == "实体"
+
+
+def test_sqlite_backend_hits_do_not_write_until_batch_flush(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteCacheBackend(path, max_entries=20)
+    for i in range(20):
+        backend.set(str(i), i)
+
+    def accessed_at(key):
+        return backend._conn.execute("SELECT accessed_at FROM analysis_cache WHERE key = ?", (key,)).fetchone()[0]
+
+    before = accessed_at("0")
+    assert backend.get("0") == 0
+    assert accessed_at("0") == before and backend._conn.in_transaction is False
+    # 写入时一并写回访问时间，淘汰时最近读过的条目得以保留
+    for i in range(20, 23):
+        backend.set(str(i), i)
+    assert accessed_at("0") > before
+    assert backend.get("0") == 0 and backend.get("1") is None
+    assert backend.evictions == 3 and len(backend) == 20
+
+
+def test_agent_reuses_partial_cache_hits():
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm, cache=ResultCache(MemoryCacheBackend()))
+    first = agent.analyze(TextAnalysisRequest(text="北京是中国的首都。", include_summary=False))
+    assert first.metadata["cache"] == {"hits": [], "misses": ["classification", "entities"]}
+
+    second = agent.analyze(TextAnalysisRequest(text=" 北京是中国的首都。"))
+    assert second.metadata["cache"] == {"hits": ["classification", "entities"], "misses": ["summary"]}
+    assert second.metadata["usage"]["llm_calls"] == 1
+    assert second.classification == "新闻" and second.entities == ["北京", "中国"]
+    assert llm.call_count == 3
+    assert agent.cache.stats()["hits"] == 2
+
+
+def test_async_path_queries_sqlite_backend_off_the_event_loop(tmp_path):
+    class RecordingBackend(SQLiteCacheBackend):
+        threads = set()
+
+        def get(self, key):
+            self.threads.add(threading.get_ident())
+            return super().get(key)
+
+    backend = RecordingBackend(str(tmp_path / "cache.sqlite3"))
+    agent = TextAnalysisAgent(llm=StubChatModel(), cache=ResultCache(backend))
+    request = TextAnalysisRequest(text="北京是中国的首都。")
+    asyncio.run(agent.aanalyze(request))
+    second = asyncio.run(agent.aanalyze(request))
+    assert second.metadata["cache"]["misses"] == []
+    assert backend.threads and threading.get_ident() not in backend.threads
@@ -0,0 +1,84 @@
+import asyncio
+
+from benchmarks.stub_llm import StubChatModel
+from src.config import settings
+from src.core.agent import TextAnalysisAgent
+from src.core.chunking import chunk_text, estimate_tokens, merge_entities, split_sentences
+from src.core.models import TextAnalysisRequest
+
+
+def test_estimate_tokens_counts_cjk_and_words():
+    assert estimate_tokens("北京是首都") == 5
+    assert estimate_tokens("hello world") == 4
+    assert estimate_tokens("GPT-4") == 3
+
+
+def test_split_sentences_handles_chinese_punctuation():
+    text = "北京是首都。上海呢？真好！第一；第二\n新段落 Version 2.5 is out. Next"
+    assert split_sentences(text) == [
+        "北京是首都。", "上海呢？", "真好！", "第一；", "第二\n", "新段落 Version 2.5 is out.", " Next"
+    ]
+
+
+def test_chunk_text_respects_size_and_overlap():
+    text = "".join(f"这是第{i:03d}句话。" for i in range(200))
+    chunks = chunk_text(text, chunk_size=50, overlap=10)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+    # 相邻块以完整句子重叠
+    assert chunks[1].startswith(chunks[0][-9:])
+    assert chunks[-1].endswith("这是第199句话。")
+
+
+def test_chunk_text_splits_oversized_sentence():
+    chunks = chunk_text("字" * 250, chunk_size=100, overlap=0)
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+
+
+def test_merge_entities_deduplicates():
+    assert merge_entities([["北京", "OpenAI"], [" openai", "上海"], ["北京"]]) == ["北京", "OpenAI", "上海"]
+
+
+def test_long_document_map_reduce(monkeypatch):
+    monkeypatch.setattr(settings, "long_document_threshold", 100)
+    monkeypatch.setattr(settings, "chunk_size", 60)
+    monkeypatch.setattr(settings, "chunk_overlap", 0)
+    monkeypatch.setattr(settings, "summary_reduce_fanin", 3)
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm)
+    text = "北京是中国的首都。" * 60
+
+    resp = asyncio.run(agent.aanalyze(TextAnalysisRequest(text=text)))
+    chunks = resp.metadata["long_document"]["chunks"]
+    assert chunks == 10
+    assert resp.entities == ["北京", "中国"]
+    assert resp.summary == "北京是中国的首都。"
+    # 1 次分类 + 每块实体与摘要 + 10 -> 4 -> 2 -> 1 三轮摘要归约
+    assert llm.calls.count("classification") == 1
+    assert llm.calls.count("entities") == chunks
+    assert llm.calls.count("summary") == chunks + 4 + 2 + 1
+    assert resp.metadata["usage"]["llm_calls"] == llm.call_count
+
+    sync_resp = agent.analyze(TextAnalysisRequest(text=text, include_summary=False))
+    assert sync_resp.entities == ["北京", "中国"]
+
+
+def test_sync_long_document_runs_inside_an_event_loop(monkeypatch):
+    monkeypatch.setattr(settings, "long_document_threshold", 100)
+    monkeypatch.setattr(settings, "chunk_size", 60)
+    monkeypatch.setattr(settings, "chunk_overlap", 0)
+    monkeypatch.setattr(settings, "summary_reduce_fanin", 3)
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm)
+    text = "北京是中国的首都。" * 60
+
+    async def run():
+        # 同步接口在运行中的事件循环里调用（如 Jupyter、异步框架中的同步代码）
+        return agent.analyze(TextAnalysisRequest(text=text, timeout=30))
+
+    resp = asyncio.run(run())
+    assert resp.metadata["long_document"]["chunks"] == 10
+    assert resp.entities == ["北京", "中国"]
+    assert resp.summary == "北京是中国的首都。"
+    assert llm.calls.count("summary") == 10 + 4 + 2 + 1
+    assert resp.metadata["usage"]["llm_calls"] == llm.call_count
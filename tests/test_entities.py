@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+from benchmarks.bench_gazetteer import build_entries, build_text
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.entities import Gazetteer, load_gazetteer, parse_entity_list
+from src.core.models import TextAnalysisRequest
+
+TEXT = "马云在杭州创办了阿里巴巴集团，后来又访问了北京大学和北京。"
+
+
+ENTRIES = [("马云", "人物"), ("杭州", "地点"), ("北京", "地点"), ("北京大学", "组织"),
+           ("阿里巴巴", "组织"), ("阿里巴巴集团", "组织"), ("AI", "组织"), ("AIR", "组织")]
+
+
+# 小词典默认使用正则，regex_max_entries=0 强制构建自动机
+@pytest.fixture(params=[None, 0], ids=["regex", "aho-corasick"])
+def gazetteer(request):
+    return Gazetteer(ENTRIES, regex_max_entries=request.param)
+
+
+def _entities(agent):
+    request = TextAnalysisRequest(text=TEXT, include_classification=False, include_summary=False)
+    return agent.analyze(request).entities
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("北京, 中国", ["北京", "中国"]),
+    ("北京，中国、上海", ["北京", "中国", "上海"]),
+    ("1. 张三\n2. 李四\n3、王五", ["张三", "李四", "王五"]),
+    ("- 苹果公司\n- 微软\n* 谷歌", ["苹果公司", "微软", "谷歌"]),
+    ("人物：张三、李四\n组织：清华大学\n地点：北京", ["张三", "李四", "清华大学", "北京"]),
+    ("“OpenAI”；微软公司。\n\n微软公司", ["OpenAI", "微软公司"]),
+    ("无", []),
+])
+def test_parse_entity_list_handles_common_formats(content, expected):
+    assert parse_entity_list(content) == expected
+
+
+def test_gazetteer_returns_leftmost_longest_non_overlapping_matches(gazetteer):
+    matches = gazetteer.find(TEXT)
+    assert [(name, entity_type) for _, _, name, entity_type in matches] == [
+        ("马云", "人物"), ("杭州", "地点"), ("阿里巴巴集团", "组织"), ("北京大学", "组织"), ("北京", "地点"),
+    ]
+    start, end, name, _ = matches[2]
+    assert TEXT[start:end] == name
+
+
+def test_gazetteer_follows_failure_and_output_links():
+    gazetteer = Gazetteer([("北京", None), ("京东", None), ("京东方", None), ("东方", None)],
+                          regex_max_entries=0)
+    assert gazetteer.matcher == "aho-corasick"
+    raw = {gazetteer.names[entry] for _, _, entry in gazetteer._raw_matches("北京东方")}
+    assert raw == {"北京", "京东", "京东方", "东方"}
+    assert gazetteer.entities("北京东方") == ["北京", "东方"]
+
+
+def test_ascii_entries_respect_word_boundaries(gazetteer):
+    assert gazetteer.entities("AI 不等于 MAIL，也不是 AIRS") == ["AI"]
+    assert gazetteer.entities("AIR2 和 AIR") == ["AIR"]
+
+
+def test_regex_and_automaton_find_the_same_matches():
+    rng = random.Random(0)
+    names = build_entries(300, rng)
+    text = build_text(names + ["AI", "MAIL"], 0.05, rng)
+    entries = [(name, None) for name in names + ["AI", "MAIL"]]
+    regex = Gazetteer(entries)
+    automaton = Gazetteer(entries, regex_max_entries=0)
+    assert (regex.matcher, automaton.matcher) == ("regex", "aho-corasick")
+    assert regex.find(text) == automaton.find(text)
+    assert Gazetteer([]).find(text) == []
+
+
+def test_load_gazetteer_from_file(tmp_path):
+    path = tmp_path / "entities.tsv"
+    path.write_text("# 注释\n北京\t地点\n马云\n\n", encoding="utf-8")
+    gazetteer = load_gazetteer(str(path))
+    assert len(gazetteer) == 2
+    assert gazetteer.find("马云在北京")[0][3] is None
+    assert load_gazetteer(str(tmp_path / "missing.tsv")) is None
+
+
+def test_merge_mode_unions_gazetteer_and_llm_entities(gazetteer):
+    llm = StubChatModel(responses={"entities": "马云，浙江"})
+    agent = TextAnalysisAgent(llm=llm, gazetteer=gazetteer, entity_mode="merge")
+    assert _entities(agent) == ["马云", "杭州", "阿里巴巴集团", "北京大学", "北京", "浙江"]
+    assert llm.call_count == 1
+
+
+def test_narrow_mode_lists_known_entities_in_prompt(gazetteer):
+    prompts = []
+
+    class RecordingLLM(StubChatModel):
+        def _result(self, prompt, task):
+            prompts.append(prompt)
+            return super()._result(prompt, task)
+
+    llm = RecordingLLM(responses={"entities": "无"})
+    agent = TextAnalysisAgent(llm=llm, gazetteer=gazetteer, entity_mode="narrow")
+    assert _entities(agent) == ["马云", "杭州", "阿里巴巴集团", "北京大学", "北京"]
+    assert "马云、杭州、阿里巴巴集团、北京大学、北京 已经识别" in prompts[0]
+
+
+def test_skip_mode_avoids_llm_when_gazetteer_matches(gazetteer):
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm, gazetteer=gazetteer, entity_mode="skip")
+    assert _entities(agent) == ["马云", "杭州", "阿里巴巴集团", "北京大学", "北京"]
+    assert llm.call_count == 0
+
+
+def test_invalid_entity_mode_is_rejected():
+    with pytest.raises(ValueError, match="实体词典模式"):
+        TextAnalysisAgent(llm=StubChatModel(), entity_mode="bogus")
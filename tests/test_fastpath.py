@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from benchmarks.classification_corpus import generate_corpus
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.fastpath import LabelLog, NgramClassifier, evaluate, main, read_samples
+from src.core.models import TextAnalysisRequest
+
+TRAIN = generate_corpus(800, seed=1)
+TEST = generate_corpus(200, seed=2)
+
+
+@pytest.fixture(scope="module")
+def model():
+    return NgramClassifier.train(TRAIN)
+
+
+def _classify(agent, text):
+    request = TextAnalysisRequest(text=text, include_entities=False, include_summary=False)
+    return agent.analyze(request).classification
+
+
+def test_model_learns_llm_labels(model):
+    report = evaluate(model, TEST, threshold=0.9)
+    assert report["accuracy"] > 0.9
+    assert report["coverage"] > 0.5
+    assert report["covered_accuracy"] > 0.95
+
+
+def test_model_round_trips_through_json(model, tmp_path):
+    path = tmp_path / "classifier.json"
+    model.save(str(path))
+    loaded = NgramClassifier.load(str(path))
+    text = TEST[0][0]
+    assert loaded.predict(text)[0] == model.predict(text)[0]
+    assert loaded.predict(text)[1] == pytest.approx(model.predict(text)[1], abs=1e-4)
+
+
+def test_load_rejects_unknown_format(tmp_path):
+    path = tmp_path / "classifier.json"
+    path.write_text(json.dumps({"format": "other", "version": 1}))
+    with pytest.raises(ValueError):
+        NgramClassifier.load(str(path))
+
+
+def test_confident_predictions_skip_the_llm(model):
+    llm = StubChatModel(responses={"classification": "其他"})
+    agent = TextAnalysisAgent(llm=llm, fast_classifier=model, fast_threshold=0.5)
+    text, label = next(sample for sample in TEST if model.predict(sample[0])[1] >= 0.5)
+
+    assert _classify(agent, text) == label
+    assert llm.call_count == 0
+
+
+def test_low_confidence_falls_back_to_llm_and_logs_label(model, tmp_path):
+    log = tmp_path / "labels.jsonl"
+    llm = StubChatModel(responses={"classification": "其他"})
+    agent = TextAnalysisAgent(llm=llm, fast_classifier=model, fast_threshold=1.01,
+                              label_log=LabelLog(str(log)))
+
+    assert _classify(agent, TEST[0][0]) == "其他"
+    assert llm.calls == ["classification"]
+    agent.label_log.close()
+    assert read_samples(str(log)) == [(TEST[0][0], "其他")]
+
+
+def test_train_command_exports_a_loadable_model(tmp_path, capsys):
+    data = tmp_path / "labels.jsonl"
+    data.write_text("".join(json.dumps({"text": text, "label": label}, ensure_ascii=False) + "\n"
+                            for text, label in TRAIN[:300]), encoding="utf-8")
+    output = tmp_path / "classifier.json"
+
+    assert main(["train", "--data", str(data), "--output", str(output), "--epochs", "3"]) == 0
+    assert "留出集 30 条" in capsys.readouterr().out
+    assert NgramClassifier.load(str(output)).labels == ("新闻", "博客", "研究", "其他")
@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.config import settings
+from src.core import http_client
+from src.core.agent import TextAnalysisAgent
+from src.core.http_client import aclose_http_clients, create_http_clients, get_http_clients, llm_timeout
+from src.core.logs import request_id_var
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    asyncio.run(aclose_http_clients())
+    yield
+    asyncio.run(aclose_http_clients())
+
+
+def test_clients_use_configured_limits_and_timeouts(monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_connections", 7)
+    monkeypatch.setattr(settings, "llm_max_keepalive_connections", 3)
+    monkeypatch.setattr(settings, "llm_connect_timeout", 1.5)
+    monkeypatch.setattr(settings, "llm_read_timeout", 30.0)
+    client, async_client = create_http_clients()
+    try:
+        pool = async_client._transport._pool
+        assert pool._max_connections == 7
+        assert pool._max_keepalive_connections == 3
+        assert async_client.timeout == llm_timeout()
+        assert llm_timeout().connect == 1.5 and llm_timeout().read == 30.0
+    finally:
+        client.close()
+        asyncio.run(async_client.aclose())
+
+
+def test_http2_falls_back_when_h2_is_missing(monkeypatch):
+    monkeypatch.setattr(settings, "llm_http2", True)
+    monkeypatch.setattr(http_client, "http2_available", lambda: False)
+    client, async_client = create_http_clients()
+    try:
+        assert not async_client._transport._pool._http2
+    finally:
+        client.close()
+        asyncio.run(async_client.aclose())
+
+
+def test_shared_clients_are_reused_and_recreated_after_close():
+    first = get_http_clients()
+    assert get_http_clients() is first
+    asyncio.run(aclose_http_clients())
+    assert first[1].is_closed
+    second = get_http_clients()
+    assert second is not first and not second[1].is_closed
+
+
+def test_agents_share_one_connection_pool(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(settings, "llm_fallback_model", "fallback-model")
+    first, second = TextAnalysisAgent(), TextAnalysisAgent()
+    client, async_client = get_http_clients()
+    for llm in (first.llm, second.llm, first._create_fallback_llm()):
+        assert llm.http_client is client
+        assert llm.http_async_client is async_client
+        assert llm.request_timeout == llm_timeout()
+
+
+def test_llm_requests_carry_the_current_request_id():
+    seen = []
+
+    def upstream(request):
+        seen.append(request.headers.get(settings.request_id_header))
+        return httpx.Response(200, json={})
+
+    async def scenario():
+        client, async_client = create_http_clients()
+        client.close()
+        async_client._transport = httpx.MockTransport(upstream)
+        async with async_client:
+            await async_client.get("http://llm/v1/models")
+            token = request_id_var.set("req-1")
+            try:
+                await async_client.get("http://llm/v1/models")
+            finally:
+                request_id_var.reset(token)
+
+    asyncio.run(scenario())
+    assert seen == [None, "req-1"]
@@ -0,0 +1,45 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只在构建智能体时才需要的重量级依赖，不应出现在服务入口的导入链中
+LAZY_MODULES = ("langgraph", "langchain", "langchain_core", "langchain_openai", "openai", "langsmith")
+# 导入服务入口（src.main，含创建应用）的累计耗时预算（毫秒），CI 机器较慢时可通过环境变量放宽
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+
+def _import_times(statement: str):
+    """以 ``-X importtime`` 运行语句，返回 {模块名: 累计导入耗时(微秒)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("statement, entry", [
+    ("import src.main", "src.main"),
+    ("import main", "main"),
+])
+def test_server_entrypoints_do_not_import_llm_stack(statement, entry):
+    times = _import_times(statement)
+    assert entry in times
+    loaded = sorted({name.split(".")[0] for name in times} & set(LAZY_MODULES))
+    assert loaded == [], f"{entry} 导入了应按需加载的模块: {loaded}"
+
+
+def test_app_import_time_within_budget():
+    # 取三次中的最小值，降低机器抖动的影响
+    elapsed = min(_import_times("import src.main")["src.main"] for _ in range(3)) / 1000
+    assert elapsed < IMPORT_BUDGET_MS, f"导入 src.main 耗时 {elapsed:.0f}ms，超过预算 {IMPORT_BUDGET_MS:.0f}ms"
@@ -0,0 +1,222 @@
+import os
+import time
+import sqlite3
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.core.admission import Overloaded
+from src.core.agent import TextAnalysisAgent
+from src.core import jobs
+from src.core.jobs import JobManager, MemoryJobStore, SQLiteJobStore, check_callback_url
+from src.core.models import JobRequest
+from src.core.registry import AgentRegistry
+
+ITEMS = [{"text": "北京是中国的首都。"}, {"text": "上海是直辖市。", "include_summary": False}]
+
+
+async def _wait(manager: JobManager, job_id: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = await manager.get(job_id)
+        if job.status in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"任务 {job_id} 未在 {timeout}s 内结束")
+
+
+def test_job_api_returns_id_immediately_and_result_later():
+    llm = StubChatModel(latency=0.05)
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=llm))
+    with TestClient(app) as client:
+        resp = client.post("/api/v1/jobs", json={"items": ITEMS})
+        assert resp.status_code == 202
+        job = resp.json()
+        assert job["status"] == "queued" and job["result"] is None
+        assert resp.headers["Location"].endswith(f"/api/v1/jobs/{job['id']}")
+
+        deadline = time.monotonic() + 5
+        while job["status"] not in ("succeeded", "failed") and time.monotonic() < deadline:
+            time.sleep(0.02)
+            job = client.get(f"/api/v1/jobs/{job['id']}").json()
+        assert job["status"] == "succeeded"
+        assert job["result"]["total"] == 2 and job["result"]["succeeded"] == 2
+        assert job["result"]["results"][1]["result"]["summary"] is None
+        assert job["started_at"] <= job["finished_at"]
+
+        assert client.get("/api/v1/jobs/unknown").status_code == 404
+
+
+def test_submit_rejects_when_queue_is_full():
+    async def scenario():
+        manager = JobManager(MemoryJobStore(), workers=1, max_queued=1)
+        await manager.start(lambda: TextAnalysisAgent(llm=StubChatModel(latency=0.05)))
+        try:
+            await manager.submit(JobRequest(items=ITEMS))
+            with pytest.raises(Overloaded) as excinfo:
+                await manager.submit(JobRequest(items=ITEMS))
+            assert excinfo.value.headers["Retry-After"]
+        finally:
+            await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_jobs_survive_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def first_run():
+        manager = JobManager(SQLiteJobStore(path), workers=1)
+        await manager.start(lambda: TextAnalysisAgent(llm=StubChatModel(latency=1.0)))
+        ids = [(await manager.submit(JobRequest(items=ITEMS))).id for _ in range(2)]
+        await asyncio.sleep(0.05)
+        await manager.stop()
+        return ids
+
+    async def second_run(ids):
+        manager = JobManager(SQLiteJobStore(path), workers=2)
+        assert {job["id"] for job in manager.store.unfinished()} == set(ids)
+        await manager.start(lambda: TextAnalysisAgent(llm=StubChatModel()))
+        try:
+            return [await _wait(manager, job_id) for job_id in ids]
+        finally:
+            await manager.stop()
+
+    jobs = asyncio.run(second_run(asyncio.run(first_run())))
+    assert [job.status for job in jobs] == ["succeeded", "succeeded"]
+
+
+def test_webhook_receives_final_status_and_failures_are_recorded(monkeypatch):
+    monkeypatch.setattr(jobs.settings, "job_callback_allowed_hosts", "hook")
+    received = []
+    hook = FastAPI()
+
+    @hook.post("/done")
+    async def done(request: Request):
+        received.append(await request.json())
+        return {}
+
+    class BrokenAgent:
+        async def aanalyze_batch(self, items, max_concurrency):
+            raise RuntimeError("agent unavailable")
+
+    async def scenario():
+        manager = JobManager(MemoryJobStore(), workers=1)
+        await manager.start(BrokenAgent)
+        await manager._webhook_client.aclose()
+        manager._webhook_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=hook))
+        try:
+            job = await manager.submit(JobRequest(items=ITEMS, callback_url="http://hook/done"))
+            job = await _wait(manager, job.id)
+            await asyncio.sleep(0.05)
+            return job
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(scenario())
+    assert job.status == "failed" and job.error == "agent unavailable"
+    assert received == [job.model_dump(mode="json")]
+
+
+@pytest.mark.parametrize("url", [
+    "http://169.254.169.254/latest/meta-data/",
+    "http://127.0.0.1:8080/hook",
+    "http://10.0.0.5/hook",
+    "http://[::1]/hook",
+    "http://localhost/hook",
+])
+def test_callback_to_private_address_is_rejected_with_422(url):
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=StubChatModel()))
+    with TestClient(app) as client:
+        resp = client.post("/api/v1/jobs", json={"items": ITEMS, "callback_url": url})
+    assert resp.status_code == 422
+    assert "非公网地址" in resp.json()["detail"]
+
+
+def test_callback_allowlist(monkeypatch):
+    monkeypatch.setattr(jobs.settings, "job_callback_allowed_hosts", "hooks.internal, .example.com")
+    asyncio.run(check_callback_url("http://hooks.internal:9000/done"))
+    asyncio.run(check_callback_url("https://api.example.com/done"))
+    for url in ("https://example.org/done", "ftp://hooks.internal/done", "http://evil-example.com/done"):
+        with pytest.raises(ValueError):
+            asyncio.run(check_callback_url(url))
+
+
+def test_finished_jobs_are_purged_after_ttl():
+    store = MemoryJobStore()
+    now = time.time()
+    for job_id, finished_at in (("old", now - 100), ("new", now), ("queued", None)):
+        store.save({"id": job_id, "status": "queued" if finished_at is None else "succeeded",
+                    "created_at": now - 200, "finished_at": finished_at})
+    assert store.purge(now - 10) == 1
+    assert store.get("old") is None and store.get("new") is not None
+    assert [job["id"] for job in store.unfinished()] == ["queued"]
+
+
+def test_jobs_left_by_exited_workers_are_adopted(tmp_path, monkeypatch):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = SQLiteJobStore(path)
+    now = time.time()
+    dead_pid, live_pid = 2 ** 22 + 1, os.getppid()
+    for job_id, owner in (("orphan", dead_pid), ("busy", live_pid)):
+        store.save({"id": job_id, "status": "running", "created_at": now, "started_at": now,
+                    "finished_at": None, "result": None, "error": None,
+                    "request": JobRequest(items=ITEMS).model_dump(mode="json"), "owner": owner})
+    monkeypatch.setattr(jobs, "process_alive", lambda pid: pid == live_pid)
+
+    async def scenario():
+        manager = JobManager(SQLiteJobStore(path), workers=1)
+        await manager.start(lambda: TextAnalysisAgent(llm=StubChatModel()))
+        try:
+            orphan = await _wait(manager, "orphan")
+            # 认领是原子的：已被认领的任务不会被其他 worker 再次认领
+            assert not store.claim("orphan", dead_pid, 1)
+            return orphan, await manager.get("busy")
+        finally:
+            await manager.stop()
+
+    orphan, busy = asyncio.run(scenario())
+    assert orphan.status == "succeeded"
+    assert busy.status == "running"
+    assert store.get("orphan")["owner"] == os.getpid()
+
+
+def test_locked_sqlite_store_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        manager = JobManager(SQLiteJobStore(path), workers=1)
+        await manager.start(lambda: TextAnalysisAgent(llm=StubChatModel()))
+        holder = sqlite3.connect(path, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        submit = asyncio.create_task(manager.submit(JobRequest(items=ITEMS)))
+        try:
+            # 另一个 worker 持有写锁期间，提交在线程池中等待，事件循环照常运行
+            await asyncio.sleep(0.3)
+            assert not submit.done()
+            assert ticks >= 10
+            holder.execute("ROLLBACK")
+            job = await submit
+            return await _wait(manager, job.id)
+        finally:
+            task.cancel()
+            holder.close()
+            await manager.stop()
+
+    assert asyncio.run(scenario()).status == "succeeded"
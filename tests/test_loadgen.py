@@ -0,0 +1,93 @@
+import random
+import asyncio
+import argparse
+from contextlib import contextmanager
+
+import httpx
+import pytest
+
+from benchmarks.fake_openai_server import BackgroundServer, LatencyModel, create_fake_openai_app
+from benchmarks.loadgen import check_thresholds, compare, corpus_payloads, percentile, run_load
+from src.api.app import create_app
+
+
+@contextmanager
+def _serve(monkeypatch, fake):
+    """启动桩 LLM 与按生产配置构建的分析服务（仅 OPENAI_BASE_URL 指向桩服务器），返回服务地址"""
+    with BackgroundServer(fake) as llm_server:
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        monkeypatch.setenv("OPENAI_BASE_URL", f"{llm_server.url}/v1")
+        monkeypatch.setenv("OPENAI_MODEL", "fake-model")
+        app = create_app()
+        app.state.rate_limiter = None
+        with BackgroundServer(app) as app_server:
+            yield app_server.url
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    fake = create_fake_openai_app(latency_model=LatencyModel("uniform", 0.02, 0.01), seed=1)
+    with _serve(monkeypatch, fake) as url:
+        yield fake, url
+
+
+def _load(url: str, requests: int, concurrency: int, rps=None):
+    async def drive():
+        async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+            return await run_load(client, corpus_payloads(requests), requests, concurrency, rps)
+    return asyncio.run(drive())
+
+
+def test_latency_model_is_reproducible_with_seed():
+    model = LatencyModel("lognormal", 0.2, 0.5)
+    first = [model.sample(random.Random(7)) for _ in range(3)]
+    assert first == [model.sample(random.Random(7)) for _ in range(3)]
+    assert LatencyModel("fixed", 0.2).sample(random.Random()) == 0.2
+    assert all(0.1 <= LatencyModel("uniform", 0.2, 0.1).sample(random.Random(i)) <= 0.3 for i in range(50))
+    with pytest.raises(ValueError):
+        LatencyModel("pareto", 0.2)
+
+
+def test_percentile_interpolates():
+    assert percentile([], 95) == 0.0
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5, 1, 3], 100) == 5
+
+
+def test_closed_loop_reports_latency_and_upstream_calls(servers):
+    fake, url = servers
+    result = _load(url, requests=12, concurrency=4)
+    result.upstream_calls = fake.state.call_count
+    report = result.to_dict()
+    assert report["requests"] == report["succeeded"] == 12 and report["error_rate"] == 0
+    latency = report["latency_ms"]
+    assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    # 每个请求一次分类 + 一次实体 + 一次摘要
+    assert report["upstream_calls_per_request"] == 3
+
+
+def test_open_loop_paces_requests_at_fixed_rate(servers):
+    _, url = servers
+    report = _load(url, requests=10, concurrency=10, rps=50).to_dict()
+    assert report["succeeded"] == 10
+    assert report["duration_s"] >= 9 / 50
+
+
+def test_injected_upstream_errors_are_counted(monkeypatch):
+    fake = create_fake_openai_app(error_rate=1.0, seed=0)
+    with _serve(monkeypatch, fake) as url:
+        report = _load(url, requests=3, concurrency=3).to_dict()
+    assert report["succeeded"] < 3
+    assert fake.state.error_count == fake.state.call_count > 0
+
+
+def test_thresholds_and_baseline_flag_regressions():
+    report = {"latency_ms": {"p95": 300.0, "p99": 500.0}, "throughput_rps": 8.0,
+              "error_rate": 0.0, "upstream_calls_per_request": 3.5}
+    args = argparse.Namespace(max_p95_ms=250, max_p99_ms=None, min_throughput=5, max_error_rate=0.01,
+                              max_upstream_calls_per_request=3)
+    assert len(check_thresholds(report, args)) == 2
+
+    baseline = {"latency_ms": {"p95": 200.0}, "throughput_rps": 10.0, "upstream_calls_per_request": 3.0}
+    assert len(compare(report, baseline, max_regression=0.2)) == 2
+    assert len(compare(report, baseline, max_regression=0.6)) == 1
@@ -0,0 +1,84 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.core.agent import TextAnalysisAgent
+from src.core.cache import MemoryCacheBackend, ResultCache
+from src.core.models import TextAnalysisRequest
+from src.core.registry import AgentRegistry
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _client(llm):
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=llm))
+    return TestClient(app)
+
+
+def test_metrics_record_requests_llm_nodes_and_tokens():
+    before = {
+        "requests": _sample("http_request_duration_seconds_count",
+                            method="POST", route="/api/v1/analyze", status="200"),
+        "classification": _sample("llm_call_duration_seconds_count", node="classification"),
+        "summary_calls": _sample("llm_calls_total", node="summarization", status="success"),
+        "prompt_tokens": _sample("llm_tokens_total", node="entity_extraction", type="prompt"),
+    }
+    with _client(StubChatModel()) as client:
+        response = client.post("/api/v1/analyze", json={"text": "北京是中国的首都。"})
+        assert response.status_code == 200
+        metrics = client.get("/metrics")
+
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'llm_call_duration_seconds_count{node="classification"}' in metrics.text
+    assert _sample("http_request_duration_seconds_count",
+                   method="POST", route="/api/v1/analyze", status="200") == before["requests"] + 1
+    assert _sample("llm_call_duration_seconds_count", node="classification") == before["classification"] + 1
+    assert _sample("llm_calls_total", node="summarization", status="success") == before["summary_calls"] + 1
+    assert _sample("llm_tokens_total", node="entity_extraction", type="prompt") > before["prompt_tokens"]
+    assert _sample("llm_calls_in_progress") == 0
+    assert _sample("analyses_in_progress") == 0
+
+
+def test_metrics_count_cache_events_and_errors():
+    hits = _sample("analysis_cache_events_total", event="hit")
+    agent = TextAnalysisAgent(llm=StubChatModel(), cache=ResultCache(MemoryCacheBackend()))
+    agent.analyze(TextAnalysisRequest(text="重复的文本"))
+    agent.analyze(TextAnalysisRequest(text="重复的文本"))
+    assert _sample("analysis_cache_events_total", event="hit") == hits + 3
+
+    errors = _sample("analysis_errors_total", endpoint="analyze", error_type="RuntimeError")
+
+    def broken():
+        raise RuntimeError("LLM 不可用")
+
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=broken)
+    with TestClient(app) as client:
+        assert client.post("/api/v1/analyze", json={"text": "x"}).status_code == 500
+        unmatched = client.get("/no-such-path")
+        assert unmatched.status_code == 404
+    assert _sample("analysis_errors_total", endpoint="analyze", error_type="RuntimeError") == errors + 1
+    assert _sample("http_request_duration_seconds_count",
+                   method="GET", route="unmatched", status="404") >= 1
+
+
+def test_cancelled_analysis_does_not_leak_in_progress_calls():
+    async def cancel_midway():
+        agent = TextAnalysisAgent(llm=StubChatModel(latency=1.0))
+        task = asyncio.create_task(agent.aanalyze(TextAnalysisRequest(text="北京是中国的首都。")))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    before = _sample("llm_calls_total", node="classification", status="cancelled")
+    in_progress = _sample("llm_calls_in_progress")
+    asyncio.run(cancel_midway())
+    assert _sample("llm_calls_in_progress") == in_progress
+    assert _sample("llm_calls_total", node="classification", status="cancelled") == before + 1
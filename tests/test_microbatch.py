@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.microbatch import ClassificationBatcher, parse_batch_reply
+from src.core.models import TextAnalysisRequest
+from src.core.resilience import DeadlineExceeded, RetryPolicy
+
+TEXTS = [f"第 {i} 条新闻：北京是中国的首都。" for i in range(10)]
+
+
+def _classify_all(agent, texts):
+    async def run():
+        requests = [TextAnalysisRequest(text=text, include_entities=False, include_summary=False)
+                    for text in texts]
+        return await asyncio.gather(*(agent.aanalyze(request) for request in requests))
+    return asyncio.run(run())
+
+
+def test_parse_batch_reply_accepts_common_numbering_styles():
+    reply = "1. 新闻\n[2] 博客\n3、研究\n4：其他\n\n9. 越界\n1. 重复"
+    assert parse_batch_reply(reply, 4) == {0: "新闻", 1: "博客", 2: "研究", 3: "其他"}
+
+
+def test_concurrent_classifications_share_one_upstream_call():
+    llm = StubChatModel(latency=0.01)
+    agent = TextAnalysisAgent(llm=llm, batch_classification=True)
+
+    results = _classify_all(agent, TEXTS)
+
+    assert [r.classification for r in results] == ["新闻"] * len(TEXTS)
+    assert llm.calls == ["classification_batch"]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    llm = StubChatModel(latency=0.01)
+    agent = TextAnalysisAgent(llm=llm, batch_classification=True)
+    agent.classification_batcher.max_batch_size = 4
+
+    results = _classify_all(agent, TEXTS)
+
+    assert all(r.classification == "新闻" for r in results)
+    assert llm.call_count == 3
+
+
+def test_single_item_uses_regular_prompt():
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm, batch_classification=True)
+    assert _classify_all(agent, TEXTS[:1])[0].classification == "新闻"
+    assert llm.calls == ["classification"]
+
+
+def test_missing_items_fall_back_to_individual_calls():
+    class PartialLLM(StubChatModel):
+        def _result(self, prompt, task):
+            result = super()._result(prompt, task)
+            if task == "classification_batch":
+                # 丢弃第 2 条
+                lines = result.generations[0].message.content.splitlines()
+                result.generations[0].message = AIMessage(content="\n".join(lines[:1] + lines[2:]))
+            return result
+
+    llm = PartialLLM()
+    agent = TextAnalysisAgent(llm=llm, batch_classification=True)
+    results = _classify_all(agent, TEXTS[:3])
+
+    assert [r.classification for r in results] == ["新闻"] * 3
+    assert llm.calls == ["classification_batch", "classification"]
+
+
+def test_batch_failure_propagates_to_every_waiter():
+    class BrokenInvoker:
+        async def ainvoke(self, messages, config=None):
+            raise RuntimeError("upstream down")
+
+    batcher = ClassificationBatcher(BrokenInvoker(), batch_messages=list, single_messages=list,
+                                    parse_single=str.strip)
+
+    async def run():
+        return await asyncio.gather(*(batcher.classify(text) for text in TEXTS[:3]),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert len(errors) == 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_each_request_keeps_its_own_deadline_in_a_shared_batch():
+    llm = StubChatModel(latency=0.3)
+    agent = TextAnalysisAgent(llm=llm, batch_classification=True, retry_policy=RetryPolicy(max_retries=0))
+
+    async def run():
+        requests = [TextAnalysisRequest(text=text, timeout=timeout, include_entities=False, include_summary=False)
+                    for text, timeout in zip(TEXTS, (0.1, 30))]
+        return await asyncio.gather(*(agent.aanalyze(request) for request in requests), return_exceptions=True)
+
+    hurried, patient = asyncio.run(run())
+    # 批量调用按最晚的截止时间执行，只有预算较短的请求超时
+    assert isinstance(hurried, DeadlineExceeded)
+    assert patient.classification == "新闻"
+    assert llm.calls == ["classification_batch"]
+
+
+def test_sync_path_is_not_batched():
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm, batch_classification=True)
+    request = TextAnalysisRequest(text=TEXTS[0], include_entities=False, include_summary=False)
+    assert agent.analyze(request).classification == "新闻"
+    assert llm.calls == ["classification"]
+
+
+def test_invalid_batch_size_is_rejected():
+    with pytest.raises(ValueError):
+        ClassificationBatcher(None, list, list, str.strip, max_batch_size=0)
@@ -0,0 +1,104 @@
+import io
+import json
+import queue
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.api.middleware import RequestLoggingMiddleware, setup_middleware
+from src.core.logs import NonBlockingQueueHandler, configure_logging, shutdown_logging
+
+
+def _app(**options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        logging.getLogger("tests.handler").info("handling %s", item_id)
+        return {"id": item_id}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"{i}\n"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    if options:
+        app.add_middleware(RequestLoggingMiddleware, **options)
+    else:
+        setup_middleware(app)
+    return app
+
+
+@pytest.fixture
+def read_logs():
+    """安装写入内存的 JSON 日志；调用返回值时停止后台线程并解析已写出的记录"""
+    stream = io.StringIO()
+    configure_logging(stream=stream, fmt="json", level="INFO")
+
+    def read():
+        shutdown_logging()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield read
+    shutdown_logging()
+
+
+def test_request_id_is_propagated_or_generated():
+    client = TestClient(_app())
+    response = client.get("/items/1", headers={"X-Request-ID": "req-42"})
+    assert response.headers["x-request-id"] == "req-42"
+    assert response.headers["traceparent"].startswith("00-")
+
+    generated = client.get("/items/2").headers["x-request-id"]
+    assert len(generated) == 32 and generated != client.get("/items/2").headers["x-request-id"]
+
+
+def test_access_log_is_structured_json_and_correlated(read_logs):
+    client = TestClient(_app())
+    client.get("/items/7", headers={"X-Request-ID": "req-7"})
+    assert client.get("/stream").text == "0\n1\n2\n"
+    log_lines = read_logs()
+
+    access = [line for line in log_lines if line["logger"] == "src.api.access"]
+    assert [line["route"] for line in access] == ["/items/{item_id}", "/stream"]
+    first = access[0]
+    assert first["request_id"] == "req-7"
+    assert first["status"] == 200 and first["path"] == "/items/7" and first["duration_ms"] >= 0
+    assert first["message"].startswith("GET /items/7 200")
+    inner = next(line for line in log_lines if line["logger"] == "tests.handler")
+    assert inner["message"] == "handling 7" and inner["request_id"] == "req-7"
+
+
+def test_sampling_keeps_server_errors(read_logs):
+    client = TestClient(_app(sample_rate=0.0), raise_server_exceptions=False)
+    for _ in range(5):
+        client.get("/items/1")
+    assert client.get("/boom").status_code == 500
+    log_lines = read_logs()
+
+    access = [line for line in log_lines if line["logger"] == "src.api.access"]
+    assert [(line["route"], line["status"]) for line in access] == [("/boom", 500)]
+
+
+def test_full_log_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    logger = logging.getLogger("tests.dropping")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        for i in range(3):
+            logger.warning("record %d", i)
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+    assert handler.dropped == 2
+    assert handler.queue.get_nowait().getMessage() == "record 0"
@@ -0,0 +1,83 @@
+import os
+import random
+from array import array
+
+import pytest
+
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.cache import MemoryCacheBackend, ResultCache, document_key
+from src.core.models import TextAnalysisRequest
+from src.core.neardup import NearDuplicateIndex, estimate_similarity, minhash_signature
+
+ARTICLE = (
+    "北京是中国的首都，也是全国的政治、文化和国际交往中心。近年来，北京持续推进城市更新，"
+    "老旧小区改造、背街小巷整治和轨道交通建设同步展开，市民的通勤时间明显缩短。"
+    "与此同时，中关村的科技企业数量稳步增长，人工智能、集成电路和生物医药成为新的增长点。"
+    "专家认为，京津冀协同发展将进一步疏解非首都功能，带动周边城市的产业升级。"
+)
+
+
+def _edited(timestamp: str, footer: str) -> str:
+    return f"{timestamp} {ARTICLE}{footer}"
+
+
+def test_signature_tracks_jaccard_similarity():
+    original = _edited("2026-10-18 09:00", "（完）")
+    edited = _edited("2026-10-19 17:45", "本文来源：新华社")
+    assert estimate_similarity(minhash_signature(original), minhash_signature(edited)) >= 0.8
+
+    other = "上海今日发布暴雨橙色预警，气象部门提醒市民减少外出，注意防范城市内涝和雷电大风。"
+    assert estimate_similarity(minhash_signature(original), minhash_signature(other)) < 0.2
+    # 短于 shingle 长度的文本也能计算签名
+    assert len(minhash_signature("北京", num_perm=16)) == 16
+
+
+def test_index_queries_evicts_oldest_and_skips_duplicates():
+    rng = random.Random(0)
+    index = NearDuplicateIndex(max_entries=20, threshold=1.0, num_perm=16, bands=4)
+    entries = []
+    for _ in range(60):
+        signature = array("H", [rng.randrange(4) for _ in range(16)])
+        digest = os.urandom(32)
+        assert index.add_signature(signature, digest)
+        entries.append((signature, digest))
+    assert not index.add_signature(*entries[-1])
+    assert len(index) == 20
+
+    def found(entry):
+        return entry[1].hex() in [key for key, _ in index.query_signature(entry[0], limit=100)]
+
+    # 覆盖旧条目后其余条目仍可查到，被覆盖的条目不再返回
+    assert all(found(entry) for entry in entries[-20:])
+    assert not any(found(entry) for entry in entries[:40])
+
+
+def test_index_rejects_invalid_configuration():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_perm=64, bands=7)
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(tasks=("translation",))
+
+
+def test_agent_reuses_results_of_near_duplicate_text():
+    llm = StubChatModel()
+    index = NearDuplicateIndex(max_entries=100, threshold=0.8)
+    agent = TextAnalysisAgent(llm=llm, cache=ResultCache(MemoryCacheBackend(), index))
+    original = _edited("2026-10-18 09:00", "（完）")
+    first = agent.analyze(TextAnalysisRequest(text=original))
+    assert "near_duplicate" not in first.metadata
+    assert llm.call_count == 3 and len(index) == 1
+
+    second = agent.analyze(TextAnalysisRequest(text=_edited("2026-10-19 17:45", "本文来源：新华社")))
+    match = second.metadata["near_duplicate"]
+    assert match["matched"] == document_key(original) and match["similarity"] >= 0.8
+    assert match["tasks"] == ["classification", "entities"]
+    assert second.metadata["cache"] == {"hits": ["classification", "entities"], "misses": ["summary"]}
+    assert second.classification == first.classification and second.entities == first.entities
+    # 只有摘要调用了 LLM；复用得来的结果不写入索引
+    assert llm.call_count == 4 and len(index) == 1
+    assert agent.cache.stats()["near_duplicates"]["hits"] == 2
+
+    unrelated = agent.analyze(TextAnalysisRequest(text="上海今日发布暴雨橙色预警，提醒市民减少外出。"))
+    assert "near_duplicate" not in unrelated.metadata
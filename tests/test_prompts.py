@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+from langchain_core.messages import SystemMessage
+from langchain_openai import ChatOpenAI
+
+from benchmarks.fake_openai_server import create_fake_openai_app
+from benchmarks.stub_llm import PrefixCache, StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.models import TextAnalysisRequest
+from src.core.prompts import PROMPTS, CompiledPrompt, create_prompt_registry
+
+TEXT = "北京是中国的首都，也是全国的政治和文化中心。" * 100
+
+
+def test_compiled_prompt_renders_like_str_format():
+    prompt = CompiledPrompt("demo", "任务：{task}\n字段：{fields}", version=3)
+    assert prompt.fields == {"task", "fields"}
+    assert prompt.render(task="摘要", fields="a") == "任务：摘要\n字段：a"
+    with pytest.raises(KeyError, match="fields"):
+        prompt.render(task="摘要")
+    with pytest.raises(ValueError):
+        CompiledPrompt("bad", "{value:>10}")
+
+
+def test_task_prompts_share_system_and_document_prefix():
+    agent = TextAnalysisAgent(llm=StubChatModel())
+    state = {"text": TEXT}
+    layouts = [agent._classification_messages(state), agent._entity_extraction_messages(state),
+               agent._summarization_messages(state), agent._oneshot_messages(TEXT, ("summary",))]
+    assert all(isinstance(messages[0], SystemMessage) for messages in layouts)
+    assert len({(messages[0].content, messages[1].content) for messages in layouts}) == 1
+    assert TEXT in layouts[0][1].content
+    assert len({messages[-1].content for messages in layouts}) == 4
+
+
+def test_prompt_version_tracks_template_content():
+    edited = create_prompt_registry()
+    edited.register("summary", "用三句话总结上述文本。\n\n摘要：")
+    default = TextAnalysisAgent(llm=StubChatModel())
+    custom = TextAnalysisAgent(llm=StubChatModel(), prompts=edited)
+
+    assert default._prompt_version("graph") == TextAnalysisAgent(llm=StubChatModel())._prompt_version("graph")
+    assert custom._prompt_version("graph") != default._prompt_version("graph")
+    assert custom._prompt_version("oneshot") != default._prompt_version("oneshot")
+    assert PROMPTS.version(["classification"]) == create_prompt_registry().version(["classification"])
+
+
+@pytest.mark.parametrize("execution_mode, expected_hits", [("sequential", 2), ("parallel", 0)])
+def test_later_task_calls_reuse_the_document_prefix(execution_mode, expected_hits):
+    llm = StubChatModel(prefix_cache=PrefixCache(min_tokens=1024), latency=0.05)
+    agent = TextAnalysisAgent(llm=llm, execution_mode=execution_mode)
+    usage = agent.analyze(TextAnalysisRequest(text=TEXT)).metadata["usage"]
+
+    prefix = len(PROMPTS.system.render()) + len(PROMPTS.document.render(text=TEXT))
+    # 并行模式下三个调用同时发出，彼此无法命中对方写入的前缀
+    assert usage["cached_tokens"] == expected_hits * prefix
+    assert usage["cached_tokens"] < usage["prompt_tokens"]
+
+
+def test_cached_tokens_are_read_from_openai_usage_fields():
+    fake = create_fake_openai_app(prefix_cache=True)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake), base_url="http://fake")
+    llm = ChatOpenAI(model="fake-model", api_key="sk-test", base_url="http://fake/v1",
+                     max_retries=0, http_async_client=client)
+    agent = TextAnalysisAgent(llm=llm, execution_mode="sequential")
+
+    usage = asyncio.run(agent.aanalyze(TextAnalysisRequest(text=TEXT))).metadata["usage"]
+    assert usage["llm_calls"] == 3
+    assert usage["cached_tokens"] > 0
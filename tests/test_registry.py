@@ -0,0 +1,76 @@
+import time
+import threading
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.core.agent import TextAnalysisAgent
+from src.core.registry import AgentRegistry
+
+
+class DummyAgent:
+    instances = 0
+
+    def __init__(self):
+        DummyAgent.instances += 1
+
+
+def test_registry_builds_agent_once():
+    DummyAgent.instances = 0
+    registry = AgentRegistry(factory=DummyAgent)
+    threads = [threading.Thread(target=registry.get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert DummyAgent.instances == 1
+    assert registry.get() is registry.get()
+    assert registry.setup_time is not None
+
+
+def test_registry_startup_failure_is_deferred():
+    def failing_factory():
+        raise ValueError("请设置 OPENAI_API_KEY 环境变量")
+
+    registry = AgentRegistry(factory=failing_factory)
+    registry.startup()
+    assert not registry.is_ready
+
+
+def _wait_ready(client: TestClient, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while client.get("/api/v1/ready").status_code != 200:
+        assert time.monotonic() < deadline, "智能体未在超时时间内预热完成"
+        time.sleep(0.01)
+
+
+def test_app_lifespan_warms_shared_agent():
+    DummyAgent.instances = 0
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=DummyAgent)
+    with TestClient(app) as client:
+        _wait_ready(client)
+        assert app.state.agent_registry.is_ready
+    assert DummyAgent.instances == 1
+
+
+def test_warmup_runs_in_background_and_requests_wait_for_it():
+    started = threading.Event()
+
+    def slow_factory():
+        started.set()
+        time.sleep(0.5)
+        return TextAnalysisAgent(llm=StubChatModel())
+
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=slow_factory)
+    with TestClient(app) as client:
+        assert started.wait(5)
+        # 预热期间事件循环不被阻塞：存活探针立即返回，就绪探针返回 503
+        start = time.perf_counter()
+        assert client.get("/api/v1/health").status_code == 200
+        assert client.get("/api/v1/ready").json() == {"status": "warming"}
+        assert time.perf_counter() - start < 0.4
+        # 预热完成前到达的请求等待同一次构建
+        assert client.post("/api/v1/analyze", json={"text": "北京是中国的首都。"}).status_code == 200
+        assert client.get("/api/v1/ready").status_code == 200
@@ -0,0 +1,180 @@
+import time
+import asyncio
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+from langchain_openai import ChatOpenAI
+from prometheus_client import REGISTRY
+
+from benchmarks.fake_openai_server import create_fake_openai_app
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.config import settings
+from src.core.agent import TextAnalysisAgent, _budget_for
+from src.core.models import TextAnalysisRequest
+from src.core.registry import AgentRegistry
+from src.core.resilience import (
+    DeadlineExceeded, LLMCallError, LLMInvoker, RetryPolicy, default_budget, remaining_budget
+)
+
+TEXT = "北京是中国的首都。"
+FAST = RetryPolicy(max_retries=2, backoff_base=0.001, backoff_max=0.01)
+
+
+def _chat(app, model="fake-model"):
+    """通过 ASGI transport 直连桩服务器，无需监听端口"""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake")
+    return ChatOpenAI(model=model, api_key="sk-test", base_url="http://fake/v1",
+                      max_retries=0, http_async_client=client)
+
+
+def _classify(agent, **kwargs):
+    request = TextAnalysisRequest(text=TEXT, include_entities=False, include_summary=False, **kwargs)
+    return asyncio.run(agent.aanalyze(request))
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_transient_errors_are_retried_with_backoff():
+    fake = create_fake_openai_app()
+    fake.state.faults.extend([{"status": 503}, {"status": 429}])
+    retries = _sample("llm_retries_total", target="primary", error_type="InternalServerError")
+    agent = TextAnalysisAgent(llm=_chat(fake), retry_policy=FAST)
+
+    assert _classify(agent).classification == "新闻"
+    assert fake.state.call_count == 3
+    assert _sample("llm_retries_total", target="primary", error_type="InternalServerError") == retries + 1
+
+
+def test_non_transient_errors_are_not_retried():
+    fake = create_fake_openai_app()
+    fake.state.faults.append({"status": 400})
+    agent = TextAnalysisAgent(llm=_chat(fake), retry_policy=FAST)
+    with pytest.raises(openai.BadRequestError):
+        _classify(agent)
+    assert fake.state.call_count == 1
+
+
+def test_failover_to_secondary_model_and_prefer_it_during_cooldown():
+    primary, secondary = create_fake_openai_app(), create_fake_openai_app()
+    primary.state.error_rate = 1.0
+    agent = TextAnalysisAgent(llm=_chat(primary), fallback_llm=_chat(secondary, "backup-model"),
+                              retry_policy=FAST)
+
+    assert _classify(agent).classification == "新闻"
+    assert (primary.state.call_count, secondary.state.call_count) == (3, 1)
+    _classify(agent, engine="oneshot")
+    assert _classify(agent, include_timings=True).classification == "新闻"
+    # 冷却期内 graph 引擎直接使用备用模型；oneshot 引擎有独立的调用层，需自行发现主模型故障
+    assert primary.state.call_count == 6
+
+
+def test_exhausted_retries_raise_llm_call_error():
+    fake = create_fake_openai_app(error_rate=1.0, error_status=502)
+    agent = TextAnalysisAgent(llm=_chat(fake), retry_policy=FAST)
+    with pytest.raises(LLMCallError, match="InternalServerError"):
+        _classify(agent)
+    assert fake.state.call_count == 3
+
+
+def test_slow_attempt_times_out_and_is_retried():
+    fake = create_fake_openai_app(latency=0.01)
+    fake.state.faults.append({"delay": 2.0})
+    policy = RetryPolicy(max_retries=1, backoff_base=0.001, call_timeout=0.2)
+    agent = TextAnalysisAgent(llm=_chat(fake), retry_policy=policy)
+
+    start = time.perf_counter()
+    assert _classify(agent).classification == "新闻"
+    assert time.perf_counter() - start < 1.0
+    assert fake.state.call_count == 2
+
+
+def test_request_budget_bounds_total_time_and_maps_to_504():
+    fake = create_fake_openai_app(latency=2.0)
+    agent = TextAnalysisAgent(llm=_chat(fake), retry_policy=FAST)
+
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        _classify(agent, timeout=0.2)
+    assert time.perf_counter() - start < 1.0
+
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=lambda: agent)
+    with TestClient(app) as client:
+        response = client.post("/api/v1/analyze", json={"text": TEXT, "timeout": 0.1})
+    assert response.status_code == 504
+
+
+def test_default_budget_scales_for_long_documents_and_is_lifted_for_jobs(monkeypatch):
+    monkeypatch.setattr(settings, "llm_request_budget", 10)
+    monkeypatch.setattr(settings, "long_document_threshold", 100)
+    monkeypatch.setattr(settings, "chunk_size", 60)
+    monkeypatch.setattr(settings, "chunk_overlap", 0)
+    monkeypatch.setattr(settings, "chunk_max_concurrency", 4)
+
+    def budget(text, **kwargs):
+        with _budget_for(TextAnalysisRequest(text=text, **kwargs)):
+            return remaining_budget()
+
+    assert 9 < budget(TEXT) <= 10
+    # 10 块、每轮 4 块并行：3 轮 map + 1 轮归约
+    assert 39 < budget(TEXT * 60) <= 40
+    assert 0 < budget(TEXT * 60, timeout=1) <= 1
+    with default_budget(0):
+        assert budget(TEXT * 60) is None
+        assert 0 < budget(TEXT, timeout=1) <= 1
+
+
+def test_hedged_request_cuts_tail_latency():
+    fake = create_fake_openai_app(latency=0.01)
+    policy = RetryPolicy(max_retries=0, hedge=True, hedge_min_samples=5)
+    invoker = LLMInvoker([_chat(fake)], policy)
+    hedge_wins = _sample("llm_hedged_requests_total", winner="hedge")
+
+    async def run():
+        for _ in range(5):
+            await invoker.ainvoke("分类")
+        fake.state.faults.append({"delay": 2.0})
+        start = time.perf_counter()
+        reply = await invoker.ainvoke("分类")
+        return reply, time.perf_counter() - start
+
+    reply, elapsed = asyncio.run(run())
+    assert reply.content == "新闻"
+    assert elapsed < 1.0
+    assert fake.state.call_count == 7
+    assert _sample("llm_hedged_requests_total", winner="hedge") == hedge_wins + 1
+
+
+def test_sync_path_retries_transient_errors():
+    class FlakyError(Exception):
+        status_code = 503
+
+    class FlakyLLM(StubChatModel):
+        failures: int = 2
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            if self.failures:
+                self.failures -= 1
+                raise FlakyError("temporarily unavailable")
+            return super()._generate(messages, stop, run_manager, **kwargs)
+
+    agent = TextAnalysisAgent(llm=FlakyLLM(), retry_policy=FAST)
+    result = agent.analyze(TextAnalysisRequest(text=TEXT, include_entities=False, include_summary=False))
+    assert result.classification == "新闻"
+
+
+def test_backoff_uses_full_jitter_and_honours_retry_after():
+    policy = RetryPolicy(backoff_base=0.5, backoff_max=4.0)
+    delays = [policy.backoff(3, RuntimeError()) for _ in range(200)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert max(delays) > 2.0
+
+    response = httpx.Response(429, headers={"retry-after": "1.5"},
+                              request=httpx.Request("POST", "http://fake/v1/chat/completions"))
+    error = openai.RateLimitError("slow down", response=response, body=None)
+    assert policy.backoff(0, error) == 1.5
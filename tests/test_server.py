@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import signal
+import socket
+import subprocess
+
+import httpx
+import pytest
+
+from benchmarks.fake_openai_server import BackgroundServer, create_fake_openai_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, "服务进程提前退出"
+        try:
+            if httpx.get(f"{url}/api/v1/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise AssertionError("服务未在超时时间内就绪")
+
+
+def _post(url: str, text: str) -> int:
+    # 每个请求使用新连接，由内核分配到不同的 worker
+    return httpx.post(f"{url}/api/v1/analyze", json={"text": text}, timeout=30).status_code
+
+
+@pytest.mark.slow
+def test_workers_share_cache_rate_limits_and_metrics(tmp_path):
+    fake = create_fake_openai_app(latency=0.01)
+    port = _free_port()
+    # 多进程指标目录需在 prometheus_client 导入前存在
+    (tmp_path / "metrics").mkdir()
+    url = f"http://127.0.0.1:{port}"
+    with BackgroundServer(fake) as llm_server:
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY="sk-test", OPENAI_BASE_URL=f"{llm_server.url}/v1", OPENAI_MODEL="fake-model",
+            RATE_LIMIT_ENABLED="true", RATE_LIMIT_REQUESTS="6", RATE_LIMIT_WINDOW="3600",
+            RATE_LIMIT_SQLITE_PATH=str(tmp_path / "limits.sqlite3"),
+            CACHE_SQLITE_PATH=str(tmp_path / "cache.sqlite3"),
+            JOB_SQLITE_PATH=str(tmp_path / "jobs.sqlite3"),
+            PROMETHEUS_MULTIPROC_DIR=str(tmp_path / "metrics"),
+            APP_GRACEFUL_TIMEOUT="5",
+        )
+        for name in ("RATE_LIMIT_BACKEND", "CACHE_BACKEND", "JOB_STORE"):
+            env.pop(name, None)
+        process = subprocess.Popen(
+            [sys.executable, "main.py", "server", "--host", "127.0.0.1", "--port", str(port), "--workers", "2"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_ready(url, process)
+            statuses = [_post(url, "北京是中国的首都。") for _ in range(8)]
+            # 6 次额度由两个 worker 共享；相同文本只在第一次调用上游（分类、实体、摘要各一次）
+            assert statuses == [200] * 6 + [429] * 2
+            assert fake.state.call_count == 3
+
+            metrics = httpx.get(f"{url}/metrics").text
+            samples = [line for line in metrics.splitlines()
+                       if line.startswith('admission_rejections_total{reason="rate_limited_client"}')]
+            assert samples and float(samples[0].split()[-1]) == 2
+
+            # 滚动重启后服务持续可用，共享的限流状态保留
+            process.send_signal(signal.SIGHUP)
+            time.sleep(1)
+            _wait_ready(url, process)
+            assert _post(url, "北京是中国的首都。") == 429
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=30) == 0
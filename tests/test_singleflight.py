@@ -0,0 +1,156 @@
+import time
+import asyncio
+import threading
+import pytest
+
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.cache import MemoryCacheBackend, ResultCache
+from src.core.models import TextAnalysisRequest
+from src.core.resilience import DeadlineExceeded, RetryPolicy
+
+TEXT = "北京是中国的首都。"
+
+
+def test_identical_concurrent_requests_share_one_set_of_llm_calls():
+    llm = StubChatModel(latency=0.1)
+    agent = TextAnalysisAgent(llm=llm)
+
+    async def run():
+        return await asyncio.gather(*(agent.aanalyze(TextAnalysisRequest(text=TEXT)) for _ in range(20)))
+
+    responses = asyncio.run(run())
+    assert llm.call_count == 3
+    assert all(resp.summary == "北京是中国的首都。" for resp in responses)
+    assert sum(1 for resp in responses if resp.metadata["coalesced"]) == 19
+    assert len(agent._inflight) == 0
+
+
+def test_summary_only_request_piggybacks_on_full_analysis():
+    llm = StubChatModel(latency=0.1)
+    agent = TextAnalysisAgent(llm=llm)
+
+    async def run():
+        full = asyncio.create_task(agent.aanalyze(TextAnalysisRequest(text=TEXT)))
+        await asyncio.sleep(0.02)
+        summary_only = await agent.aanalyze(TextAnalysisRequest(
+            text=TEXT, include_classification=False, include_entities=False))
+        return await full, summary_only
+
+    full, summary_only = asyncio.run(run())
+    assert llm.call_count == 3
+    assert summary_only.summary == full.summary
+    assert summary_only.metadata["coalesced"] == ["summary"]
+    assert summary_only.metadata["usage"]["llm_calls"] == 0
+
+
+def test_leader_failure_propagates_to_followers():
+    class FailingLLM(StubChatModel):
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            self._record(self._prompt(messages))
+            await asyncio.sleep(0.05)
+            raise RuntimeError("upstream error")
+
+    llm = FailingLLM()
+    agent = TextAnalysisAgent(llm=llm)
+    request = TextAnalysisRequest(text=TEXT, include_entities=False, include_summary=False)
+
+    async def run():
+        return await asyncio.gather(*(agent.aanalyze(request) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert llm.call_count == 1
+    assert len(agent._inflight) == 0
+
+
+def test_cancelled_leader_does_not_fail_followers():
+    llm = StubChatModel(latency=0.1)
+    agent = TextAnalysisAgent(llm=llm)
+    request = TextAnalysisRequest(text=TEXT, include_entities=False, include_summary=False)
+
+    async def run():
+        leader = asyncio.create_task(agent.aanalyze(request))
+        await asyncio.sleep(0.02)
+        follower = asyncio.create_task(agent.aanalyze(request))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    response = asyncio.run(run())
+    assert response.classification == "新闻"
+    assert response.metadata["coalesced"] == []
+
+
+def test_leader_deadline_does_not_fail_followers_with_longer_budget():
+    llm = StubChatModel(latency=0.3)
+    agent = TextAnalysisAgent(llm=llm, retry_policy=RetryPolicy(max_retries=0))
+
+    async def run():
+        hurried = asyncio.create_task(agent.aanalyze(TextAnalysisRequest(text=TEXT, timeout=0.1)))
+        await asyncio.sleep(0.02)
+        patient = await agent.aanalyze(TextAnalysisRequest(text=TEXT, timeout=30))
+        return await asyncio.gather(hurried, return_exceptions=True), patient
+
+    (hurried,), patient = asyncio.run(run())
+    assert isinstance(hurried, DeadlineExceeded)
+    # 后到的请求先等待 leader，leader 超时后按自己的预算重新计算
+    assert patient.summary == "北京是中国的首都。"
+    assert patient.metadata["coalesced"] == []
+    assert len(agent._inflight) == 0
+
+
+class BrokenStoreBackend(MemoryCacheBackend):
+    def set(self, key, value):
+        raise OSError("disk full")
+
+
+class SlowStoreBackend(MemoryCacheBackend):
+    blocking = True
+
+    def __init__(self):
+        super().__init__()
+        self.storing = threading.Event()
+
+    def set(self, key, value):
+        self.storing.set()
+        time.sleep(0.2)
+        super().set(key, value)
+
+
+def test_cache_store_failure_does_not_leak_inflight_keys():
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm, cache=ResultCache(BrokenStoreBackend()))
+
+    async def run():
+        first = await agent.aanalyze(TextAnalysisRequest(text=TEXT))
+        assert len(agent._inflight) == 0
+        return first, await asyncio.wait_for(agent.aanalyze(TextAnalysisRequest(text=TEXT)), 5)
+
+    first, second = asyncio.run(run())
+    # 写缓存失败只记录日志，两次请求都正常返回
+    assert first.summary == second.summary == "北京是中国的首都。"
+    assert llm.call_count == 6
+
+
+def test_cancel_during_cache_store_does_not_leak_inflight_keys():
+    llm = StubChatModel()
+    backend = SlowStoreBackend()
+    agent = TextAnalysisAgent(llm=llm, cache=ResultCache(backend))
+    request = TextAnalysisRequest(text=TEXT, include_entities=False, include_summary=False)
+
+    async def run():
+        leader = asyncio.create_task(agent.aanalyze(request))
+        while not backend.storing.is_set():
+            await asyncio.sleep(0.01)
+        # 结果已算出、正在写缓存时取消
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert len(agent._inflight) == 0
+        return await asyncio.wait_for(agent.aanalyze(request), 5)
+
+    response = asyncio.run(run())
+    assert response.classification == "新闻"
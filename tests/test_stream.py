@@ -0,0 +1,68 @@
+import json
+import time
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.core.agent import TextAnalysisAgent
+from src.core.cache import MemoryCacheBackend, ResultCache
+from src.core.models import TextAnalysisRequest
+from src.core.registry import AgentRegistry
+
+LATENCY = {"classification": 0.05, "entities": 0.2, "summary": 0.3}
+
+
+def _collect(agent, request, **kwargs):
+    async def run():
+        start = time.perf_counter()
+        events = []
+        async for event in agent.astream_analyze(request, **kwargs):
+            events.append((time.perf_counter() - start, event))
+        return events
+
+    return asyncio.run(run())
+
+
+def test_stream_emits_each_task_as_it_completes():
+    agent = TextAnalysisAgent(llm=StubChatModel(task_latency=LATENCY))
+    events = _collect(agent, TextAnalysisRequest(text="北京是中国的首都。"))
+    kinds = [(event["event"], event.get("task")) for _, event in events]
+    assert kinds == [
+        ("result", "classification"), ("result", "entities"), ("result", "summary"), ("done", None)
+    ]
+    first_result_at = events[0][0]
+    assert first_result_at < 0.15
+    assert events[-1][1]["data"]["metadata"]["usage"]["llm_calls"] == 3
+
+
+def test_stream_summary_tokens_and_cache_hits():
+    llm = StubChatModel(task_latency=LATENCY)
+    agent = TextAnalysisAgent(llm=llm, cache=ResultCache(MemoryCacheBackend()))
+    request = TextAnalysisRequest(text="北京是中国的首都。", include_classification=False)
+    events = [event for _, event in _collect(agent, request, stream_tokens=True)]
+    tokens = "".join(event["data"] for event in events if event["event"] == "token")
+    assert tokens == "北京是中国的首都。"
+
+    again = [event for _, event in _collect(agent, request)]
+    assert [event["event"] for event in again] == ["result", "result", "done"]
+    assert again[-1]["data"]["metadata"]["cache"]["hits"] == ["entities", "summary"]
+    assert llm.call_count == 2
+
+
+def test_stream_endpoint_formats():
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=StubChatModel()))
+    client = TestClient(app)
+
+    resp = client.post("/api/v1/analyze/stream", json={"text": "北京是中国的首都。"})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines[-1]["event"] == "done"
+    assert {line["task"] for line in lines[:-1]} == {"classification", "entities", "summary"}
+
+    resp = client.post("/api/v1/analyze/stream?format=sse", json={"text": "北京是中国的首都。", "engine": "oneshot"})
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert resp.text.startswith("event: result\ndata: ")
+    assert resp.text.count("\n\n") == 4
@@ -0,0 +1,81 @@
+import json
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_llm import StubChatModel
+from src.api.app import create_app
+from src.core.agent import TextAnalysisAgent
+from src.core.cache import MemoryCacheBackend, ResultCache
+from src.core.models import TextAnalysisRequest
+from src.core.registry import AgentRegistry
+from src.core.tracing import FileSpanExporter, configure_tracing, parse_traceparent, shutdown_tracing
+
+TEXT = "北京是中国的首都。"
+
+
+def test_timings_are_opt_in_and_break_down_each_node():
+    agent = TextAnalysisAgent(llm=StubChatModel(latency=0.02), cache=ResultCache(MemoryCacheBackend()))
+    plain = asyncio.run(agent.aanalyze(TextAnalysisRequest(text="另一段文本")))
+    assert "timings" not in plain.metadata
+
+    timings = asyncio.run(agent.aanalyze(TextAnalysisRequest(text=TEXT, include_timings=True))).metadata["timings"]
+    for node in ("classification", "entity_extraction", "summarization"):
+        for stage in ("prompt", "llm", "parse"):
+            assert f"{node}.{stage}" in timings
+        assert timings[f"{node}.llm"] >= 20
+    assert {"analysis", "workflow", "cache.lookup", "cache.store"} <= set(timings)
+    assert timings["analysis"] >= timings["workflow"]
+    assert "queue" not in timings
+
+    cached = agent.analyze(TextAnalysisRequest(text=TEXT, include_timings=True)).metadata["timings"]
+    assert set(cached) == {"analysis", "cache.lookup"}
+
+
+def test_api_propagates_traceparent_and_reports_queue_time():
+    app = create_app()
+    app.state.agent_registry = AgentRegistry(factory=lambda: TextAnalysisAgent(llm=StubChatModel()))
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/analyze",
+            json={"text": TEXT, "include_timings": True, "engine": "oneshot"},
+            headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"},
+        )
+    assert response.status_code == 200
+    assert parse_traceparent(response.headers["traceparent"])[0] == trace_id
+    timings = response.json()["metadata"]["timings"]
+    assert {"queue", "analysis", "oneshot.prompt", "oneshot.llm", "oneshot.parse"} <= set(timings)
+
+
+def test_file_exporter_writes_one_connected_otlp_trace(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    configure_tracing(FileSpanExporter(str(path)))
+    try:
+        # 同步路径的并行节点运行在线程池中，父子关系依赖上下文复制
+        TextAnalysisAgent(llm=StubChatModel()).analyze(TextAnalysisRequest(text=TEXT))
+    finally:
+        shutdown_tracing()
+
+    spans = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        payload = json.loads(line)
+        for resource in payload["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    by_id = {item["spanId"]: item for item in spans}
+    assert len({item["traceId"] for item in spans}) == 1
+    roots = [item for item in spans if "parentSpanId" not in item]
+    assert [item["name"] for item in roots] == ["analysis"]
+    assert all(item["parentSpanId"] in by_id for item in spans if item is not roots[0])
+    llm = next(item for item in spans if item["name"] == "summarization.llm")
+    assert by_id[llm["parentSpanId"]]["name"] == "summarization"
+    assert int(llm["endTimeUnixNano"]) >= int(llm["startTimeUnixNano"])
+
+
+def test_parse_traceparent_rejects_malformed_headers():
+    assert parse_traceparent(None) is None
+    assert parse_traceparent("00-abc-def-01") is None
+    assert parse_traceparent(f"00-{'0' * 32}-{'1' * 16}-01") is None
+    assert parse_traceparent(f"00-{'g' * 32}-{'1' * 16}-01") is None
+    assert parse_traceparent(f"00-{'A' * 32}-{'1' * 16}-01") == ("a" * 32, "1" * 16)
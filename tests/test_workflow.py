@@ -0,0 +1,96 @@
+import time
+import pytest
+
+from benchmarks.stub_llm import StubChatModel
+from src.core.agent import TextAnalysisAgent
+from src.core.models import TextAnalysisRequest
+
+
+def _request(**kwargs):
+    return TextAnalysisRequest(text="北京是中国的首都。", **kwargs)
+
+
+@pytest.mark.parametrize("mode", ["sequential", "parallel"])
+def test_execution_modes_produce_same_result(mode):
+    agent = TextAnalysisAgent(llm=StubChatModel(), execution_mode=mode)
+    resp = agent.analyze(_request())
+    assert resp.classification == "新闻"
+    assert resp.entities == ["北京", "中国"]
+    assert resp.summary == "北京是中国的首都。"
+    assert resp.metadata["execution_mode"] == mode
+
+
+def test_parallel_mode_overlaps_llm_calls():
+    agent = TextAnalysisAgent(llm=StubChatModel(latency=0.2), execution_mode="parallel")
+    start = time.perf_counter()
+    agent.analyze(_request())
+    assert time.perf_counter() - start < 0.5
+
+
+def test_invalid_execution_mode():
+    with pytest.raises(ValueError):
+        TextAnalysisAgent(llm=StubChatModel(), execution_mode="unknown")
+
+
+def test_disabled_tasks_skip_llm_calls():
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm)
+    resp = agent.analyze(_request(include_entities=False, include_summary=False))
+    assert resp.classification == "新闻"
+    assert resp.entities is None and resp.summary is None
+    assert resp.metadata["tasks"] == ["classification"]
+    assert resp.metadata["usage"]["llm_calls"] == 1
+    assert llm.calls == ["classification"]
+
+
+def test_no_tasks_requested_makes_no_llm_calls():
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm)
+    resp = agent.analyze(_request(include_classification=False, include_entities=False, include_summary=False))
+    assert resp.metadata["usage"]["llm_calls"] == 0
+    assert llm.call_count == 0
+
+
+def test_pruned_workflows_are_cached():
+    agent = TextAnalysisAgent(llm=StubChatModel())
+    first = agent.get_workflow(("entities", "summary"))
+    assert agent.get_workflow(("entities", "summary")) is first
+    assert agent.get_workflow(("classification", "entities", "summary")) is agent.workflow
+
+
+def test_aanalyze_runs_requests_concurrently():
+    import asyncio
+
+    llm = StubChatModel(latency=0.2)
+    agent = TextAnalysisAgent(llm=llm)
+
+    async def run():
+        requests = [TextAnalysisRequest(text=f"北京是中国的首都。{i}") for i in range(10)]
+        return await asyncio.gather(*(agent.aanalyze(request) for request in requests))
+
+    start = time.perf_counter()
+    responses = asyncio.run(run())
+    assert time.perf_counter() - start < 1.0
+    assert all(resp.classification == "新闻" for resp in responses)
+    assert llm.call_count == 30
+
+
+def test_oneshot_engine_makes_single_call():
+    llm = StubChatModel()
+    agent = TextAnalysisAgent(llm=llm)
+    resp = agent.analyze(_request(engine="oneshot"))
+    assert resp.classification == "新闻"
+    assert resp.entities == ["北京", "中国"]
+    assert resp.summary == "北京是中国的首都。"
+    assert resp.metadata["engine"] == "oneshot"
+    assert resp.metadata["usage"]["llm_calls"] == 1
+
+
+def test_parse_oneshot_reply_tolerates_code_fences_and_string_entities():
+    from src.core.agent import parse_oneshot_reply
+
+    content = '```json\n{"classification": "新闻", "entities": "北京，中国", "summary": "摘要"}\n```'
+    result = parse_oneshot_reply(content, ("classification", "entities"))
+    assert result == {"classification": "新闻", "entities": ["北京", "中国"]}
+    with pytest.raises(ValueError):
+        parse_oneshot_reply("无法分析", ("summary",))